@@ -0,0 +1,191 @@
+import hashlib
+import re
+import numpy as np
+from logger import logger
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track the click and never change the article
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src", "referrer",
+    "cmpid", "s_cid", "ito", "_gl", "ncid", "amp", "outputtype",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "at_")
+HOST_PREFIXES = ("www.", "m.", "amp.")
+
+SHINGLE_SIZE = 4  # Character shingles, robust to reordered or slightly edited headlines
+NUM_PERMUTATIONS = 64
+NUM_BANDS = 16  # 16 bands of 4 rows: pairs above ~0.5 Jaccard become candidates
+_PRIME = np.uint64(4294967291)  # Largest 32-bit prime, keeps a * h + b inside uint64
+_rng = np.random.default_rng(20240601)  # Fixed seed so signatures are stable across runs
+_PERM_A = _rng.integers(1, 4294967291, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 4294967291, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def canonicalize_url(url: Optional[str]) -> str:
+    """
+    Normalizes an article URL so that syndicated, AMP and tracked variants compare equal.
+
+    Lowercases the scheme and host, drops www./m./amp. host prefixes, AMP path
+    segments, tracking query parameters, fragments and trailing slashes.
+    """
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+
+    segments = []
+    for segment in parts.path.split("/"):
+        if not segment or segment.lower() == "amp":
+            continue
+        segments.append(re.sub(r"^amp_", "", segment))
+    path = "/" + "/".join(segments)
+    path = re.sub(r"\.amp(\.html?)?$", r"\1", path)
+
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+    return urlunsplit(("https", host, path.rstrip("/") or "/", urlencode(query), ""))
+
+
+def _shingles(title: str) -> List[str]:
+    normalized = " ".join(re.findall(r"[a-z0-9]+", title.lower()))
+    if len(normalized) <= SHINGLE_SIZE:
+        return [normalized] if normalized else []
+    return [normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)]
+
+
+def _minhash(shingles: List[str]) -> np.ndarray:
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in set(shingles)],
+        dtype=np.uint64
+    )
+    return ((np.outer(hashes, _PERM_A) + _PERM_B) % _PRIME).min(axis=0)
+
+
+def _richness(article: Dict) -> tuple:
+    """
+    Orders records by how much useful content they carry.
+    """
+    description = article.get("description") or ""
+    return (
+        len(description.strip()),
+        bool(article.get("url")),
+        bool(article.get("publishedAt")),
+        bool((article.get("source") or {}).get("name")),
+        len((article.get("title") or "").strip()),
+    )
+
+
+class StoryGrouper:
+    """
+    Incrementally groups articles that share a canonical URL or have near-identical titles.
+
+    Near-identical titles are found with a MinHash LSH index over character
+    shingles and confirmed with the exact Jaccard similarity. Articles are
+    added one at a time under sortable keys that give their fetch order; the
+    groups, and the record kept from each, do not depend on the order in which
+    articles are added. From each group, the record with the longest
+    description is kept (lowest key on ties).
+    """
+
+    def __init__(self, title_similarity: float = 0.7):
+        self.title_similarity = title_similarity
+        self._articles = {}
+        self._parent = {}
+        self._best = {}  # Root key -> key of the record kept from its group
+        self._shingles = {}
+        self._by_url = {}
+        self._buckets = {}
+
+    def __len__(self) -> int:
+        return len(self._articles)
+
+    def _find(self, key):
+        while self._parent[key] != key:
+            self._parent[key] = self._parent[self._parent[key]]
+            key = self._parent[key]
+        return key
+
+    def _preference(self, key) -> tuple:
+        # Richest first, then earliest
+        return tuple(-value for value in _richness(self._articles[key])), key
+
+    def _union(self, a, b) -> None:
+        root_a, root_b = self._find(a), self._find(b)
+        if root_a == root_b:
+            return
+        root, child = min(root_a, root_b), max(root_a, root_b)
+        self._parent[child] = root
+        self._best[root] = min(self._best[root_a], self._best[root_b], key=self._preference)
+        del self._best[child]
+
+    def add(self, key, article: Dict) -> bool:
+        """
+        Adds an article under a key that orders it among all articles.
+
+        Returns:
+            True if the article is now the record kept from its group, i.e. it
+            is a new story or richer than the record kept so far.
+        """
+        self._articles[key] = article
+        self._parent[key] = key
+        self._best[key] = key
+
+        url = canonicalize_url(article.get("url"))
+        if url:
+            self._union(key, self._by_url.setdefault(url, key))
+
+        shingles = set(_shingles(article.get("title") or ""))
+        self._shingles[key] = shingles
+        if shingles:
+            signature = _minhash(list(shingles))
+            rows = NUM_PERMUTATIONS // NUM_BANDS
+            for band in range(NUM_BANDS):
+                members = self._buckets.setdefault((band, signature[band * rows:(band + 1) * rows].tobytes()), [])
+                for other in members:
+                    if self._find(key) == self._find(other):
+                        continue
+                    intersection = len(shingles & self._shingles[other])
+                    if intersection / len(shingles | self._shingles[other]) >= self.title_similarity:
+                        self._union(key, other)
+                members.append(key)
+
+        return self._best[self._find(key)] == key
+
+    def kept(self) -> List:
+        """
+        Returns the keys of the records kept from each group, in key order.
+        """
+        return sorted(self._best.values())
+
+
+def deduplicate_articles(articles: List[Dict], title_similarity: float = 0.7) -> List[Dict]:
+    """
+    Collapses articles that share a canonical URL or have near-identical titles.
+
+    See StoryGrouper for how groups are formed and which record is kept.
+
+    Args:
+        articles: Articles from all sources, in fetch order.
+        title_similarity: Minimum Jaccard similarity for two titles to be collapsed.
+
+    Returns:
+        One article per group, in the order of the kept records in the input.
+    """
+    grouper = StoryGrouper(title_similarity)
+    for i, article in enumerate(articles):
+        grouper.add(i, article)
+    kept = grouper.kept()
+
+    saved = len(articles) - len(kept)
+    logger.info(
+        f"Deduplicated {len(articles)} articles into {len(kept)} unique stories "
+        f"(saved {saved} LLM scoring calls)."
+    )
+    return [articles[i] for i in kept]
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from logger import logger
+from cassette import get_cassette
+from metrics import metrics
+from config import FETCH_TIMEOUT_SECONDS, FETCH_RATE_LIMIT_RETRIES, FETCH_MAX_RETRY_AFTER_SECONDS
+
+DEFAULT_RETRY_AFTER_SECONDS = 60  # When a 429 response carries no Retry-After header
+
+
+def create_session() -> requests.Session:
+    """
+    Creates a session that retries transient server errors, routed through the
+    HTTP cassette when one is configured.
+    """
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
+    session.mount("https://", HTTPAdapter(max_retries=retries))
+    cassette = get_cassette()
+    if cassette:
+        cassette.mount(session)
+    return session
+
+
+def retry_after_seconds(response) -> float:
+    """
+    Returns how long to wait before retrying a rate-limited response.
+
+    Retry-After may be a number of seconds or an HTTP date. The wait is capped at
+    FETCH_MAX_RETRY_AFTER_SECONDS.
+    """
+    value = response.headers.get("Retry-After")
+    delay = DEFAULT_RETRY_AFTER_SECONDS
+    if value:
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                logger.warning(f"Ignoring invalid Retry-After header: {value}")
+    return min(max(delay, 0.0), FETCH_MAX_RETRY_AFTER_SECONDS)
+
+
+async def get_json(session: requests.Session, url: str, source: str):
+    """
+    GETs a URL without blocking the event loop and returns the decoded JSON body.
+
+    The request runs in a worker thread. On HTTP 429 only this coroutine waits for
+    Retry-After, so requests to other sources carry on in the meantime.
+
+    Args:
+        session: The session to send the request with.
+        url: The URL to fetch.
+        source: The source name, for logging.
+
+    Raises:
+        requests.exceptions.RequestException: If the request fails, including a
+            429 that persists after FETCH_RATE_LIMIT_RETRIES retries.
+        ValueError: If the body is not valid JSON.
+    """
+    for attempt in range(FETCH_RATE_LIMIT_RETRIES + 1):
+        response = await asyncio.to_thread(session.get, url, timeout=FETCH_TIMEOUT_SECONDS)
+        metrics.increment("http_requests", source=source, status=response.status_code)
+        if response.status_code != 429 or attempt == FETCH_RATE_LIMIT_RETRIES:
+            break
+        metrics.increment("http_retries", source=source)
+        delay = retry_after_seconds(response)
+        logger.warning(f"{source} rate limit hit. Retrying in {delay:g} seconds...")
+        await asyncio.sleep(delay)
+    response.raise_for_status()
+    return response.json()
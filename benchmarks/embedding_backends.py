@@ -0,0 +1,144 @@
+"""
+Benchmarks the embedding backends used by duplicate_checker against each other.
+
+Each backend runs in its own subprocess, so peak RSS is measured independently.
+The report covers encode throughput, model load time, peak RSS, and decision
+agreement with the reference (first) backend at SIMILARITY_THRESHOLD. The run
+fails if any pairwise cosine similarity differs from the reference by more
+than ONNX_COSINE_TOLERANCE.
+
+Usage:
+    python benchmarks/embedding_backends.py [--backends torch onnx-int8] [--titles titles.txt] [--output report.json]
+"""
+import argparse
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+from config import TOPICS  # noqa: E402
+from duplicate_checker import SIMILARITY_THRESHOLD  # noqa: E402
+from embedding_backends import ONNX_COSINE_TOLERANCE, get_embedding_backend  # noqa: E402
+
+HEADLINE_TEMPLATES = [
+    "{topic}: government unveils new plan to boost investment",
+    "New plan to boost investment unveiled as part of {topic} push",
+    "{topic} gets a boost as exports hit a record high",
+    "Record exports give {topic} a major boost",
+    "Experts say {topic} faces headwinds amid global slowdown",
+    "{topic}: startups raise record funding in the last quarter",
+    "Startups raised record funding last quarter, a win for {topic}",
+    "{topic} milestone: ISRO completes successful satellite launch",
+]
+
+
+def synthetic_titles():
+    """
+    Headlines built from TOPICS, with paraphrased pairs near the duplicate threshold.
+    """
+    return [template.format(topic=topic) for topic, template in itertools.product(TOPICS, HEADLINE_TEMPLATES)]
+
+
+def run_worker(backend_name, titles_path, embeddings_path):
+    with open(titles_path, "r", encoding="utf-8") as file:
+        titles = json.load(file)
+
+    start = time.perf_counter()
+    backend = get_embedding_backend(backend_name)
+    backend.encode(titles[:8])  # Warm up
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    embeddings = backend.encode(titles)
+    encode_seconds = time.perf_counter() - start
+    np.save(embeddings_path, embeddings)
+
+    print(json.dumps({
+        "backend": backend_name,
+        "texts": len(titles),
+        "load_seconds": round(load_seconds, 3),
+        "encode_seconds": round(encode_seconds, 3),
+        "texts_per_second": round(len(titles) / encode_seconds, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def compare(reference, candidate):
+    """
+    Compares two embedding matrices of the same texts.
+    """
+    upper = np.triu_indices(len(reference), k=1)
+    reference_similarity = (reference @ reference.T)[upper]
+    candidate_similarity = (candidate @ candidate.T)[upper]
+    reference_decisions = reference_similarity > SIMILARITY_THRESHOLD
+    candidate_decisions = candidate_similarity > SIMILARITY_THRESHOLD
+    self_cosine = (reference * candidate).sum(axis=1)
+    max_difference = float(np.abs(reference_similarity - candidate_similarity).max())
+    return {
+        "min_self_cosine": round(float(self_cosine.min()), 4),
+        "mean_self_cosine": round(float(self_cosine.mean()), 4),
+        "max_pairwise_difference": round(max_difference, 4),
+        "duplicate_pairs_reference": int(reference_decisions.sum()),
+        "duplicate_pairs_candidate": int(candidate_decisions.sum()),
+        "decision_agreement": round(float((reference_decisions == candidate_decisions).mean()), 6),
+        "within_tolerance": max_difference <= ONNX_COSINE_TOLERANCE,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx-int8"], help="First one is the reference.")
+    parser.add_argument("--titles", help="File with one title per line (default: synthetic headlines).")
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--titles-json", help=argparse.SUPPRESS)
+    parser.add_argument("--embeddings-out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.titles_json, args.embeddings_out)
+        return 0
+
+    if args.titles:
+        with open(args.titles, "r", encoding="utf-8") as file:
+            titles = [line.strip() for line in file if line.strip()]
+    else:
+        titles = synthetic_titles()
+
+    report = {"similarity_threshold": SIMILARITY_THRESHOLD, "tolerance": ONNX_COSINE_TOLERANCE, "backends": [], "agreement": {}}
+    embeddings = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        titles_path = os.path.join(tmpdir, "titles.json")
+        with open(titles_path, "w", encoding="utf-8") as file:
+            json.dump(titles, file)
+        for name in args.backends:
+            embeddings_path = os.path.join(tmpdir, f"{name}.npy")
+            result = subprocess.run(
+                [sys.executable, __file__, "--worker", name, "--titles-json", titles_path, "--embeddings-out", embeddings_path],
+                capture_output=True, text=True, check=True
+            )
+            report["backends"].append(json.loads(result.stdout.strip().splitlines()[-1]))
+            embeddings[name] = np.load(embeddings_path).astype(np.float32)
+
+    reference = args.backends[0]
+    for name in args.backends[1:]:
+        report["agreement"][name] = compare(embeddings[reference], embeddings[name])
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    return 0 if all(result["within_tolerance"] for result in report["agreement"].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+Benchmarks a whole run of main.main offline, against local stand-ins for every external service.
+
+For each corpus size, synthetic articles are served by fake NewsAPI and
+newsdata.io servers, scored and summarized by a fake Azure OpenAI endpoint
+(with configurable latency and injected HTTP 429s), stored in an in-memory blob
+store and posted to a fake tweepy client (see benchmarks/fake_services.py).
+By default the fake news servers stretch their pages so every article is
+fetched, however large the corpus (see _PagedNews); with --real-page-sizes they
+serve the real APIs' page sizes, and large corpora are only partly fetched.
+Each run starts from empty state in its own subprocess, so peak RSS is measured
+independently. The report records wall time, peak RSS, stage timings, calls to
+each service and the run's metrics counters.
+
+With --baseline, the report is compared with an earlier one and the run fails
+if wall time, peak RSS or service calls grew by more than --tolerance.
+
+The embedding model must already be in the Hugging Face cache (or reachable);
+it is the one external dependency that is not stood in for. Other settings,
+e.g. SELECTION_MODE or STORY_CLUSTERING, are taken from the environment.
+
+Usage:
+    python benchmarks/end_to_end.py [--sizes 100 1000 10000 100000] [--openai-latency 0.05] [--rate-limit-rate 0.02]
+        [--real-page-sizes] [--output baseline.json] [--baseline baseline.json] [--tolerance 0.25]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.fake_services import FakeAzureOpenAI, FakeNewsAPI, FakeNewsdata, FakeTweepyClient, synthetic_corpus  # noqa: E402
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+QUERIES_PER_RUN = 2  # Per source; the fake servers split their articles over this many queries
+COMPARED_CALLS = ["newsapi", "newsdata", "openai"]
+
+
+def run_worker():
+    """
+    Runs main.main once with the in-process fakes and prints its measurements as JSON.
+    """
+    sys.path.insert(0, os.path.join(REPO_ROOT, "tests"))
+    from fake_blob_storage import FakeContainerClient
+    import blob_storage
+    import main
+    from metrics import metrics
+
+    blob_storage._container_client = FakeContainerClient()
+    twitter = FakeTweepyClient()
+    main.get_tweepy_client = lambda: twitter
+
+    start = time.perf_counter()
+    main.main()
+    seconds = time.perf_counter() - start
+    print(json.dumps({
+        "seconds": round(seconds, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "tweets": len(twitter.tweets),
+        "metrics": metrics.report(),
+    }))
+
+
+def run_size(size, args):
+    """
+    Serves a corpus of `size` articles and runs main.main against it in a subprocess.
+    """
+    articles = synthetic_corpus(size, args.seed)
+    newsapi = FakeNewsAPI(articles[0::2], QUERIES_PER_RUN, args.news_latency, args.real_page_sizes)
+    newsdata = FakeNewsdata(articles[1::2], QUERIES_PER_RUN, args.news_latency, args.real_page_sizes)
+    openai = FakeAzureOpenAI(args.openai_latency, args.rate_limit_rate, args.retry_after_ms, args.seed)
+    with newsapi, newsdata, openai, tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            NEWSAPI_ENDPOINT=f"{newsapi.url}/v2/everything",
+            NEWSDATA_ENDPOINT=f"{newsdata.url}/api/1/latest",
+            AZURE_OPENAI_ENDPOINT=f"{openai.url}/",
+            NEWS_API_KEY="benchmark", NEWSDATA_API_KEY="benchmark", OPENAI_API_KEY="benchmark",
+            QUERIES_PER_RUN=str(QUERIES_PER_RUN),
+            CASSETTE_MODE="off",
+            LOG_LEVEL=args.log_level,
+            WATERMARKS_FILE=os.path.join(workdir, "fetch_watermarks.json"),
+            PLANNER_FILE=os.path.join(workdir, "query_planner.json"),
+            SCORE_CACHE_FILE=os.path.join(workdir, "score_cache.db"),
+            BLOB_CACHE_DIR=os.path.join(workdir, ".blob_cache"),
+            HISTORY_DIR=os.path.join(workdir, ".posted_history"),
+            METRICS_JSON_FILE=os.path.join(workdir, "run_metrics.json"),
+            METRICS_PROMETHEUS_FILE="",
+        )
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker"], cwd=workdir, env=env, capture_output=True, text=True
+        )
+        run = json.loads(result.stdout.strip().splitlines()[-1]) if result.returncode == 0 else None
+        if run is None or "run_errors" in run["metrics"]["counters"]:
+            raise RuntimeError(f"Benchmark run over {size} articles failed:\n{result.stderr[-4000:]}")
+
+    counters = run["metrics"]["counters"]
+    return {
+        "articles": size,
+        "seconds": run["seconds"],
+        "peak_rss_mb": run["peak_rss_mb"],
+        "stage_seconds": {label.split("=", 1)[1]: round(value, 3) for label, value in counters.get("stage_seconds", {}).items()},
+        "calls": {
+            "newsapi": sum(newsapi.calls.values()),
+            "newsdata": sum(newsdata.calls.values()),
+            "openai": sum(openai.calls.values()),
+            "openai_rate_limited": openai.calls[429],
+            "tweets": run["tweets"],
+        },
+        "articles_fetched": sum(counters.get("articles_fetched", {}).values()),
+        "articles_scored": sum(counters.get("articles_scored", {}).values()),
+        "estimated_openai_cost_usd": run["metrics"]["estimated_openai_cost_usd"],
+        "counters": counters,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """
+    Lists the measurements of report that exceed those of baseline by more than tolerance.
+    """
+    previous = {run["articles"]: run for run in baseline["runs"]}
+    regressions = []
+    for run in report["runs"]:
+        base = previous.get(run["articles"])
+        if base is None:
+            continue
+        measurements = [(name, run[name], base[name]) for name in ("seconds", "peak_rss_mb")]
+        measurements += [(f"{name} calls", run["calls"][name], base["calls"].get(name, 0)) for name in COMPARED_CALLS]
+        for name, value, base_value in measurements:
+            if value > base_value * (1 + tolerance):
+                regressions.append(f"{run['articles']} articles: {name} {base_value:g} -> {value:g}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Corpus sizes, in articles.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--news-latency", type=float, default=0.1, help="Seconds per news API response.")
+    parser.add_argument("--openai-latency", type=float, default=0.05, help="Seconds per OpenAI response.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.02, help="Fraction of OpenAI requests answered with HTTP 429.")
+    parser.add_argument("--retry-after-ms", type=int, default=50, help="Retry delay sent with injected 429s.")
+    parser.add_argument(
+        "--real-page-sizes", action="store_true",
+        help="Serve news pages of the real APIs' sizes (NewsAPI pageSize capped at 100) instead of stretching them to fit every article."
+    )
+    parser.add_argument("--log-level", default="WARNING", help="LOG_LEVEL of the benchmarked runs.")
+    parser.add_argument("--output", help="Write the JSON report to this file, e.g. as the new baseline.")
+    parser.add_argument("--baseline", help="Compare with this earlier report.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative growth over the baseline.")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker()
+        return 0
+
+    settings = {name: getattr(args, name) for name in ("seed", "news_latency", "openai_latency", "rate_limit_rate", "retry_after_ms", "real_page_sizes")}
+    report = {"settings": settings, "runs": []}
+    for size in args.sizes:
+        run = run_size(size, args)
+        print(
+            f"{size:>7} articles: {run['seconds']:8.2f}s, peak RSS {run['peak_rss_mb']:7.1f} MB, "
+            f"{run['calls']['openai']} OpenAI calls ({run['calls']['openai_rate_limited']} rate limited), {run['calls']['tweets']} tweets",
+            file=sys.stderr
+        )
+        report["runs"].append(run)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        if baseline.get("settings") != settings:
+            print(f"Warning: the baseline was recorded with different settings: {baseline.get('settings')}", file=sys.stderr)
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+"""
+Local stand-ins for the external services of a run, used by benchmarks/end_to_end.py.
+
+FakeNewsAPI, FakeNewsdata and FakeAzureOpenAI are HTTP servers on 127.0.0.1
+that speak enough of the real APIs for the unmodified fetchers and openai
+client: point NEWSAPI_ENDPOINT, NEWSDATA_ENDPOINT and AZURE_OPENAI_ENDPOINT at
+their url. FakeTweepyClient replaces the tweepy client in-process. The
+in-memory blob store is tests/fake_blob_storage.FakeContainerClient.
+"""
+import hashlib
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+PAGES_PER_QUERY = 5  # The fetchers' default max_pages
+NEWSAPI_MAX_PAGE_SIZE = 100  # NewsAPI caps pageSize at 100
+NEWSDATA_PAGE_SIZE = 10  # newsdata.io results per page on the free plan
+
+PLACES = [
+    "Gujarat", "Tamil Nadu", "Maharashtra", "Karnataka", "Uttar Pradesh", "Kerala", "Assam", "Punjab",
+    "Bengaluru", "Pune", "Hyderabad", "Chennai", "Kolkata", "Ahmedabad", "Lucknow", "Bhubaneswar",
+]
+SUBJECTS = [
+    "solar power", "semiconductor", "startup", "highway", "metro rail", "vaccine", "satellite", "EV battery",
+    "port", "fintech", "AI research", "green hydrogen", "textile export", "medical college", "broadband", "wind energy",
+]
+# (tone, phrasings of one event); the phrasings of an event are paraphrases reported by different outlets
+EVENT_TEMPLATES = [
+    ("positive", [
+        "{place} {subject} investment crosses Rs {number} crore, a record milestone",
+        "Record Rs {number} crore {subject} investment flows into {place}",
+    ]),
+    ("positive", [
+        "India launches {place} {subject} project to boost growth",
+        "{subject} project launched in {place} as India pushes growth",
+    ]),
+    ("positive", [
+        "{place} {subject} exports surge {number} per cent in breakthrough year",
+        "Breakthrough year: {subject} exports from {place} rise {number}%",
+    ]),
+    ("neutral", [
+        "{place} government reviews {subject} policy draft",
+        "Draft {subject} policy under review in {place}",
+    ]),
+    ("neutral", [
+        "Experts discuss the future of {subject} in {place}",
+    ]),
+    ("negative", [
+        "{number} killed as {subject} site collapses in {place}",
+        "{subject} site collapse in {place} leaves {number} dead",
+    ]),
+    ("negative", [
+        "{place} {subject} firm probed over Rs {number} crore fraud",
+        "Rs {number} crore fraud: probe into {place} {subject} company",
+    ]),
+    ("negative", [
+        "{subject} output slumps in {place} amid losses and delays",
+    ]),
+]
+DOMAINS = [
+    "thehindu.com", "business-standard.com", "timesofindia.indiatimes.com", "hindustantimes.com", "ndtv.com",
+    "indianexpress.com", "economictimes.indiatimes.com", "livemint.com", "news18.com", "deccanherald.com",
+]
+
+POSITIVE_WORDS = {"record", "milestone", "boost", "growth", "launch", "launches", "launched", "surge", "breakthrough", "rise", "pushes"}
+NEGATIVE_WORDS = {"killed", "dead", "collapse", "collapses", "fraud", "probe", "probed", "slumps", "losses", "delays"}
+
+
+def synthetic_corpus(size: int, seed: int = 0, now: Optional[datetime] = None) -> List[Dict]:
+    """
+    Builds NewsAPI-style articles about synthetic events.
+
+    Each event is reported by a few articles: verbatim syndicated copies and
+    paraphrases from other outlets, so cross-source dedup and story clustering
+    have work to do. About a third of the events are positive.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc)
+    articles = []
+    for event in itertools.count():
+        tone, phrasings = rng.choice(EVENT_TEMPLATES)
+        fields = {"place": rng.choice(PLACES), "subject": rng.choice(SUBJECTS), "number": rng.randint(2, 900)}
+        published = now - timedelta(hours=rng.uniform(0, 48))
+        for copy in range(min(1 + int(rng.expovariate(0.6)), 8)):
+            if len(articles) == size:
+                return articles
+            title = rng.choice(phrasings).format(**fields)
+            title = title[0].upper() + title[1:]
+            domain = rng.choice(DOMAINS)
+            articles.append({
+                "title": title,
+                "description": f"{title}. Officials in {fields['place']} shared details of the {fields['subject']} {tone} development on {published:%d %B}.",
+                "url": f"https://{domain}/news/{re.sub(r'[^a-z0-9]+', '-', title.lower()).strip('-')}-{event}-{copy}",
+                "publishedAt": (published + timedelta(minutes=rng.randint(0, 180))).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "source": {"name": domain},
+            })
+    return articles
+
+
+def fake_scores(text: str) -> Tuple[float, int]:
+    """
+    The raw (sentiment, relevance) the fake model gives a text: a word count with stable per-text noise.
+    """
+    words = re.findall(r"[a-z]+", text.lower())
+    noise = int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:4], 16) / 0xFFFF - 0.5
+    positive, negative = sum(word in POSITIVE_WORDS for word in words), sum(word in NEGATIVE_WORDS for word in words)
+    sentiment = max(-1.0, min(1.0, 0.3 * (positive - negative) + 0.3 * noise))
+    relevance = max(0, min(10, round(3 + 2 * positive - negative + 4 * noise)))
+    return round(sentiment, 2), relevance
+
+
+class FakeService(ThreadingHTTPServer):
+    """
+    A JSON HTTP server on a free local port, answering from a background thread.
+
+    Subclasses implement respond(). Every response is delayed by latency seconds
+    and counted in calls by status code.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+    def respond(self, method: str, path: str, query: Dict[str, str], body: Optional[Dict]) -> Tuple[int, Dict[str, str], Dict]:
+        """
+        Returns the status code, extra headers and JSON body of the response to a request.
+        """
+        raise NotImplementedError
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _handle(self, method):
+        parsed = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(parsed.query))
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        time.sleep(self.server.latency)
+        status, headers, payload = self.server.respond(method, parsed.path, query, body)
+        with self.server._lock:
+            self.server.calls[status] += 1
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _PagedNews(FakeService):
+    """
+    Serves a fixed set of articles, split evenly over the queries of a run.
+
+    Queries are matched to shards of the articles in the order they are first
+    seen, since the query planner decides the topics. By default, pages are
+    stretched so each query's shard fits in PAGES_PER_QUERY pages, however large
+    the corpus: every article is fetched, in fewer and larger pages than the
+    real APIs serve (NewsAPI caps pageSize at 100). With real_page_sizes, pages
+    have the real APIs' sizes, so a query only reaches the first
+    PAGES_PER_QUERY pages of a large shard, as it would in production.
+    """
+
+    def __init__(self, articles: List[Dict], queries: int, latency: float = 0.0, real_page_sizes: bool = False):
+        super().__init__(latency)
+        self.real_page_sizes = real_page_sizes
+        self.shards = [articles[i::queries] for i in range(queries)]
+        self._shard_of: Dict[str, int] = {}
+
+    def shard(self, query: str) -> List[Dict]:
+        with self._lock:
+            if query not in self._shard_of:
+                self._shard_of[query] = len(self._shard_of)
+            index = self._shard_of[query]
+        return self.shards[index] if index < len(self.shards) else []
+
+    @staticmethod
+    def page_size(shard: List[Dict], minimum: int = 1) -> int:
+        return max(minimum, math.ceil(len(shard) / PAGES_PER_QUERY))
+
+
+class FakeNewsAPI(_PagedNews):
+    """
+    Stand-in for NewsAPI's /v2/everything endpoint.
+    """
+
+    def respond(self, method, path, query, body):
+        shard = self.shard(query.get("q", ""))
+        requested = int(query.get("pageSize", 20))
+        size = min(requested, NEWSAPI_MAX_PAGE_SIZE) if self.real_page_sizes else self.page_size(shard, requested)
+        page = int(query.get("page", 1))
+        articles = shard[(page - 1) * size:page * size]
+        return 200, {}, {"status": "ok", "totalResults": len(shard), "articles": articles}
+
+
+class FakeNewsdata(_PagedNews):
+    """
+    Stand-in for newsdata.io's /api/1/latest endpoint, with nextPage cursors.
+    """
+
+    def respond(self, method, path, query, body):
+        shard = self.shard(query.get("q", ""))
+        page, size = int(query.get("page", 1)), NEWSDATA_PAGE_SIZE if self.real_page_sizes else self.page_size(shard)
+        results = [
+            {
+                "title": article["title"],
+                "description": article["description"],
+                "link": article["url"],
+                "pubDate": article["publishedAt"].replace("T", " ").rstrip("Z"),
+                "source_id": article["source"]["name"].split(".")[0],
+            }
+            for article in shard[(page - 1) * size:page * size]
+        ]
+        next_page = str(page + 1) if page * size < len(shard) else None
+        return 200, {}, {"status": "success", "totalResults": len(shard), "results": results, "nextPage": next_page}
+
+
+class FakeAzureOpenAI(FakeService):
+    """
+    Stand-in for Azure OpenAI chat completions, answering the repo's scoring and summarization prompts.
+
+    Requests with logprobs get a one-digit rating whose top logprobs put the
+    fake score between the two nearest digits, so the expected rating is the
+    fake score. A rate_limit_rate fraction of requests, drawn from a seeded generator, is
+    answered with HTTP 429 and a retry_after_ms delay, as a throttled deployment
+    would. Token usage is estimated at four characters per token.
+    """
+
+    def __init__(self, latency: float = 0.0, rate_limit_rate: float = 0.0, retry_after_ms: int = 50, seed: int = 0):
+        super().__init__(latency)
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_ms = retry_after_ms
+        self._random = random.Random(seed)
+
+    def respond(self, method, path, query, body):
+        with self._lock:
+            throttled = self._random.random() < self.rate_limit_rate
+        if throttled:
+            headers = {"Retry-After": str(math.ceil(self.retry_after_ms / 1000)), "retry-after-ms": str(self.retry_after_ms)}
+            return 429, headers, {"error": {"code": "429", "message": "Rate limit is exceeded. Try again later."}}
+        prompt = body["messages"][-1]["content"]
+        choice = {"index": 0, "finish_reason": "stop"}
+        if body.get("logprobs"):
+            content, top_logprobs = self.rate(prompt)
+            choice["finish_reason"] = "length"
+            choice["logprobs"] = {"content": [dict(top_logprobs[0], top_logprobs=top_logprobs[:body.get("top_logprobs") or 1])]}
+        else:
+            content = self.complete(prompt)
+        choice["message"] = {"role": "assistant", "content": content}
+        return 200, {}, {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", ""),
+            "choices": [choice],
+            "usage": {
+                "prompt_tokens": sum(len(message["content"]) for message in body["messages"]) // 4,
+                "completion_tokens": max(1, len(content) // 4),
+                "total_tokens": sum(len(message["content"]) for message in body["messages"]) // 4 + max(1, len(content) // 4),
+            },
+        }
+
+    @staticmethod
+    def rate(prompt: str) -> Tuple[str, List[Dict]]:
+        sentiment, relevance = fake_scores(prompt.split("Text: ", 1)[1].split("\n\nAnswer", 1)[0])
+        rating = 9 * ((sentiment + 1) / 2 if "sentiment" in prompt.split("Text: ", 1)[0] else relevance / 10)
+        low = min(int(rating), 8)
+        candidates = [(str(low), low + 1 - rating), (str(low + 1), rating - low)]
+        candidates = sorted(((token, 0.98 * p) for token, p in candidates if p > 0), key=lambda c: -c[1]) + [(" The", 0.02)]
+        top_logprobs = [{"token": token, "logprob": math.log(p), "bytes": list(token.encode())} for token, p in candidates]
+        return candidates[0][0], top_logprobs
+
+    @staticmethod
+    def complete(prompt: str) -> str:
+        if "Articles (JSON): " in prompt:
+            articles = json.loads(prompt.split("Articles (JSON): ", 1)[1].split("\n\nRespond", 1)[0])
+            with_relevance = '"relevance"' in prompt
+            items = []
+            for article in articles:
+                sentiment, relevance = fake_scores(article["text"])
+                items.append({"id": article["id"], "sentiment": sentiment, "relevance": relevance} if with_relevance
+                             else {"id": article["id"], "sentiment": sentiment})
+            return json.dumps(items)
+        if "Text: " in prompt and "Sentiment: <score>" in prompt:
+            sentiment, relevance = fake_scores(prompt.split("Text: ", 1)[1].split("\n\nRespond", 1)[0])
+            return f"Sentiment: {sentiment}, Relevance: {relevance}"
+        title = prompt.split("Title: ", 1)[-1].split("\n", 1)[0]
+        return f"{title[:150]} #IndiaGrowth #MakeInIndia #Innovation"
+
+
+class FakeTweepyClient:
+    """
+    In-process stand-in for tweepy.Client that records the tweets it is asked to post.
+    """
+
+    def __init__(self):
+        self.tweets: List[Dict] = []
+
+    def create_tweet(self, text: str, in_reply_to_tweet_id=None):
+        tweet_id = str(len(self.tweets) + 1)
+        self.tweets.append({"id": tweet_id, "text": text, "in_reply_to_tweet_id": in_reply_to_tweet_id})
+        return SimpleNamespace(data={"id": tweet_id, "text": text})
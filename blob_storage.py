@@ -1,72 +1,237 @@
-from azure.storage.blob import BlobServiceClient
 from logger import logger
-from config import AZURE_STORAGE_CONNECTION_STRING, CONTAINER_NAME, POSTED_TWEETS_FILE, BLOB_NAME  # Import from config.py
-import json  # Required for JSON operations
+from metrics import metrics
+from config import AZURE_STORAGE_CONNECTION_STRING, CONTAINER_NAME, BLOB_CACHE_DIR  # Import from config.py
+from typing import Dict, List, Optional
+import os
+import shutil
+import threading
 
+# The azure packages are imported inside the functions that use them, so importing
+# this module stays cheap for runs and tests that never touch Blob Storage.
 
-def download_blob(blob_name: str, download_path: str) -> None:
+_container_client = None
+_client_lock = threading.Lock()
+
+# ETag of the version of each blob this process last downloaded or uploaded.
+# None means the blob is known not to exist, and _UNREADABLE that the last
+# download failed, so the blob's current version is unknown. A blob without an
+# entry was never read by this process.
+_UNREADABLE = object()
+_etags: Dict[str, object] = {}
+
+
+class BlobConflictError(Exception):
+    """
+    Raised when an upload is rejected because another writer changed the blob
+    since this process last read it, or because the last read of the blob failed.
+    """
+
+
+def get_container_client():
+    """
+    Returns the container client, creating the BlobServiceClient once per process.
+    """
+    global _container_client
+    with _client_lock:
+        if _container_client is None:
+            from azure.storage.blob import BlobServiceClient
+            blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
+            _container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+        return _container_client
+
+
+def _cache_path(blob_name: str) -> str:
+    return os.path.join(BLOB_CACHE_DIR, blob_name.replace("/", "__"))
+
+
+def _read_cached_etag(blob_name: str) -> Optional[str]:
+    cache_path = _cache_path(blob_name)
+    if not os.path.exists(cache_path) or not os.path.exists(f"{cache_path}.etag"):
+        return None
+    with open(f"{cache_path}.etag", "r") as file:
+        return file.read().strip() or None
+
+
+def _copy_file(source: str, destination: str) -> None:
+    # Copy through a temporary file so readers (e.g. memory maps) never see a partial file
+    shutil.copyfile(source, f"{destination}.tmp")
+    os.replace(f"{destination}.tmp", destination)
+
+
+def _update_cache(blob_name: str, source_path: str, etag: str) -> None:
+    os.makedirs(BLOB_CACHE_DIR, exist_ok=True)
+    cache_path = _cache_path(blob_name)
+    if os.path.abspath(source_path) != os.path.abspath(cache_path):
+        _copy_file(source_path, cache_path)
+    with open(f"{cache_path}.etag", "w") as file:
+        file.write(etag)
+
+
+def download_blob(blob_name: str, download_path: str) -> bool:
     """
     Downloads a blob from Azure Blob Storage.
 
+    A local copy of every blob is kept with its ETag. The download is
+    conditional (If-None-Match), so an unchanged blob is served from the local
+    copy without transferring its content again. A missing blob leaves an empty
+    file at download_path.
+
+    Errors are logged, not raised. After a failed download, download_path is
+    left as it was and upload_blob refuses to overwrite the blob until it is
+    read successfully.
+
     Args:
         blob_name: The name of the blob to download.
         download_path: The local path to save the downloaded blob.
+
+    Returns:
+        Whether the blob was read, i.e. download_path holds its current content
+        (empty if the blob does not exist).
     """
+    from azure.core import MatchConditions
+    from azure.core.exceptions import HttpResponseError
+
     try:
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
-        container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+        blob_client = get_container_client().get_blob_client(blob_name)
+        cached_etag = _read_cached_etag(blob_name)
+        try:
+            if cached_etag:
+                downloader = blob_client.download_blob(etag=cached_etag, match_condition=MatchConditions.IfModified)
+            else:
+                downloader = blob_client.download_blob()
+            data = downloader.readall()
+        except HttpResponseError as e:
+            if e.status_code == 304:
+                metrics.increment("blob_downloads", result="not modified")
+                _etags[blob_name] = cached_etag
+                _copy_file(_cache_path(blob_name), download_path)
+                logger.info(f"Blob '{blob_name}' is unchanged. Using the local copy for '{download_path}'.")
+                return True
+            if e.status_code == 404:
+                _etags[blob_name] = None
+                open(download_path, "wb").close()
+                logger.warning(f"Blob '{blob_name}' does not exist in Azure Blob Storage.")
+                return True
+            raise
 
-        with open(download_path, "wb") as file:
-            blob_client = container_client.get_blob_client(blob_name)
-            file.write(blob_client.download_blob().readall())
+        metrics.increment("blob_downloads", result="downloaded")
+        metrics.increment("blob_bytes_downloaded", len(data))
+        with open(f"{download_path}.tmp", "wb") as file:
+            file.write(data)
+        os.replace(f"{download_path}.tmp", download_path)
+        _etags[blob_name] = downloader.properties.etag
+        _update_cache(blob_name, download_path, downloader.properties.etag)
 
         logger.info(f"Blob '{blob_name}' downloaded successfully to '{download_path}'.")
+        return True
     except Exception as e:
+        _etags[blob_name] = _UNREADABLE
         logger.error(f"Error downloading blob '{blob_name}': {e}")
+        return False
 
 
-def upload_blob(file_path: str, blob_name: str) -> None:
+def upload_blob(file_path: str, blob_name: str, blob_type: str = "BlockBlob") -> None:
     """
     Uploads a file to Azure Blob Storage.
 
+    The upload is conditional on the blob not having changed since this process
+    last read or wrote it (If-Match on the known ETag, or If-None-Match: * if
+    the blob was known not to exist), so concurrent runs cannot silently
+    overwrite each other. A blob whose last download failed is not written, as
+    its current content is unknown. Only blobs this process never tried to read
+    are overwritten unconditionally.
+
     Args:
         file_path: The local path of the file to upload.
         blob_name: The name of the blob to create or overwrite.
+        blob_type: "BlockBlob", or "AppendBlob" for blobs that are later extended with append_to_blob.
+
+    Raises:
+        BlobConflictError: If another writer changed the blob since it was read,
+            or the blob could not be read.
     """
+    from azure.core import MatchConditions
+    from azure.core.exceptions import HttpResponseError
+
+    if _etags.get(blob_name) is _UNREADABLE:
+        logger.error(f"Blob '{blob_name}' could not be read, so its current version is unknown. Upload of '{file_path}' rejected.")
+        raise BlobConflictError(blob_name)
     try:
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
-        container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+        blob_client = get_container_client().get_blob_client(blob_name)
+        if blob_name not in _etags:
+            conditions = {"overwrite": True}
+        elif _etags[blob_name] is None:
+            conditions = {"overwrite": False}
+        else:
+            conditions = {"overwrite": True, "etag": _etags[blob_name], "match_condition": MatchConditions.IfNotModified}
 
         with open(file_path, "rb") as file:
-            blob_client = container_client.get_blob_client(blob_name)
-            blob_client.upload_blob(file, overwrite=True)
+            result = blob_client.upload_blob(file, blob_type=blob_type, **conditions)
 
+        metrics.increment("blob_uploads")
+        metrics.increment("blob_bytes_uploaded", os.path.getsize(file_path))
+        _etags[blob_name] = result["etag"]
+        _update_cache(blob_name, file_path, result["etag"])
         logger.info(f"File '{file_path}' uploaded successfully as blob '{blob_name}'.")
+    except HttpResponseError as e:
+        if e.status_code in (409, 412):
+            logger.error(f"Blob '{blob_name}' was changed by another writer. Upload of '{file_path}' rejected.")
+            raise BlobConflictError(blob_name) from e
+        logger.error(f"Error uploading blob '{blob_name}': {e}")
     except Exception as e:
         logger.error(f"Error uploading blob '{blob_name}': {e}")
 
 
-def initialize_posted_tweets():
+def append_to_blob(blob_name: str, data: bytes) -> None:
     """
-    Ensures the posted_tweets.json file exists in Azure Blob Storage.
-    If it doesn't exist, initializes it with an empty list.
+    Appends data to an append blob, creating the blob if it doesn't exist.
+
+    Appends are atomic on the service side, so concurrent writers never lose
+    each other's data and the cost does not grow with the size of the blob.
+
+    Args:
+        blob_name: The name of the append blob.
+        data: The bytes to append.
     """
+    from azure.core import MatchConditions
+    from azure.core.exceptions import HttpResponseError
+
+    blob_client = get_container_client().get_blob_client(blob_name)
     try:
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
-        container_client = blob_service_client.get_container_client(CONTAINER_NAME)
-
-        # Check if the blob exists
-        blob_client = container_client.get_blob_client(BLOB_NAME)
-        if (blob_client.exists()):
-            logger.info(f"Blob '{BLOB_NAME}' already exists in Azure Blob Storage. Skipping initialization.")
-            return
-
-        # If the blob doesn't exist, create it with an empty list
-        with open(POSTED_TWEETS_FILE, "w") as file:
-            json.dump([], file)
-
-        # Upload the file to Azure Blob Storage
-        upload_blob(POSTED_TWEETS_FILE, BLOB_NAME)
-        logger.info(f"Initialized '{BLOB_NAME}' in Azure Blob Storage with an empty list.")
-    except Exception as e:
-        logger.error(f"Error initializing '{BLOB_NAME}': {e}")
\ No newline at end of file
+        blob_client.append_block(data)
+    except HttpResponseError as e:
+        if e.status_code != 404:
+            raise
+        try:
+            blob_client.create_append_blob(match_condition=MatchConditions.IfMissing)
+        except HttpResponseError as create_error:
+            if create_error.status_code not in (409, 412):  # Created concurrently by another run
+                raise
+        blob_client.append_block(data)
+    metrics.increment("blob_bytes_uploaded", len(data))
+    logger.info(f"Appended {len(data)} bytes to blob '{blob_name}'.")
+
+
+def list_blob_names(prefix: str) -> List[str]:
+    """
+    Lists the names of the blobs whose names start with prefix, in sorted order.
+    """
+    return sorted(get_container_client().list_blob_names(name_starts_with=prefix))
+
+
+def delete_blob(blob_name: str) -> None:
+    """
+    Deletes a blob from Azure Blob Storage, along with its local cached copy.
+    """
+    from azure.core.exceptions import HttpResponseError
+
+    try:
+        get_container_client().delete_blob(blob_name)
+        logger.info(f"Blob '{blob_name}' deleted.")
+    except HttpResponseError as e:
+        if e.status_code != 404:
+            raise
+    _etags[blob_name] = None
+    for path in (_cache_path(blob_name), f"{_cache_path(blob_name)}.etag"):
+        if os.path.exists(path):
+            os.remove(path)
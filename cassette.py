@@ -0,0 +1,228 @@
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import defaultdict, deque
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from logger import logger
+from config import CASSETTE_MODE, CASSETTE_FILE
+
+# A cassette captures the HTTP traffic of a run (news fetchers, Azure OpenAI and
+# Tweepy) so the run can be replayed offline, e.g. to compare ranking or dedup
+# changes on identical inputs. Azure Blob Storage is not recorded: replays read
+# and write the configured container, so point AZURE_STORAGE_CONNECTION_STRING
+# at a scratch container when replaying.
+
+# Query parameters left out of request keys: secrets, and values derived from the clock
+IGNORED_PARAMS = {"apikey", "api-key", "from"}
+
+# Response headers that no longer apply once requests has decoded the body
+DECODED_BODY_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class CassetteMissError(requests.exceptions.ConnectionError):
+    """
+    Raised in replay mode for a request the cassette has no recorded response for.
+    """
+
+
+def request_key(method: str, url: str, body: Optional[bytes]) -> str:
+    """
+    Builds the key a request is recorded and replayed under: the method, the URL
+    without IGNORED_PARAMS and a hash of the body.
+    """
+    parts = urlsplit(url)
+    query = urlencode(sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True) if name.lower() not in IGNORED_PARAMS))
+    body_hash = hashlib.sha256(body or b"").hexdigest()
+    return f"{method.upper()} {urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))} {body_hash}"
+
+
+def _endpoint(key: str) -> str:
+    method, url, _ = key.split(" ")
+    return f"{method} {url.split('?')[0]}"
+
+
+class Cassette:
+    """
+    Recorded HTTP interactions, stored as gzip-compressed JSON.
+
+    In record mode, requests go to the network and every response is added to
+    the cassette, which is written on save() (and at exit). In replay mode,
+    nothing goes to the network: each request is answered with the next unused
+    response recorded under the same key. A GET with no exact match, such as a
+    news query whose topics differ from the recording, gets the next unused
+    response recorded for the same endpoint. Other requests, such as OpenAI
+    calls whose prompt changed, raise CassetteMissError.
+    """
+
+    def __init__(self, path: str, mode: str):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode '{mode}'. Use 'record' or 'replay'.")
+        self.path = path
+        self.mode = mode
+        self.interactions: List[Dict] = []
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, deque] = defaultdict(deque)
+        self._by_endpoint: Dict[str, deque] = defaultdict(deque)
+        self._used = set()
+        if mode == "replay":
+            with gzip.open(path, "rt", encoding="utf-8") as file:
+                self.interactions = json.load(file)["interactions"]
+            for index, interaction in enumerate(self.interactions):
+                self._by_key[interaction["key"]].append(index)
+                self._by_endpoint[_endpoint(interaction["key"])].append(index)
+            logger.info(f"Replaying {len(self.interactions)} HTTP interactions from '{path}'.")
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def record(self, key: str, status: int, headers: Dict[str, str], body: bytes) -> None:
+        with self._lock:
+            self.interactions.append({
+                "key": key,
+                "status": status,
+                "headers": dict(headers),
+                "body": base64.b64encode(body).decode("ascii"),
+            })
+
+    def play(self, key: str) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        Returns the (status, headers, body) to answer a request with in replay mode.
+
+        Raises:
+            CassetteMissError: If no unused response matches the request.
+        """
+        with self._lock:
+            candidates = self._by_key[key]
+            if not candidates and key.startswith("GET "):
+                candidates = self._by_endpoint[_endpoint(key)]
+            while candidates and candidates[0] in self._used:
+                candidates.popleft()
+            if not candidates:
+                raise CassetteMissError(f"No recorded response for {key}")
+            index = candidates.popleft()
+            self._used.add(index)
+        interaction = self.interactions[index]
+        return interaction["status"], interaction["headers"], base64.b64decode(interaction["body"])
+
+    def save(self) -> None:
+        if self.mode != "record":
+            return
+        with self._lock:
+            with gzip.open(f"{self.path}.tmp", "wt", encoding="utf-8") as file:
+                json.dump({"version": 1, "interactions": self.interactions}, file)
+            os.replace(f"{self.path}.tmp", self.path)
+        logger.info(f"Recorded {len(self.interactions)} HTTP interactions to '{self.path}'.")
+
+    def adapter(self, inner: Optional[BaseAdapter] = None) -> "CassetteAdapter":
+        return CassetteAdapter(self, inner or HTTPAdapter())
+
+    def mount(self, session: requests.Session) -> requests.Session:
+        """
+        Routes a requests session through the cassette, keeping its mounted adapters for recording.
+        """
+        for prefix in ("https://", "http://"):
+            session.mount(prefix, self.adapter(session.get_adapter(prefix)))
+        return session
+
+    def httpx_client(self):
+        """
+        Returns an httpx client routed through the cassette, for the OpenAI client.
+        """
+        import httpx
+        return httpx.Client(transport=_transport_class()(self))
+
+
+class CassetteAdapter(BaseAdapter):
+    """
+    requests transport adapter that records or replays through a cassette.
+    """
+
+    def __init__(self, cassette: Cassette, inner: BaseAdapter):
+        super().__init__()
+        self.cassette = cassette
+        self.inner = inner
+
+    def send(self, request, **kwargs):
+        body = request.body.encode("utf-8") if isinstance(request.body, str) else request.body
+        key = request_key(request.method, request.url, body)
+        if not self.cassette.replaying:
+            response = self.inner.send(request, **kwargs)
+            headers = {name: value for name, value in response.headers.items() if name.lower() not in DECODED_BODY_HEADERS}
+            self.cassette.record(key, response.status_code, headers, response.content)
+            return response
+
+        status, headers, content = self.cassette.play(key)
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = content
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+@lru_cache(maxsize=None)
+def _transport_class():
+    # httpx comes with the openai package, so it is only imported once an OpenAI client is built
+    import httpx
+
+    class CassetteTransport(httpx.BaseTransport):
+        """
+        httpx transport that records or replays through a cassette.
+
+        Bodies are stored decoded, as in CassetteAdapter, so the headers that
+        describe the wire encoding are dropped from both the recording and the
+        response handed to the client.
+        """
+
+        def __init__(self, cassette: Cassette):
+            self.cassette = cassette
+            self.inner = None if cassette.replaying else httpx.HTTPTransport()
+
+        def handle_request(self, request):
+            key = request_key(request.method, str(request.url), request.read())
+            if self.cassette.replaying:
+                status, headers, content = self.cassette.play(key)
+            else:
+                response = self.inner.handle_request(request)
+                content = response.read()
+                status, headers = response.status_code, dict(response.headers)
+                response.close()
+            headers = {name: value for name, value in headers.items() if name.lower() not in DECODED_BODY_HEADERS}
+            if not self.cassette.replaying:
+                self.cassette.record(key, status, headers, content)
+            return httpx.Response(status, headers=headers, content=content, request=request)
+
+        def close(self):
+            if self.inner:
+                self.inner.close()
+
+    return CassetteTransport
+
+
+@lru_cache(maxsize=None)
+def get_cassette() -> Optional[Cassette]:
+    """
+    Returns the run's cassette as configured by CASSETTE_MODE, or None when it is "off".
+    """
+    if CASSETTE_MODE == "off":
+        return None
+    cassette = Cassette(CASSETTE_FILE, CASSETTE_MODE)
+    if cassette.mode == "record":
+        atexit.register(cassette.save)
+    return cassette
@@ -1,23 +1,58 @@
-import openai
-import tweepy
-from config import OPENAI_API_KEY, AZURE_DEPLOYMENT_NAME, TWITTER_CONSUMER_KEY, TWITTER_CONSUMER_SECRET, TWITTER_ACCESS_TOKEN, TWITTER_ACCESS_SECRET, TWITTER_BEARER_TOKEN
-from openai import AzureOpenAI
+import os
+from functools import lru_cache
+from cassette import get_cassette
+from config import OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, TWITTER_CONSUMER_KEY, TWITTER_CONSUMER_SECRET, TWITTER_ACCESS_TOKEN, TWITTER_ACCESS_SECRET, TWITTER_BEARER_TOKEN
 
+# Clients are built on first use, so runs that exit early (and tests) never import
+# the openai and tweepy packages.
+
+
+@lru_cache(maxsize=None)
 def get_openai_client():
+    from openai import AzureOpenAI
+    cassette = get_cassette()
     return AzureOpenAI(
     api_key=OPENAI_API_KEY,
     api_version="2023-12-01-preview",
-    azure_endpoint="https://azureopenaipoistiveindiabotinstance.openai.azure.com/"
+    azure_endpoint=AZURE_OPENAI_ENDPOINT,
+    http_client=cassette.httpx_client() if cassette else None,
+    max_retries=0 if cassette and cassette.replaying else 2
     )
 
-# Use this function to get the client instead of directly initializing it
-openai_client = get_openai_client()
-
-# Initialize Tweepy client
-tweepy_client = tweepy.Client(
-    bearer_token=TWITTER_BEARER_TOKEN,
-    consumer_key=TWITTER_CONSUMER_KEY,
-    consumer_secret=TWITTER_CONSUMER_SECRET,
-    access_token=TWITTER_ACCESS_TOKEN,
-    access_token_secret=TWITTER_ACCESS_SECRET,
-)
\ No newline at end of file
+
+@lru_cache(maxsize=None)
+def get_tweepy_client(credentials_prefix: str = ""):
+    """
+    Returns the tweepy client of an account, built once per account.
+
+    The default account uses the TWITTER_* settings. Other accounts (see
+    profiles.py) read the same variables with a prefix, e.g. SPACE_TWITTER_CONSUMER_KEY.
+    """
+    import tweepy
+    if credentials_prefix:
+        credentials = [os.getenv(f"{credentials_prefix}{name}") for name in (
+            "TWITTER_BEARER_TOKEN", "TWITTER_CONSUMER_KEY", "TWITTER_CONSUMER_SECRET", "TWITTER_ACCESS_TOKEN", "TWITTER_ACCESS_SECRET"
+        )]
+    else:
+        credentials = [TWITTER_BEARER_TOKEN, TWITTER_CONSUMER_KEY, TWITTER_CONSUMER_SECRET, TWITTER_ACCESS_TOKEN, TWITTER_ACCESS_SECRET]
+    bearer_token, consumer_key, consumer_secret, access_token, access_token_secret = credentials
+    client = tweepy.Client(
+        bearer_token=bearer_token,
+        consumer_key=consumer_key,
+        consumer_secret=consumer_secret,
+        access_token=access_token,
+        access_token_secret=access_token_secret,
+    )
+    cassette = get_cassette()
+    if cassette:
+        cassette.mount(client.session)
+    return client
+
+
+def __getattr__(name):
+    # Keeps `from clients import openai_client, tweepy_client` working, building the client on first access
+    if name == "openai_client":
+        return get_openai_client()
+    if name == "tweepy_client":
+        return get_tweepy_client()
+    raise AttributeError(f"module 'clients' has no attribute '{name}'")
@@ -13,16 +13,135 @@ TWITTER_BEARER_TOKEN = os.getenv("TWITTER_BEARER_TOKEN")
 # Azure Blob Storage configuration
 AZURE_STORAGE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
 CONTAINER_NAME = "containerpositive-india-bot"
+BLOB_CACHE_DIR = os.getenv("BLOB_CACHE_DIR", ".blob_cache")  # Local copies of blobs, validated by ETag
+
+# Posted history: monthly append-only segments with per-segment float16 embeddings
+HISTORY_PREFIX = "posted_history"  # Blob prefix of the history segments
+HISTORY_DIR = os.getenv("HISTORY_DIR", ".posted_history")  # Local copies of history segments
+HISTORY_DEDUP_WINDOW_DAYS = float(os.getenv("HISTORY_DEDUP_WINDOW_DAYS", "90"))  # Posts older than this are not checked
+HISTORY_RETENTION_DAYS = float(os.getenv("HISTORY_RETENTION_DAYS", "365"))  # Posts older than this are compacted away
+
+# Legacy single-file history, migrated into segments by history_store.migrate_legacy_history
 POSTED_TWEETS_FILE = "posted_tweets.json"  # Local file to store posted tweets
 BLOB_NAME = "posted_tweets.json"  # Blob name in Azure Blob Storage
+EMBEDDINGS_BLOB_NAME = "posted_embeddings.npy"  # Blob name in Azure Blob Storage
 
 # OpenAI Configuration
 AZURE_DEPLOYMENT_NAME = "gpt-35-turbo"
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT", "https://azureopenaipoistiveindiabotinstance.openai.azure.com/")
+
+# Embeddings used for semantic deduplication
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # "torch", or "onnx-int8" (requires onnxruntime)
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+ONNX_MODEL_FILE = os.getenv("ONNX_MODEL_FILE", "onnx/model_quint8_avx2.onnx")  # Quantized export in the model repo
+
+# News fetching
+NEWSAPI_ENDPOINT = os.getenv("NEWSAPI_ENDPOINT", "https://newsapi.org/v2/everything")
+NEWSDATA_ENDPOINT = os.getenv("NEWSDATA_ENDPOINT", "https://newsdata.io/api/1/latest")
+FETCH_TIMEOUT_SECONDS = float(os.getenv("FETCH_TIMEOUT_SECONDS", "30"))  # Per HTTP request
+FETCH_RATE_LIMIT_RETRIES = int(os.getenv("FETCH_RATE_LIMIT_RETRIES", "2"))  # Retries of a request answered with HTTP 429
+FETCH_MAX_RETRY_AFTER_SECONDS = float(os.getenv("FETCH_MAX_RETRY_AFTER_SECONDS", "120"))  # Longest Retry-After honored
+WATERMARKS_FILE = os.getenv("WATERMARKS_FILE", "fetch_watermarks.json")  # Newest publishedAt processed per source and topic
+WATERMARKS_BLOB_NAME = "fetch_watermarks.json"  # Blob name in Azure Blob Storage
+FETCH_OVERLAP_HOURS = float(os.getenv("FETCH_OVERLAP_HOURS", "2"))  # Re-fetch this far behind the watermark for late-indexed articles
+
+# Query planning: which topics each source queries, within its daily request quota
+NEWSAPI_DAILY_REQUESTS = int(os.getenv("NEWSAPI_DAILY_REQUESTS", "100"))  # NewsAPI developer plan
+NEWSDATA_DAILY_REQUESTS = int(os.getenv("NEWSDATA_DAILY_REQUESTS", "200"))  # newsdata.io free plan credits
+FETCH_RUNS_PER_DAY = int(os.getenv("FETCH_RUNS_PER_DAY", "2"))  # Scheduled runs sharing the daily quota
+QUERIES_PER_RUN = int(os.getenv("QUERIES_PER_RUN", "2"))  # Queries per source and run
+TOPICS_PER_QUERY = int(os.getenv("TOPICS_PER_QUERY", "3"))  # Topics OR-ed into one query
+MIN_UNSEEN_FRACTION = float(os.getenv("MIN_UNSEEN_FRACTION", "0.3"))  # Stop paging a query below this fraction of unseen articles
+PLANNER_YIELD_DECAY = 0.3  # Weight of the latest run in a topic's yield estimate
+PLANNER_EXPLORATION_PER_DAY = 0.5  # Priority a topic gains per day since it was last queried
+PLANNER_FILE = os.getenv("PLANNER_FILE", "query_planner.json")  # Topic yields and quota usage
+PLANNER_BLOB_NAME = "query_planner.json"  # Blob name in Azure Blob Storage
+
+# HTTP cassette: "record" captures a run's HTTP traffic to CASSETTE_FILE, "replay" serves it back offline
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off")
+CASSETTE_FILE = os.getenv("CASSETTE_FILE", "cassette.json.gz")
+
+# Thread posting: the planned tweets of a thread and those already posted, so a later run finishes an interrupted thread
+THREAD_PROGRESS_FILE = os.getenv("THREAD_PROGRESS_FILE", "thread_progress.json")
+THREAD_PROGRESS_BLOB_NAME = "thread_progress.json"  # Blob name in Azure Blob Storage
+THREAD_MAX_ATTEMPTS = int(os.getenv("THREAD_MAX_ATTEMPTS", "3"))  # Runs that try to post a thread before it is dropped
 
 # Thresholds
 SENTIMENT_THRESHOLD = 0.5
 RELEVANCE_THRESHOLD = 0.5
 
+# Cross-source deduplication
+DEDUP_TITLE_SIMILARITY = float(os.getenv("DEDUP_TITLE_SIMILARITY", "0.7"))  # Jaccard similarity of title shingles
+
+# Scoring
+SCORING_CONCURRENCY = int(os.getenv("SCORING_CONCURRENCY", "8"))  # Parallel OpenAI scoring requests
+SCORING_BATCH_SIZE = int(os.getenv("SCORING_BATCH_SIZE", "10"))  # Articles scored per OpenAI request
+
+# Run metrics: a JSON report and a Prometheus textfile are written at the end of every run (empty disables)
+METRICS_JSON_FILE = os.getenv("METRICS_JSON_FILE", "run_metrics.json")
+METRICS_PROMETHEUS_FILE = os.getenv("METRICS_PROMETHEUS_FILE", "run_metrics.prom")
+OPENAI_PROMPT_COST_PER_1K = float(os.getenv("OPENAI_PROMPT_COST_PER_1K", "0.0005"))  # USD per 1,000 prompt tokens
+OPENAI_COMPLETION_COST_PER_1K = float(os.getenv("OPENAI_COMPLETION_COST_PER_1K", "0.0015"))  # USD per 1,000 completion tokens
+
+# Local prefilter: obvious rejects are not sent to OpenAI (tune with scoring_eval.py before enabling)
+PREFILTER_ENABLED = os.getenv("PREFILTER_ENABLED", "false").lower() == "true"
+PREFILTER_MIN_POLARITY = float(os.getenv("PREFILTER_MIN_POLARITY", "-0.2"))  # TextBlob polarity below which articles are rejected
+
+# Story clustering: articles about the same event share the score of one representative,
+# and the number of articles about an event is a "trending" ranking bonus
+STORY_CLUSTERING = os.getenv("STORY_CLUSTERING", "false").lower() == "true"
+STORY_CLUSTER_SIMILARITY = float(os.getenv("STORY_CLUSTER_SIMILARITY", "0.75"))  # Cosine similarity of title embeddings
+TRENDING_WEIGHT = float(os.getenv("TRENDING_WEIGHT", "0.1"))  # Largest bonus added to the combined score
+TRENDING_SATURATION = int(os.getenv("TRENDING_SATURATION", "10"))  # Articles about an event that earn the full bonus
+if TRENDING_SATURATION < 2:
+    # The bonus grows as log(size) / log(TRENDING_SATURATION)
+    raise ValueError(f"TRENDING_SATURATION must be at least 2, got {TRENDING_SATURATION}.")
+
+# Relevance: "llm" asks OpenAI for sentiment and relevance; "local" scores relevance against embedded TOPICS
+# and asks OpenAI only for sentiment (compare with scoring_eval.py relevance before switching)
+RELEVANCE_MODE = os.getenv("RELEVANCE_MODE", "llm")
+if RELEVANCE_MODE not in ("llm", "local"):
+    raise ValueError(f"RELEVANCE_MODE must be 'llm' or 'local', got '{RELEVANCE_MODE}'.")
+LOCAL_RELEVANCE_FLOOR = float(os.getenv("LOCAL_RELEVANCE_FLOOR", "0.2"))  # Topic cosine similarity scored as relevance 0
+LOCAL_RELEVANCE_CEILING = float(os.getenv("LOCAL_RELEVANCE_CEILING", "0.6"))  # Topic cosine similarity scored as relevance 1
+
+# Scoring: "json" asks OpenAI for scores as text (batched, as JSON); "logprobs" asks for one single-digit
+# rating per article and score and reads a continuous score from the digit's logprobs (compare with
+# scoring_eval.py logprobs before switching)
+SCORING_MODE = os.getenv("SCORING_MODE", "json")
+if SCORING_MODE not in ("json", "logprobs"):
+    raise ValueError(f"SCORING_MODE must be 'json' or 'logprobs', got '{SCORING_MODE}'.")
+SCORING_TOP_LOGPROBS = int(os.getenv("SCORING_TOP_LOGPROBS", "10"))  # Candidates returned for the rating token
+
+# Selection: "exhaustive" scores every article before ranking; "lazy" scores in order of a cheap prior
+# and stops at the first article whose combined score reaches LAZY_GOOD_ENOUGH_SCORE
+SELECTION_MODE = os.getenv("SELECTION_MODE", "exhaustive")
+if SELECTION_MODE not in ("exhaustive", "lazy"):
+    raise ValueError(f"SELECTION_MODE must be 'exhaustive' or 'lazy', got '{SELECTION_MODE}'.")
+LAZY_GOOD_ENOUGH_SCORE = float(os.getenv("LAZY_GOOD_ENOUGH_SCORE", "0.85"))
+
+# Streaming pipeline
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "200"))  # Articles buffered between two stages
+PIPELINE_BATCH_SIZE = int(os.getenv("PIPELINE_BATCH_SIZE", "80"))  # Most articles a stage takes at once; scoring splits them into SCORING_BATCH_SIZE requests
+
+# Bot profiles (profiles.py): a JSON file of profiles with their own topics, thresholds, hashtags,
+# Twitter account and posted history, sharing one fetch and one score cache (empty runs the single default profile)
+PROFILES_FILE = os.getenv("PROFILES_FILE", "")
+
+# Daemon mode (daemon.py): one long-running process keeps the model, clients and caches warm between cycles
+DAEMON_SCHEDULE = os.getenv("DAEMON_SCHEDULE", "0 4,16 * * *")  # Cron expression (UTC), the same times as the workflow
+DAEMON_JITTER_MINUTES = float(os.getenv("DAEMON_JITTER_MINUTES", "10"))  # Random delay of up to this much added to each cycle
+DAEMON_HTTP_HOST = os.getenv("DAEMON_HTTP_HOST", "127.0.0.1")
+DAEMON_HTTP_PORT = int(os.getenv("DAEMON_HTTP_PORT", "8080"))  # Serves /health and /metrics; 0 disables
+DAEMON_MAX_CYCLE_MINUTES = float(os.getenv("DAEMON_MAX_CYCLE_MINUTES", "60"))  # A cycle running longer is reported unhealthy
+DAEMON_HISTORY_REFRESH_HOURS = float(os.getenv("DAEMON_HISTORY_REFRESH_HOURS", "24"))  # Reload the in-memory posted history this often
+
+# Score cache configuration
+SCORE_CACHE_FILE = os.getenv("SCORE_CACHE_FILE", "score_cache.db")  # Local SQLite database
+SCORE_CACHE_BLOB_NAME = "score_cache.db"  # Blob name in Azure Blob Storage
+SCORE_CACHE_TTL_DAYS = float(os.getenv("SCORE_CACHE_TTL_DAYS", "14"))
+SCORE_CACHE_SYNC = os.getenv("SCORE_CACHE_SYNC", "true").lower() == "true"  # Sync the cache through Blob Storage
+
 # Topics and Domains
 TOPICS = [
     "India growth story",
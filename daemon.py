@@ -0,0 +1,301 @@
+"""
+Runs the bot as one long-running process instead of a cold `python main.py` per run.
+
+The embedding model, the OpenAI and tweepy clients, the score cache and the
+posted history stay in memory between cycles, so a cycle costs little more than
+its network calls. Cycles run on DAEMON_SCHEDULE, a cron expression in UTC,
+each delayed by a random jitter of up to DAEMON_JITTER_MINUTES. The daemon's
+health and the last cycle's run metrics are served on
+DAEMON_HTTP_HOST:DAEMON_HTTP_PORT at /health and /metrics.
+
+Usage:
+    python daemon.py [--run-now]
+"""
+import argparse
+import json
+import random
+import signal
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Set, Tuple
+from logger import logger
+from metrics import metrics, format_value, PROMETHEUS_PREFIX
+from config import (
+    DAEMON_SCHEDULE, DAEMON_JITTER_MINUTES, DAEMON_HTTP_HOST, DAEMON_HTTP_PORT, DAEMON_MAX_CYCLE_MINUTES,
+    DAEMON_HISTORY_REFRESH_HOURS, SCORE_CACHE_FILE, SCORE_CACHE_TTL_DAYS, SCORE_CACHE_BLOB_NAME, SCORE_CACHE_SYNC,
+    PREFILTER_ENABLED, SELECTION_MODE, RELEVANCE_MODE
+)
+
+
+def _parse_field(field: str, low: int, high: int) -> Set[int]:
+    values = set()
+    for item in field.split(","):
+        spec, has_step, step = item.partition("/")
+        step = int(step) if has_step else 1
+        if spec == "*":
+            start, end = low, high
+        elif "-" in spec:
+            start, end = (int(value) for value in spec.split("-", 1))
+        else:
+            start = int(spec)
+            end = high if has_step else start  # "5/15" means every 15 from 5
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(f"Cron field '{field}' is outside {low}-{high}.")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """
+    A five-field cron expression (minute hour day-of-month month day-of-week), evaluated in UTC.
+
+    Fields accept *, numbers, ranges (a-b), lists (a,b) and steps (*/n, a-b/n).
+    Day of week 0 and 7 are Sunday. As in cron, when both day fields are
+    restricted, a day matching either one matches.
+    """
+
+    FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression '{expression}' must have 5 fields.")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_field(field, low, high) for field, (low, high) in zip(fields, self.FIELDS)
+        )
+        self.weekdays = {weekday % 7 for weekday in weekdays}
+        self.days_restricted = not fields[2].startswith("*")
+        self.weekdays_restricted = not fields[4].startswith("*")
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays  # Cron counts from Sunday
+        if self.days_restricted and self.weekdays_restricted:
+            return day or weekday
+        return day and weekday
+
+    def next_after(self, moment: datetime) -> datetime:
+        """
+        Returns the first matching minute strictly after moment, in UTC.
+
+        Raises:
+            ValueError: If the expression never matches (e.g. February 30).
+        """
+        candidate = moment.astimezone(timezone.utc).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=5 * 366)  # Covers leap days
+        while candidate < limit:
+            if candidate.month not in self.months or not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+            elif candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression '{self.expression}' never matches.")
+
+
+class Daemon:
+    """
+    Runs main.main cycles on a schedule in one warm process and reports their health.
+
+    The daemon is healthy until a cycle fails (raises, or records run_errors),
+    and while no cycle has been running for longer than max_cycle_minutes. A
+    later successful cycle makes it healthy again.
+    """
+
+    def __init__(self, schedule: CronSchedule, jitter_minutes: float = DAEMON_JITTER_MINUTES, max_cycle_minutes: float = DAEMON_MAX_CYCLE_MINUTES):
+        self.schedule = schedule
+        self.jitter_seconds = jitter_minutes * 60
+        self.max_cycle_seconds = max_cycle_minutes * 60
+        self.started_at = time.time()
+        self.cycles = 0
+        self.failures = 0
+        self.last_cycle: Optional[Dict] = None
+        self.cycle_started_at: Optional[float] = None
+        self.next_cycle_at: Optional[float] = None
+        self.score_cache = None
+        self.history = None
+        self._last_metrics = ""
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def warm_up(self) -> None:
+        """
+        Loads everything a cycle needs that outlives it: clients, models, the score cache and the history.
+        """
+        from clients import get_openai_client, get_tweepy_client
+        from embedding_backends import get_embedding_backend
+        from duplicate_checker import HistoryIndexCache
+        from score_cache import ScoreCache
+
+        start = time.perf_counter()
+        get_openai_client()
+        get_tweepy_client()
+        get_embedding_backend()
+        if RELEVANCE_MODE == "local":
+            from relevance_scorer import get_topic_relevance
+            get_topic_relevance()
+        if PREFILTER_ENABLED or SELECTION_MODE == "lazy":
+            from sentiment_analysis import prefilter_signals
+            prefilter_signals("India")  # Loads textblob and its corpora
+        self.score_cache = ScoreCache(SCORE_CACHE_FILE, SCORE_CACHE_TTL_DAYS, SCORE_CACHE_BLOB_NAME if SCORE_CACHE_SYNC else None)
+        self.history = HistoryIndexCache(DAEMON_HISTORY_REFRESH_HOURS)
+        logger.info(f"Daemon warmed up in {time.perf_counter() - start:.1f}s.")
+
+    def run_cycle(self) -> bool:
+        """
+        Runs one fetch, score and post cycle, then syncs the score cache and compacts the
+        history of the bot and of every profile in PROFILES_FILE.
+
+        Returns:
+            Whether the cycle succeeded.
+        """
+        from main import main as run_once
+        from history_store import compact_history
+        from profiles import history_prefixes
+
+        start = time.time()
+        with self._lock:
+            self.cycle_started_at = start
+        try:
+            run_once(self.score_cache, self.history)
+            ok = metrics.value("run_errors") == 0
+            self.score_cache.sync()
+            for history_prefix in history_prefixes():
+                compact_history(prefix=history_prefix)
+        except Exception as e:
+            logger.error(f"Daemon cycle failed: {e}", exc_info=True)
+            ok = False
+        last_metrics = metrics.prometheus_text()
+        with self._lock:
+            self.cycles += 1
+            self.failures += not ok
+            self.cycle_started_at = None
+            self.last_cycle = {
+                "started_at": datetime.fromtimestamp(start, timezone.utc).isoformat(),
+                "seconds": round(time.time() - start, 3),
+                "ok": ok,
+            }
+            self._last_metrics = last_metrics
+        logger.info(f"Daemon cycle {'succeeded' if ok else 'failed'} in {self.last_cycle['seconds']:g}s.")
+        return ok
+
+    def health(self) -> Tuple[bool, Dict]:
+        """
+        Returns whether the daemon is healthy, and its status as a JSON-serializable dictionary.
+        """
+        now = time.time()
+        with self._lock:
+            running_for = now - self.cycle_started_at if self.cycle_started_at is not None else None
+            healthy = (self.last_cycle is None or self.last_cycle["ok"]) and (running_for is None or running_for <= self.max_cycle_seconds)
+            return healthy, {
+                "status": "ok" if healthy else "unhealthy",
+                "uptime_seconds": round(now - self.started_at, 3),
+                "cycles": self.cycles,
+                "failures": self.failures,
+                "running_for_seconds": round(running_for, 3) if running_for is not None else None,
+                "last_cycle": self.last_cycle,
+                "next_cycle_at": datetime.fromtimestamp(self.next_cycle_at, timezone.utc).isoformat() if self.next_cycle_at else None,
+            }
+
+    def prometheus_text(self) -> str:
+        """
+        The last cycle's run metrics, followed by the daemon's own gauges.
+        """
+        healthy, status = self.health()
+        lines: List[str] = []
+        for name, value in (
+            ("daemon_healthy", int(healthy)),
+            ("daemon_uptime_seconds", status["uptime_seconds"]),
+            ("daemon_cycles", status["cycles"]),
+            ("daemon_failed_cycles", status["failures"]),
+            ("daemon_next_cycle_timestamp_seconds", self.next_cycle_at or 0),
+        ):
+            lines += [f"# TYPE {PROMETHEUS_PREFIX}{name} gauge", f"{PROMETHEUS_PREFIX}{name} {format_value(value)}"]
+        with self._lock:
+            return self._last_metrics + "\n".join(lines) + "\n"
+
+    def serve(self, host: str, port: int) -> ThreadingHTTPServer:
+        """
+        Serves /health and /metrics from a background thread. Port 0 picks a free port.
+        """
+        server = ThreadingHTTPServer((host, port), _Handler)
+        server.daemon_threads = True
+        server.bot = self
+        threading.Thread(target=server.serve_forever, name="daemon-http", daemon=True).start()
+        logger.info(f"Serving /health and /metrics on http://{host}:{server.server_address[1]}")
+        return server
+
+    def run(self, run_now: bool = False) -> None:
+        """
+        Warms up, then runs cycles on the schedule until stop() is called.
+        """
+        self.warm_up()
+        try:
+            if run_now and not self._stop.is_set():
+                self.run_cycle()
+            while not self._stop.is_set():
+                next_at = self.schedule.next_after(datetime.now(timezone.utc)) + timedelta(seconds=random.uniform(0, self.jitter_seconds))
+                with self._lock:
+                    self.next_cycle_at = next_at.timestamp()
+                logger.info(f"Next cycle at {next_at.isoformat()}.")
+                if self._stop.wait(max(next_at.timestamp() - time.time(), 0)):
+                    break
+                self.run_cycle()
+        finally:
+            self.score_cache.close()
+            logger.info("Daemon stopped.")
+
+    def stop(self) -> None:
+        """
+        Stops the daemon after the running cycle, if any.
+        """
+        logger.info("Stopping the daemon...")
+        self._stop.set()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/health":
+            healthy, status = self.server.bot.health()
+            self._send(200 if healthy else 503, "application/json", json.dumps(status))
+        elif self.path == "/metrics":
+            self._send(200, "text/plain; version=0.0.4", self.server.bot.prometheus_text())
+        else:
+            self._send(404, "text/plain", "Not found\n")
+
+    def _send(self, status: int, content_type: str, body: str):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Daemon HTTP: {format % args}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--run-now", action="store_true", help="Run a cycle right after warming up, then follow the schedule")
+    args = parser.parse_args(argv)
+
+    daemon = Daemon(CronSchedule(DAEMON_SCHEDULE))
+    server = daemon.serve(DAEMON_HTTP_HOST, DAEMON_HTTP_PORT) if DAEMON_HTTP_PORT else None
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: daemon.stop())
+    try:
+        daemon.run(args.run_now)
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
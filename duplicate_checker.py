@@ -1,91 +1,303 @@
-import json
+import hashlib
 import os
+import threading
+import time
+import numpy as np
+from datetime import datetime, timedelta, timezone
 from logger import logger
-from sentence_transformers import SentenceTransformer, util
-from blob_storage import download_blob, upload_blob
-from config import POSTED_TWEETS_FILE, BLOB_NAME  # Import from config.py
+from typing import List, Optional, Tuple
+from embedding_backends import get_embedding_backend
+from blob_storage import download_blob, upload_blob, BlobConflictError
+from history_store import load_segments, load_segment, append_posted_title, segment_embeddings_name, local_path, posted_at
+from metrics import metrics
+from config import HISTORY_DEDUP_WINDOW_DAYS, HISTORY_PREFIX  # Import from config.py
 
 SIMILARITY_THRESHOLD = 0.9  # Threshold for semantic similarity
 
-# Load the semantic similarity model
-model = SentenceTransformer('all-MiniLM-L6-v2')
+# Each row of a segment's stored matrix pairs an embedding with a fingerprint of
+# its title. Rows are only trusted while their fingerprints match the segment's
+# titles in order, so a matrix left over from before a compaction (e.g. when
+# deleting it failed, or a run that read the old segment uploaded it again) is
+# re-encoded instead of being matched to the wrong titles.
+
+
+def encode_texts(texts: List[str]) -> np.ndarray:
+    """
+    Encodes texts into L2-normalized float32 embeddings, so cosine similarity is a dot product.
+
+    The embedding backend is chosen by EMBEDDING_BACKEND and loaded on first use.
+    """
+    metrics.increment("texts_embedded", len(texts))
+    return get_embedding_backend().encode(texts)
+
+
+def _title_fingerprints(titles: List[str]) -> np.ndarray:
+    """
+    Returns the first 8 bytes of the SHA-256 of each title, as uint64.
+    """
+    return np.array([int.from_bytes(hashlib.sha256(title.encode("utf-8")).digest()[:8], "little") for title in titles], dtype=np.uint64)
+
+
+def _save_embeddings(embeddings: np.ndarray, titles: List[str], blob_name: str) -> None:
+    """
+    Saves an embedding matrix as float16, with the fingerprint of each row's title, and uploads it to Azure Blob Storage.
+    """
+    path = local_path(blob_name)
+    rows = np.empty(len(titles), dtype=[("title", np.uint64), ("embedding", np.float16, (embeddings.shape[1],))])
+    rows["title"] = _title_fingerprints(titles)
+    rows["embedding"] = embeddings
+    # Write to a temporary file first: the current file may still be memory-mapped
+    with open(f"{path}.tmp", "wb") as file:
+        np.save(file, rows)
+    os.replace(f"{path}.tmp", path)
+    try:
+        upload_blob(path, blob_name)
+    except BlobConflictError:
+        # The store is derived from the posted history: rows missing after a lost update are re-encoded on load
+        logger.warning(f"Embeddings '{blob_name}' were updated by another run. Skipping this update.")
+
+
+def load_segment_embeddings(segment: str, titles: List[str]) -> np.ndarray:
+    """
+    Loads the precomputed embeddings of a history segment from Azure Blob Storage.
+
+    Row i of the matrix is the embedding of titles[i], the i-th entry of the
+    segment. Stored rows are used up to the first one whose title fingerprint
+    does not match; the remaining titles (e.g. entries appended since the matrix
+    was last written) are encoded and written back, so later runs only load them.
+
+    Args:
+        segment: The history segment name.
+        titles: The titles of all entries in the segment, in append order.
+
+    Returns:
+        A (len(titles), dim) float16 matrix, memory-mapped when it is complete.
+    """
+    blob_name = segment_embeddings_name(segment)
+    path = local_path(blob_name)
+    stored = None
+    try:
+        download_blob(blob_name, path)
+        stored = np.load(path, mmap_mode="r")
+    except Exception as e:
+        logger.info(f"No stored embeddings for '{segment}': {e}")
+
+    valid = 0
+    if stored is not None and stored.ndim == 1 and stored.dtype.names == ("title", "embedding"):
+        fingerprints = _title_fingerprints(titles[:len(stored)])
+        mismatches = np.flatnonzero(stored["title"][:len(fingerprints)] != fingerprints)
+        valid = int(mismatches[0]) if len(mismatches) else len(fingerprints)
+        if valid == len(stored) == len(titles):
+            return stored["embedding"]
+        if valid < len(stored):
+            logger.warning(f"Stored embeddings of '{segment}' do not match its entries from row {valid}. Dropping the rows from there.")
+
+    parts = [stored["embedding"][:valid]] if valid else []
+    if valid < len(titles):
+        logger.info(f"Encoding embeddings for {len(titles) - valid} of the {len(titles)} entries of '{segment}'.")
+        parts.append(encode_texts(titles[valid:]).astype(np.float16))
+    embeddings = np.vstack(parts)
+    _save_embeddings(embeddings, titles, blob_name)
+    return embeddings
+
+
+def load_posted_history(window_days: float = HISTORY_DEDUP_WINDOW_DAYS, prefix: str = HISTORY_PREFIX) -> Tuple[List[str], List[np.ndarray]]:
+    """
+    Loads the titles posted within the dedup window and their embeddings.
+
+    Only the monthly segments that overlap the window are downloaded.
+
+    Args:
+        window_days: The dedup window.
+        prefix: The history's blob prefix (each bot profile has its own).
+
+    Returns:
+        The titles, oldest first, and a list of per-segment float32 embedding
+        matrices whose rows, concatenated, line up with the titles.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=window_days)
+    titles, embeddings = [], []
+    for segment, entries in load_segments(window_days, prefix=prefix):
+        if not entries:
+            continue
+        in_window = np.array([posted_at(entry) >= cutoff for entry in entries])
+        segment_embeddings = load_segment_embeddings(segment, [entry["title"] for entry in entries])
+        titles.extend(entry["title"] for entry, keep in zip(entries, in_window) if keep)
+        embeddings.append(np.asarray(segment_embeddings, dtype=np.float32)[in_window])
+    logger.info(f"Loaded {len(titles)} posted tweets from the last {window_days:g} days.")
+    return titles, embeddings
 
 
 def load_posted_tweets():
     """
-    Loads the list of previously posted tweets from Azure Blob Storage.
+    Loads the list of tweets posted within the dedup window from Azure Blob Storage.
     """
     try:
-        # Download the blob to the local file
-        download_blob(BLOB_NAME, POSTED_TWEETS_FILE)
-
-        # Load the local file
-        if os.path.exists(POSTED_TWEETS_FILE):
-            with open(POSTED_TWEETS_FILE, "r") as file:
-                try:
-                    posted_tweets = json.load(file)  # Attempt to parse JSON
-                    logger.info(f"Loaded posted tweets successfully")
-                    logger.debug(f"Loaded posted tweets: {posted_tweets}")
-                    return posted_tweets
-                except json.JSONDecodeError:
-                    logger.warning(f"File '{POSTED_TWEETS_FILE}' is empty or contains invalid JSON. Returning an empty list.")
-                    return []  # Return an empty list if JSON is invalid
+        cutoff = datetime.now(timezone.utc) - timedelta(days=HISTORY_DEDUP_WINDOW_DAYS)
+        posted_tweets = [
+            entry["title"] for _, entries in load_segments(HISTORY_DEDUP_WINDOW_DAYS) for entry in entries
+            if posted_at(entry) >= cutoff
+        ]
+        logger.info(f"Loaded posted tweets successfully")
+        logger.debug(f"Loaded posted tweets: {posted_tweets}")
+        return posted_tweets
     except Exception as e:
         logger.error(f"Error loading posted tweets: {e}")
 
     return []  # Return an empty list if any error occurs
 
 
-def save_posted_tweet(tweet_text):
+def save_posted_tweet(tweet_text, prefix: str = HISTORY_PREFIX):
     """
-    Saves a new tweet to the list of posted tweets and uploads it to Azure Blob Storage.
+    Appends a new tweet to the posted history in Azure Blob Storage.
+
+    The title is appended to the current month's segment as a single line, and
+    only its embedding is encoded and added to the segment's stored matrix.
     """
     try:
-        # Load existing tweets
-        posted_tweets = load_posted_tweets()
+        segment = append_posted_title(tweet_text, prefix=prefix)
+        load_segment_embeddings(segment, [entry["title"] for entry in load_segment(segment)])
+    except Exception as e:
+        logger.error(f"Error saving posted tweet: {e}")
 
-        # Add the new tweet
-        posted_tweets.append(tweet_text)
 
-        # Save to the local file
-        with open(POSTED_TWEETS_FILE, "w") as file:
-            json.dump(posted_tweets, file)
+def load_history_index(prefix: str = HISTORY_PREFIX) -> Tuple[set, Optional[np.ndarray]]:
+    """
+    Loads the posted history for duplicate checks.
 
-        # Upload the updated file to Azure Blob Storage
-        upload_blob(POSTED_TWEETS_FILE, BLOB_NAME)
-    except Exception as e:
-        logger.error(f"Error saving posted tweet: {e}")
+    Args:
+        prefix: The history's blob prefix (each bot profile has its own).
 
+    Returns:
+        The set of posted titles and their stacked float32 embeddings (None if
+        nothing was posted within the dedup window).
+    """
+    with metrics.stage("history load"):
+        posted_tweets, history_embeddings = load_posted_history(prefix=prefix)
+    if not posted_tweets:
+        logger.info("No previously posted tweets found. Skipping semantic similarity check against history.")
+        return set(posted_tweets), None
+    return set(posted_tweets), np.vstack(history_embeddings)
 
-def is_duplicate(new_tweet):
+
+class HistoryIndexCache:
     """
-    Checks if a tweet is a duplicate based on exact match or semantic similarity.
+    The posted history index kept in memory by a long-running process (see daemon.py).
+
+    The index is loaded on first use and reloaded once it is older than
+    max_age_hours, so posts that leave the dedup window and posts made by other
+    writers are picked up. Titles posted by this process are added in place.
+    """
+
+    def __init__(self, max_age_hours: float):
+        self.max_age_seconds = max_age_hours * 3600
+        self._index: Optional[Tuple[set, Optional[np.ndarray]]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Tuple[set, Optional[np.ndarray]]:
+        """
+        Returns the index, as load_history_index would.
+        """
+        with self._lock:
+            if self._index is None or time.monotonic() - self._loaded_at > self.max_age_seconds:
+                self._index = load_history_index()
+                self._loaded_at = time.monotonic()
+            return self._index
+
+    def add(self, title: str) -> None:
+        """
+        Adds a title that was just posted (and saved with save_posted_tweet).
+        """
+        with self._lock:
+            if self._index is None:
+                return  # Loaded with the new title on first use
+            posted_set, embeddings = self._index
+            embedding = encode_texts([title])
+            self._index = (posted_set | {title}, embedding if embeddings is None else np.vstack([embeddings, embedding]))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._index = None
+
+
+def flag_history_duplicates(
+    titles: List[str], history: Tuple[set, Optional[np.ndarray]], embeddings: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Flags the titles that repeat a posted tweet exactly or semantically.
 
     Args:
-        new_tweet: The tweet text to check.
+        titles: The candidate tweet texts.
+        history: The posted history, as returned by load_history_index.
+        embeddings: The titles' embeddings, if already encoded (e.g. to check
+            one candidate pool against several histories).
 
     Returns:
-        True if the tweet is a duplicate, False otherwise.
+        The boolean flags and the candidates' embeddings.
     """
-    posted_tweets = load_posted_tweets()
+    posted_set, history_embeddings = history
+    flags = np.array([title in posted_set for title in titles], dtype=bool)
+    candidates = encode_texts(titles) if embeddings is None else embeddings
+    if history_embeddings is not None and len(titles):
+        flags |= ((candidates @ history_embeddings.T) > SIMILARITY_THRESHOLD).any(axis=1)
+    return flags, candidates
 
-    # Exact match check
-    if new_tweet in posted_tweets:
-        logger.info("Tweet is an exact duplicate.")
-        return True
 
-    # Semantic similarity check
-    if not posted_tweets:
-        logger.info("No previously posted tweets found. Skipping semantic similarity check.")
-        return False
+def flag_candidate_duplicates(candidates: np.ndarray, flags: np.ndarray) -> np.ndarray:
+    """
+    Additionally flags candidates that repeat a higher-ranked candidate which is still eligible.
 
-    # Perform semantic similarity check
-    embeddings1 = model.encode([new_tweet], convert_to_tensor=True)
-    embeddings2 = model.encode(posted_tweets, convert_to_tensor=True)
-    cosine_scores = util.cos_sim(embeddings1, embeddings2)
+    Args:
+        candidates: The candidates' embeddings, in ranking order.
+        flags: The flags so far (e.g. from flag_history_duplicates), in the same order.
 
-    if any(score > SIMILARITY_THRESHOLD for score in cosine_scores[0]):
-        logger.info("Tweet is a semantic duplicate.")
-        return True
+    Returns:
+        The updated flags.
+    """
+    flags = np.array(flags, dtype=bool)
+    pairwise = candidates @ candidates.T
+    for i in range(1, len(flags)):
+        if not flags[i] and (pairwise[i, :i][~flags[:i]] > SIMILARITY_THRESHOLD).any():
+            flags[i] = True
+    return flags
 
-    return False
\ No newline at end of file
+
+def is_duplicate_batch(titles: List[str]) -> List[bool]:
+    """
+    Checks several candidate tweets for duplicates against the posted history and each other.
+
+    The history is loaded once and all candidates are encoded in one batch, so the
+    check costs one download per history segment, one encode and two matrix
+    products. A candidate is flagged if it matches a posted tweet exactly or
+    semantically, or if it is a semantic duplicate of an earlier candidate that
+    was not itself flagged.
+
+    Args:
+        titles: The candidate tweet texts, in ranking order.
+
+    Returns:
+        A list of flags, True where the candidate is a duplicate.
+    """
+    if not titles:
+        return []
+    flags, candidates = flag_history_duplicates(titles, load_history_index())
+    flags = flag_candidate_duplicates(candidates, flags)
+
+    for title, flag in zip(titles, flags):
+        if flag:
+            logger.info(f"Tweet is a duplicate: {title}")
+    return flags.tolist()
+
+
+def is_duplicate(new_tweet):
+    """
+    Checks if a tweet is a duplicate based on exact match or semantic similarity.
+
+    Args:
+        new_tweet: The tweet text to check.
+
+    Returns:
+        True if the tweet is a duplicate, False otherwise.
+    """
+    return is_duplicate_batch([new_tweet])[0]
@@ -0,0 +1,105 @@
+import threading
+import numpy as np
+from logger import logger
+from typing import Callable, Dict, List
+from config import EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME, ONNX_MODEL_FILE
+
+# Embedding backends turn texts into L2-normalized float32 vectors, so cosine
+# similarity is a dot product. Every backend must agree with the reference
+# "torch" backend within ONNX_COSINE_TOLERANCE: the cosine similarity between
+# any pair of texts may differ by at most this much, so duplicate decisions at
+# SIMILARITY_THRESHOLD = 0.9 only differ for pairs within that distance of the
+# threshold. benchmarks/embedding_backends.py measures this.
+ONNX_COSINE_TOLERANCE = 0.02
+
+MAX_SEQUENCE_LENGTH = 256  # Same truncation as the sentence-transformers model
+
+
+class TorchBackend:
+    """
+    The reference backend: the PyTorch sentence-transformers model.
+    """
+
+    name = "torch"
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+        from sentence_transformers import SentenceTransformer  # Pulls in torch, so imported on first use
+        self.model = SentenceTransformer(model_name)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True).astype(np.float32)
+
+
+class OnnxInt8Backend:
+    """
+    CPU backend running the int8-quantized ONNX export of the same model with ONNX Runtime.
+
+    Tokenization uses the model's own tokenizer.json and pooling mirrors
+    sentence-transformers (attention-masked mean, then L2 normalization), so
+    torch is never imported. Requires the optional onnxruntime package.
+    """
+
+    name = "onnx-int8"
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, model_file: str = ONNX_MODEL_FILE):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError("The onnx-int8 embedding backend requires onnxruntime: pip install onnxruntime") from e
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(model_name, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQUENCE_LENGTH)
+        self.tokenizer.enable_padding()
+        self.session = onnxruntime.InferenceSession(
+            hf_hub_download(model_name, model_file), providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+
+    def encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+            attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+            inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                inputs["token_type_ids"] = np.zeros_like(input_ids)
+
+            token_embeddings = self.session.run(None, inputs)[0]
+            mask = attention_mask[..., np.newaxis].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            batches.append(pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None))
+        return np.vstack(batches).astype(np.float32)
+
+
+BACKENDS: Dict[str, Callable] = {
+    TorchBackend.name: TorchBackend,
+    OnnxInt8Backend.name: OnnxInt8Backend,
+}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_embedding_backend(name: str = EMBEDDING_BACKEND):
+    """
+    Returns the named embedding backend, loading its model once per process.
+
+    Args:
+        name: A key of BACKENDS, e.g. "torch" or "onnx-int8".
+    """
+    with _backends_lock:
+        if name not in _backends:
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown embedding backend '{name}'. Available: {', '.join(sorted(BACKENDS))}")
+            logger.info(f"Loading the '{name}' embedding backend...")
+            _backends[name] = BACKENDS[name]()
+        return _backends[name]
@@ -0,0 +1,225 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from logger import logger
+from typing import Dict, List, Optional, Tuple
+from blob_storage import download_blob, upload_blob, append_to_blob, list_blob_names, delete_blob, BlobConflictError
+from config import (
+    HISTORY_PREFIX, HISTORY_DIR, HISTORY_DEDUP_WINDOW_DAYS, HISTORY_RETENTION_DAYS,
+    POSTED_TWEETS_FILE, BLOB_NAME, EMBEDDINGS_BLOB_NAME
+)
+
+# The posted history is stored as one append blob per month (posted_history/2024-06.jsonl),
+# with one {"title": ..., "posted_at": ...} JSON object per line. Posting appends a single
+# line, readers only download the segments that overlap the dedup window, and
+# compact_history drops segments and entries older than the retention window. Each bot
+# profile (see profiles.py) keeps its own history under its own prefix.
+
+
+def segment_name(moment: datetime, prefix: str = HISTORY_PREFIX) -> str:
+    """
+    Returns the name of the segment blob that holds entries posted at the given moment.
+    """
+    return f"{prefix}/{moment:%Y-%m}.jsonl"
+
+
+def segment_embeddings_name(segment: str) -> str:
+    """
+    Returns the name of the blob that stores the embeddings of a segment's entries.
+    """
+    return segment[:-len(".jsonl")] + ".npy"
+
+
+def local_path(blob_name: str) -> str:
+    """
+    Returns the local path used for a history blob.
+    """
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    return os.path.join(HISTORY_DIR, blob_name.replace("/", "__"))
+
+
+def posted_at(entry: Dict) -> datetime:
+    """
+    Parses the timezone-aware posting time of a history entry.
+    """
+    moment = datetime.fromisoformat(entry["posted_at"])
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def segments_in_window(window_days: float, now: Optional[datetime] = None, prefix: str = HISTORY_PREFIX) -> List[str]:
+    """
+    Lists the segment names for every month that overlaps the last window_days days.
+    """
+    now = now or datetime.now(timezone.utc)
+    month = (now - timedelta(days=window_days)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    segments = []
+    while month <= now:
+        segments.append(segment_name(month, prefix))
+        month = (month + timedelta(days=32)).replace(day=1)
+    return segments
+
+
+def _parse_lines(lines: List[str]) -> List[Dict]:
+    entries = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+            if isinstance(entry.get("title"), str):
+                posted_at(entry)
+                entries.append(entry)
+                continue
+        except (AttributeError, KeyError, TypeError, ValueError):
+            pass
+        logger.warning(f"Skipping malformed history entry: {line}")
+    return entries
+
+
+def load_segment(segment: str) -> List[Dict]:
+    """
+    Downloads a segment and returns its entries in append order. Malformed lines are skipped.
+    """
+    path = local_path(segment)
+    download_blob(segment, path)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as file:
+        return _parse_lines(file.readlines())
+
+
+def load_segments(window_days: float = HISTORY_DEDUP_WINDOW_DAYS, now: Optional[datetime] = None, prefix: str = HISTORY_PREFIX) -> List[Tuple[str, List[Dict]]]:
+    """
+    Loads every segment that overlaps the dedup window.
+
+    Returns:
+        A list of (segment name, all entries of the segment) tuples, oldest first.
+        Entries are not filtered by date, so they stay aligned with the segment's stored embeddings.
+    """
+    return [(segment, load_segment(segment)) for segment in segments_in_window(window_days, now, prefix)]
+
+
+def load_posted_entries(window_days: float = HISTORY_DEDUP_WINDOW_DAYS, now: Optional[datetime] = None) -> List[Dict]:
+    """
+    Returns the history entries posted within the last window_days days, oldest first.
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=window_days)
+    return [
+        entry for _, entries in load_segments(window_days, now) for entry in entries
+        if posted_at(entry) >= cutoff
+    ]
+
+
+def _entry_line(title: str, moment: datetime) -> bytes:
+    return (json.dumps({"title": title, "posted_at": moment.isoformat()}, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def append_posted_title(title: str, moment: Optional[datetime] = None, prefix: str = HISTORY_PREFIX) -> str:
+    """
+    Appends a posted title to the current month's segment.
+
+    Returns:
+        The name of the segment the title was appended to.
+    """
+    moment = moment or datetime.now(timezone.utc)
+    segment = segment_name(moment, prefix)
+    append_to_blob(segment, _entry_line(title, moment))
+    return segment
+
+
+def migrate_legacy_history() -> None:
+    """
+    Moves titles from the legacy posted_tweets.json blob into the current segment, once.
+
+    Legacy titles carry no posting time, so they are stamped with the migration
+    time: they stay in the dedup window for a full window and are then retired
+    by compaction like any other entry.
+    """
+    try:
+        download_blob(BLOB_NAME, POSTED_TWEETS_FILE)
+        if not os.path.exists(POSTED_TWEETS_FILE) or os.path.getsize(POSTED_TWEETS_FILE) == 0:
+            return
+
+        with open(POSTED_TWEETS_FILE, "r") as file:
+            try:
+                titles = json.load(file)
+            except json.JSONDecodeError:
+                logger.warning(f"Legacy '{BLOB_NAME}' contains invalid JSON. Nothing to migrate.")
+                titles = []
+
+        now = datetime.now(timezone.utc)
+        if titles:
+            append_to_blob(segment_name(now), b"".join(_entry_line(str(title), now) for title in titles))
+        delete_blob(BLOB_NAME)
+        delete_blob(EMBEDDINGS_BLOB_NAME)
+        logger.info(f"Migrated {len(titles)} titles from legacy '{BLOB_NAME}' to '{segment_name(now)}'.")
+    except Exception as e:
+        logger.error(f"Error migrating legacy posted history: {e}")
+
+
+def compact_segment(segment: str, cutoff: datetime) -> bool:
+    """
+    Rewrites a segment without malformed lines, repeated titles and entries older than cutoff.
+
+    The rewrite is conditional on the segment being unchanged since it was read,
+    so a title appended during compaction is never lost; the segment is simply
+    compacted again on the next run. The segment's embeddings are dropped and
+    re-encoded on the next read; rows that survive a failed delete no longer
+    match the compacted titles' fingerprints and are re-encoded too.
+
+    Returns:
+        True if the segment was rewritten.
+    """
+    path = local_path(segment)
+    download_blob(segment, path)
+    with open(path, "r", encoding="utf-8") as file:
+        lines = [line for line in file.readlines() if line.strip()]
+
+    kept, seen = [], set()
+    for entry in _parse_lines(lines):
+        if posted_at(entry) >= cutoff and entry["title"] not in seen:
+            seen.add(entry["title"])
+            kept.append(entry)
+    if len(kept) == len(lines):
+        return False
+
+    with open(path, "wb") as file:
+        file.write(b"".join(_entry_line(entry["title"], posted_at(entry)) for entry in kept))
+    try:
+        upload_blob(path, segment, blob_type="AppendBlob")
+    except BlobConflictError:
+        logger.warning(f"Segment '{segment}' changed during compaction. It will be compacted on the next run.")
+        return False
+    delete_blob(segment_embeddings_name(segment))
+    logger.info(f"Compacted '{segment}' from {len(lines)} to {len(kept)} entries.")
+    return True
+
+
+def compact_history(retention_days: float = HISTORY_RETENTION_DAYS, now: Optional[datetime] = None, prefix: str = HISTORY_PREFIX) -> None:
+    """
+    Deletes segments that ended before the retention window and compacts the rest.
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=retention_days)
+    oldest_kept = segment_name(cutoff, prefix)
+
+    segments = [name for name in list_blob_names(f"{prefix}/") if name.endswith(".jsonl")]
+    deleted = compacted = 0
+    for segment in segments:
+        # Segment names sort chronologically, so anything before the cutoff month is fully expired
+        if segment < oldest_kept:
+            delete_blob(segment)
+            delete_blob(segment_embeddings_name(segment))
+            deleted += 1
+        elif compact_segment(segment, cutoff):
+            compacted += 1
+    logger.info(f"History compaction of '{prefix}': {len(segments)} segments, {deleted} deleted, {compacted} compacted.")
+
+
+if __name__ == "__main__":
+    from profiles import history_prefixes
+    migrate_legacy_history()
+    for history_prefix in history_prefixes():
+        compact_history(prefix=history_prefix)
@@ -1,48 +1,93 @@
-from config import NEWS_API_KEY, NEWSDATA_API_KEY, TOPICS, DOMAINS, SENTIMENT_THRESHOLD, RELEVANCE_THRESHOLD, AZURE_DEPLOYMENT_NAME
-from clients import openai_client, tweepy_client
-from newsapi_fetcher import fetch_news as fetch_newsapi
-from newsdata_fetcher import fetch_news as fetch_newsdata
-from workflow import filter_positive_articles, process_top_article
+from config import NEWS_API_KEY, NEWSDATA_API_KEY, TOPICS, DOMAINS, SENTIMENT_THRESHOLD, RELEVANCE_THRESHOLD, AZURE_DEPLOYMENT_NAME, SCORING_CONCURRENCY, SCORING_BATCH_SIZE
+from config import WATERMARKS_FILE, WATERMARKS_BLOB_NAME, FETCH_OVERLAP_HOURS, PLANNER_FILE, PLANNER_BLOB_NAME
+from config import SCORE_CACHE_FILE, SCORE_CACHE_BLOB_NAME, SCORE_CACHE_TTL_DAYS, SCORE_CACHE_SYNC, DEDUP_TITLE_SIMILARITY, PREFILTER_ENABLED
+from config import SELECTION_MODE, LAZY_GOOD_ENOUGH_SCORE, RELEVANCE_MODE, STORY_CLUSTERING, STORY_CLUSTER_SIMILARITY
+from config import METRICS_JSON_FILE, METRICS_PROMETHEUS_FILE
+from clients import get_openai_client, get_tweepy_client
+from cassette import get_cassette
+from news_fetcher import fetch_all_news
+from watermarks import FetchWatermarks
+from query_planner import QueryPlanner
+from workflow import score_articles, process_top_article
+from pipeline import run_pipeline
+from selection import LazySelection
 from logger import logger  # Import the centralized logger
-from duplicate_checker import is_duplicate, save_posted_tweet
-from blob_storage import initialize_posted_tweets
-from twitter_poster import MAX_TWEET_LENGTH, LINK_LENGTH, HASHTAGS, EXTRA  # Add this import
-
-def main():
+from metrics import metrics
+from duplicate_checker import save_posted_tweet, HistoryIndexCache
+from history_store import migrate_legacy_history
+from score_cache import ScoreCache
+from twitter_poster import MAX_TWEET_LENGTH, LINK_LENGTH, HASHTAGS, EXTRA, resume_thread  # Add this import
+from typing import Optional
+
+def main(score_cache: Optional[ScoreCache] = None, history: Optional[HistoryIndexCache] = None):
+    """
+    Runs one fetch, score and post cycle.
+
+    Args:
+        score_cache: An open score cache to use and leave open, as daemon.py
+            does. By default the cache is opened for this run and synced on close.
+        history: The in-memory posted history to check against and extend. By
+            default the history is loaded from Azure Blob Storage.
+    """
+    metrics.reset()
     try:
-        # Ensure the posted_tweets.json file is initialized
-        initialize_posted_tweets()
-
-        logger.info("Fetching news articles from NewsAPI...")
-        articles_newsapi = fetch_newsapi(TOPICS, DOMAINS, NEWS_API_KEY)
-
-        logger.info("Fetching news articles from newsdata.io...")
-        articles_newsdata = fetch_newsdata(TOPICS, NEWSDATA_API_KEY)
-
-        # Combine articles from both sources
-        articles = articles_newsapi + articles_newsdata
-
-        if not articles:
-            logger.warning("No articles fetched from any source.")
+        # Move any legacy posted_tweets.json history into the segmented history
+        with metrics.stage("history migration"):
+            migrate_legacy_history()
+
+        # Finish a thread that an earlier run could only post part of. A new
+        # thread would replace its progress, so none is posted until it is done.
+        try:
+            with metrics.stage("thread resume"):
+                thread_pending = resume_thread(get_tweepy_client())
+        except Exception as e:
+            logger.error(f"Error resuming a thread: {e}", exc_info=True)
+            thread_pending = True
+        if thread_pending:
+            logger.warning("An earlier thread is still being posted. Not posting a new one in this run.")
             return
 
-        logger.info("Filtering positive articles...")
-        positive_articles = filter_positive_articles(
-            articles, openai_client, AZURE_DEPLOYMENT_NAME, SENTIMENT_THRESHOLD, RELEVANCE_THRESHOLD
-        )
+        logger.info("Fetching news articles from NewsAPI and newsdata.io...")
+        watermarks = FetchWatermarks(WATERMARKS_FILE, FETCH_OVERLAP_HOURS, WATERMARKS_BLOB_NAME)
+        planner = QueryPlanner(TOPICS, PLANNER_FILE, PLANNER_BLOB_NAME)
+        openai_client = get_openai_client()
+        owns_score_cache = score_cache is None
+        if owns_score_cache:
+            score_cache = ScoreCache(SCORE_CACHE_FILE, SCORE_CACHE_TTL_DAYS, SCORE_CACHE_BLOB_NAME if SCORE_CACHE_SYNC else None)
+        load_history = history.get if history else None
+
+        def score(batch):
+            return score_articles(batch, openai_client, AZURE_DEPLOYMENT_NAME, SCORING_CONCURRENCY, SCORING_BATCH_SIZE, score_cache, PREFILTER_ENABLED, RELEVANCE_MODE == "local")
+
+        cluster_similarity = STORY_CLUSTER_SIMILARITY if STORY_CLUSTERING else None
+        try:
+            if SELECTION_MODE == "lazy":
+                # Articles are scored only until one is good enough to post
+                with metrics.stage("fetch"):
+                    articles = fetch_all_news(TOPICS, DOMAINS, NEWS_API_KEY, NEWSDATA_API_KEY, watermarks, planner)
+                selection = LazySelection(
+                    articles, score, SENTIMENT_THRESHOLD, RELEVANCE_THRESHOLD, LAZY_GOOD_ENOUGH_SCORE,
+                    SCORING_BATCH_SIZE * SCORING_CONCURRENCY, DEDUP_TITLE_SIMILARITY, cluster_similarity,
+                    load_history=load_history
+                )
+            else:
+                # Articles are deduplicated, checked against the posted history and scored while later pages are still being fetched
+                with metrics.stage("pipeline"):
+                    selection = run_pipeline(
+                        lambda emit: fetch_all_news(TOPICS, DOMAINS, NEWS_API_KEY, NEWSDATA_API_KEY, watermarks, planner, on_page=emit),
+                        score, SENTIMENT_THRESHOLD, RELEVANCE_THRESHOLD, DEDUP_TITLE_SIMILARITY,
+                        cluster_similarity=cluster_similarity, load_history=load_history,
+                        deterministic=get_cassette() is not None  # Cassettes key OpenAI requests by their batch
+                    )
 
-        if positive_articles:
-            logger.info("Looking for the first non-duplicate positive article...")
-            for _, article in positive_articles:
-                title = article.get("title", "No Title Available")
-                try:
-                    if is_duplicate(title):
-                        logger.warning(f"Duplicate article detected: {title}. Trying next article.")
-                        continue
-                except Exception as e:
-                    logger.error(f"Error during duplicate check: {e}", exc_info=True)
-                    continue
+            if not selection.fetched:
+                planner.save()  # Keep the quota usage of this run
+                logger.warning("No articles fetched from any source.")
+                return
 
+            posted = False
+            for _, article in selection.ranked:
+                title = article.get("title") or "No Title Available"
                 logger.info(f"Processing article: {title}")
                 logger.debug(f"Top article title: {title}")
 
@@ -51,30 +96,56 @@ def main():
 
                 # Process and post the article
                 try:
-                    process_top_article(
-                        article,
-                        openai_client,
-                        tweepy_client,
-                        AZURE_DEPLOYMENT_NAME,
-                        allowed_summary_length
-                    )
+                    with metrics.stage("summarize and post"):
+                        process_top_article(
+                            article,
+                            openai_client,
+                            get_tweepy_client(),
+                            AZURE_DEPLOYMENT_NAME,
+                            allowed_summary_length
+                        )
                 except Exception as e:
                     logger.error(f"Error during article processing: {e}", exc_info=True)
                     continue  # Try next article if processing fails
 
                 # Save the posted article to avoid duplicates in the future
                 try:
-                    save_posted_tweet(title)
+                    with metrics.stage("history save"):
+                        save_posted_tweet(title)
+                        if history:
+                            history.add(title)
                 except Exception as e:
                     logger.error(f"Error saving posted tweet: {e}", exc_info=True)
-                break  # Stop after posting the first non-duplicate article
-            else:
+                posted = True
+                break  # Stop after posting the first article that could be processed
+        finally:
+            if owns_score_cache:
+                score_cache.close()
+
+        if SELECTION_MODE == "lazy":
+            metrics.increment("lazy_scorings_avoided", selection.report()["scorings_avoided"])
+        if not posted:
+            if selection.selected:
                 logger.warning("No non-duplicate positive articles found.")
+            else:
+                logger.warning("No overwhelmingly positive and relevant articles found.")
+
+        # Later runs can start after the fetched articles once every one of them
+        # has been considered. A lazy selection that stopped early leaves the
+        # watermarks, so the unscored articles are fetched again (those scored
+        # are answered by the score cache).
+        if SELECTION_MODE != "lazy" or selection.complete:
+            watermarks.save()
         else:
-            logger.warning("No overwhelmingly positive and relevant articles found.")
+            logger.info("Not advancing the fetch watermarks: some fetched articles were not scored.")
+        planner.record_selected(selection.selected)
+        planner.save()
 
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+        metrics.increment("run_errors")
+    finally:
+        metrics.write(METRICS_JSON_FILE, METRICS_PROMETHEUS_FILE)
 
 
 if __name__ == "__main__": 
@@ -0,0 +1,160 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from logger import logger
+from config import OPENAI_PROMPT_COST_PER_1K, OPENAI_COMPLETION_COST_PER_1K
+
+PROMETHEUS_PREFIX = "positive_india_bot_"
+
+
+class RunMetrics:
+    """
+    Counters and stage timings of one run, reported as JSON and as a Prometheus textfile.
+
+    Counters are identified by a name and optional labels, e.g.
+    increment("openai_prompt_tokens", 812, purpose="scoring"). Stage wall
+    times are recorded with the stage() context manager. All methods are
+    thread-safe, so scoring workers and fetch threads can record directly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Starts a new run, discarding everything recorded so far.
+        """
+        with self._lock:
+            self.started_at = time.time()
+            self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted((label, str(label_value)) for label, label_value in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def value(self, name: str, **labels) -> float:
+        """
+        Returns a counter's value, summed over all label values not given.
+        """
+        wanted = {(label, str(label_value)) for label, label_value in labels.items()}
+        with self._lock:
+            return sum(value for (counter, counter_labels), value in self._counters.items()
+                       if counter == name and wanted <= set(counter_labels))
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Adds the wall time of the block to the stage's stage_seconds.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.increment("stage_seconds", time.perf_counter() - start, stage=name)
+
+    def record_openai_usage(self, purpose: str, response) -> None:
+        """
+        Counts an OpenAI request and the tokens reported in its response.usage.
+
+        Args:
+            purpose: What the request was for, e.g. "scoring" or "summarization".
+            response: The chat completion response.
+        """
+        self.increment("openai_requests", purpose=purpose)
+        usage = getattr(response, "usage", None)
+        for field in ("prompt_tokens", "completion_tokens"):
+            tokens = getattr(usage, field, None)
+            if isinstance(tokens, int):
+                self.increment(f"openai_{field}", tokens, purpose=purpose)
+
+    def report(self) -> Dict:
+        """
+        Returns the run's metrics as a JSON-serializable dictionary.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+        grouped: Dict[str, Dict[str, float]] = {}
+        for (name, labels), value in sorted(counters.items()):
+            grouped.setdefault(name, {})[",".join(f"{label}={label_value}" for label, label_value in labels)] = value
+        cost = (
+            self.value("openai_prompt_tokens") / 1000 * OPENAI_PROMPT_COST_PER_1K
+            + self.value("openai_completion_tokens") / 1000 * OPENAI_COMPLETION_COST_PER_1K
+        )
+        return {
+            "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "duration_seconds": round(time.time() - self.started_at, 3),
+            "estimated_openai_cost_usd": round(cost, 6),
+            "counters": grouped,
+        }
+
+    def prometheus_text(self) -> str:
+        """
+        Renders the run's metrics in the Prometheus text exposition format, as gauges.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+        report = self.report()
+        lines = []
+        for name, value in (
+            ("last_run_timestamp_seconds", self.started_at),
+            ("last_run_duration_seconds", report["duration_seconds"]),
+            ("last_run_estimated_openai_cost_usd", report["estimated_openai_cost_usd"]),
+        ):
+            lines += [f"# TYPE {PROMETHEUS_PREFIX}{name} gauge", f"{PROMETHEUS_PREFIX}{name} {format_value(value)}"]
+        typed = set()
+        for (name, labels), value in sorted(counters.items()):
+            metric = PROMETHEUS_PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} gauge")
+                typed.add(metric)
+            label_text = ",".join(f'{label}="{_escape(label_value)}"' for label, label_value in labels)
+            lines.append(f"{metric}{{{label_text}}} {format_value(value)}" if label_text else f"{metric} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_path: Optional[str], prometheus_path: Optional[str]) -> None:
+        """
+        Writes the JSON report and the Prometheus textfile, skipping paths that are not set.
+
+        Files are replaced atomically, so a textfile collector never reads a partial file.
+        """
+        for path, content in ((json_path, lambda: json.dumps(self.report(), indent=2)), (prometheus_path, self.prometheus_text)):
+            if not path:
+                continue
+            try:
+                with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+                    file.write(content())
+                os.replace(f"{path}.tmp", path)
+                logger.info(f"Run metrics written to '{path}'.")
+            except OSError as e:
+                logger.error(f"Error writing metrics to '{path}': {e}")
+
+
+def format_value(value: float) -> str:
+    """
+    Renders a sample value in the Prometheus text format without losing precision.
+
+    Integral values are written as integers, so large counters and timestamps
+    are not rounded to six significant digits as with "{:g}".
+    """
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# The metrics of the current run
+metrics = RunMetrics()
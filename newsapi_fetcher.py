@@ -1,64 +1,111 @@
+import asyncio
 import requests
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import urllib.parse
 from logger import logger  # Import the centralized logger
-from typing import List, Dict
-from requests.adapters import HTTPAdapter
-import time
-from urllib3.util.retry import Retry
-import random
+from typing import Callable, List, Dict
+from async_http import create_session, get_json
+from watermarks import FetchWatermarks
+from query_planner import QueryPlanner
+from config import NEWSAPI_DAILY_REQUESTS, NEWSAPI_ENDPOINT
 
-def construct_newsapi_url(topics: List[str], domains: str, api_key: str, page: int = 1, page_size: int = 20) -> str:
+SOURCE = "newsapi"
+MAX_LOOKBACK_DAYS = 10
+
+def construct_newsapi_url(topics: List[str], domains: str, api_key: str, page: int = 1, page_size: int = 20, since: datetime = None) -> str:
     """
-    Constructs the NewsAPI URL based on the given topics, domains, and API key.
+    Constructs the NewsAPI URL for a query matching any of the given topics.
+
+    Articles are requested from `since` (UTC), but never from more than
+    MAX_LOOKBACK_DAYS ago.
     """
-    
-    selected_topics = random.sample(topics, 3)
-    query = " OR ".join(selected_topics)
+
+    query = " OR ".join(topics)
     encoded_query = urllib.parse.quote(query)
+    lookback = datetime.now(timezone.utc) - timedelta(days=MAX_LOOKBACK_DAYS)
+    if since and since > lookback:
+        from_param = since.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+    else:
+        from_param = lookback.strftime('%Y-%m-%d')
     url = (
-        f"https://newsapi.org/v2/everything?"
+        f"{NEWSAPI_ENDPOINT}?"
         f"q={encoded_query}&"
         f"domains={domains}&"
         f"language=en&"
         f"sortBy=publishedAt&"
-        f"from={(datetime.now() - timedelta(days=10)).strftime('%Y-%m-%d')}&"
+        f"from={from_param}&"
         f"apiKey={api_key}&"
         f"page={page}&"
         f"pageSize={page_size}"
     )
     return url
 
-def fetch_news(topics: List[str], domains: str, api_key: str, max_pages: int = 5, page_size: int = 20) -> List[Dict]:
-    all_articles = []
-    session = requests.Session()
-    retries = Retry(total=3, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
-    session.mount("https://", HTTPAdapter(max_retries=retries))
+async def fetch_news_async(
+    topics: List[str], domains: str, api_key: str, max_pages: int = 5, page_size: int = 20,
+    watermarks: FetchWatermarks = None, planner: QueryPlanner = None, on_page: Callable = None
+) -> List[Dict]:
+    """
+    Fetches articles from NewsAPI for the queries planned by the query planner.
+
+    The planned queries run concurrently. Each query is paged until its results
+    run out, a page has too few unseen articles, or the source's request budget
+    for this run is spent. With watermarks, only articles published since the
+    query's watermark are requested.
+
+    If on_page is given, it is called with (query index, page number) and the
+    page's articles as each page arrives; that position orders the page within
+    the returned list.
+    """
+    planner = planner or QueryPlanner(topics)
+    session = create_session()
 
-    for page in range(1, max_pages + 1):
-        url = construct_newsapi_url(topics, domains, api_key, page=page, page_size=page_size)
-        logger.info(f"Fetching news from URL: {url}")
-        try:
-            response = session.get(url)
-            if response.status_code == 429:
-                logger.warning("Rate limit exceeded. Retrying after delay...")
-                time.sleep(60)
-                response = session.get(url)
-            response.raise_for_status()
-            news = response.json()
-            articles = news.get("articles", [])
-            if not articles:
+    async def fetch_query(query_index, query_topics):
+        since = watermarks.since(SOURCE, query_topics) if watermarks else None
+        articles, requests_made = [], 0
+        for page in range(1, max_pages + 1):
+            if not planner.take_request(SOURCE):
+                logger.info("NewsAPI request budget for this run is spent.")
+                break
+            requests_made += 1
+            url = construct_newsapi_url(query_topics, domains, api_key, page=page, page_size=page_size, since=since)
+            logger.info(f"Fetching news from URL: {url}")
+            try:
+                news = await get_json(session, url, "NewsAPI")
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Error fetching news: {e}")
+                break
+            except ValueError as e:
+                logger.error(f"Error: {e}")
+                break
+            page_articles = news.get("articles", [])
+            if not page_articles:
                 logger.info(f"No more articles found at page {page}.")
                 break
-            logger.info(f"Fetched {len(articles)} articles from page {page}.")
-            all_articles.extend(articles)
+            logger.info(f"Fetched {len(page_articles)} articles from page {page}.")
+            articles.extend(page_articles)
+            if on_page:
+                on_page((query_index, page), page_articles)
             # Stop if less than page_size articles returned (no more pages)
-            if len(articles) < page_size:
+            if len(page_articles) < page_size or page * page_size >= news.get("totalResults", float("inf")):
                 break
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error fetching news: {e}")
-            break
-        except ValueError as e:
-            logger.error(f"Error: {e}")
-            break
-    return all_articles
\ No newline at end of file
+            unseen = watermarks.count_new(SOURCE, query_topics, page_articles) / len(page_articles) if watermarks else 1.0
+            if planner.should_stop_paging(unseen):
+                logger.info(f"Only {unseen:.0%} of page {page} is unseen. Not paging further.")
+                break
+        if watermarks:
+            watermarks.record(SOURCE, query_topics, articles)
+        planner.record(SOURCE, query_topics, articles, requests_made)
+        return articles
+
+    try:
+        queries = planner.plan(SOURCE, NEWSAPI_DAILY_REQUESTS, max_pages)
+        results = await asyncio.gather(*(fetch_query(query_index, query_topics) for query_index, query_topics in enumerate(queries)))
+    finally:
+        session.close()
+    return [article for articles in results for article in articles]
+
+def fetch_news(
+    topics: List[str], domains: str, api_key: str, max_pages: int = 5, page_size: int = 20,
+    watermarks: FetchWatermarks = None, planner: QueryPlanner = None, on_page: Callable = None
+) -> List[Dict]:
+    return asyncio.run(fetch_news_async(topics, domains, api_key, max_pages, page_size, watermarks, planner, on_page))
@@ -1,13 +1,14 @@
+import asyncio
 import requests
 import urllib.parse
 from logger import logger
-from typing import List, Dict
-from requests.adapters import HTTPAdapter
-import time
-from urllib3.util.retry import Retry
-import random
+from typing import Callable, List, Dict
+from async_http import create_session, get_json
+from watermarks import FetchWatermarks, parse_published_at
+from query_planner import QueryPlanner
+from config import NEWSDATA_DAILY_REQUESTS, NEWSDATA_ENDPOINT
 
-NEWSDATA_ENDPOINT = "https://newsdata.io/api/1/latest"
+SOURCE = "newsdata"
 
 def construct_newsdata_url(
     topics: List[str],
@@ -16,8 +17,7 @@ def construct_newsdata_url(
     language: str = "en",
     next_page: str = None
 ) -> str:
-    selected_topics = random.sample(topics, min(3, len(topics)))
-    query = " OR ".join(selected_topics)
+    query = " OR ".join(topics)
     encoded_query = urllib.parse.quote(query)
     url = (
         f"{NEWSDATA_ENDPOINT}?"
@@ -30,50 +30,104 @@ def construct_newsdata_url(
         url += f"&page={next_page}"
     return url
 
-def fetch_news(
+async def fetch_news_async(
     topics: List[str],
     api_key: str,
     country: str = "in",
     language: str = "en",
-    max_pages: int = 5
+    max_pages: int = 5,
+    watermarks: FetchWatermarks = None,
+    planner: QueryPlanner = None,
+    on_page: Callable = None
 ) -> List[Dict]:
-    all_articles = []
-    session = requests.Session()
-    retries = Retry(total=3, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
-    session.mount("https://", HTTPAdapter(max_retries=retries))
+    """
+    Fetches articles from newsdata.io for the queries planned by the query planner.
+
+    The planned queries run concurrently. Pages of a query are linked by a
+    nextPage cursor, so they are requested one after the other, until the
+    results run out, a page has too few unseen articles, or the source's request
+    budget for this run is spent. The latest endpoint returns the newest
+    articles first, so with watermarks, paging also stops at the first article
+    older than the query's watermark and older articles are dropped.
+
+    If on_page is given, it is called with (query index, page number) and the
+    page's normalized articles as each page arrives; that position orders the
+    page within the returned list.
+    """
+    planner = planner or QueryPlanner(topics)
+    session = create_session()
 
-    next_page = None
-    for _ in range(max_pages):
-        url = construct_newsdata_url(topics, api_key, country, language, next_page)
-        logger.info(f"Fetching news from newsdata.io URL: {url}")
-        try:
-            response = session.get(url)
-            if response.status_code == 429:
-                logger.warning("newsdata.io rate limit hit. Sleeping for 60 seconds...")
-                time.sleep(60)
-                response = session.get(url)
-            response.raise_for_status()
-            news = response.json()
-            articles = news.get("results", [])
-            if not articles:
-                logger.info("No more articles found.")
+    async def fetch_query(query_index, query_topics):
+        since = watermarks.since(SOURCE, query_topics) if watermarks else None
+        all_articles, requests_made = [], 0
+        next_page = None
+        for page in range(1, max_pages + 1):
+            if not planner.take_request(SOURCE):
+                logger.info("newsdata.io request budget for this run is spent.")
                 break
-            logger.info(f"Fetched {len(articles)} articles.")
-            for art in articles:
-                all_articles.append({
-                    "title": art.get("title"),
-                    "description": art.get("description"),
-                    "url": art.get("link"),
-                    "publishedAt": art.get("pubDate"),
-                    "source": {"name": art.get("source_id", "")}
-                })
-            next_page = news.get("nextPage")
-            if not next_page:
+            requests_made += 1
+            url = construct_newsdata_url(query_topics, api_key, country, language, next_page)
+            logger.info(f"Fetching news from newsdata.io URL: {url}")
+            try:
+                news = await get_json(session, url, "newsdata.io")
+                articles = news.get("results", [])
+                if not articles:
+                    logger.info("No more articles found.")
+                    break
+                logger.info(f"Fetched {len(articles)} articles.")
+                page_articles = []
+                reached_watermark = False
+                for art in articles:
+                    published = parse_published_at(art.get("pubDate"))
+                    if since and published and published < since:
+                        reached_watermark = True
+                        continue
+                    page_articles.append({
+                        "title": art.get("title"),
+                        "description": art.get("description"),
+                        "url": art.get("link"),
+                        "publishedAt": art.get("pubDate"),
+                        "source": {"name": art.get("source_id", "")}
+                    })
+                all_articles.extend(page_articles)
+                if on_page and page_articles:
+                    on_page((query_index, page), page_articles)
+                if reached_watermark:
+                    logger.info("Reached articles fetched by a previous run.")
+                    break
+                unseen = watermarks.count_new(SOURCE, query_topics, page_articles) / len(page_articles) if watermarks else 1.0
+                if planner.should_stop_paging(unseen):
+                    logger.info(f"Only {unseen:.0%} of the page is unseen. Not paging further.")
+                    break
+                next_page = news.get("nextPage")
+                if not next_page:
+                    break
+            except requests.RequestException as e:
+                logger.error(f"Error fetching newsdata.io: {e}")
                 break
-        except requests.RequestException as e:
-            logger.error(f"Error fetching newsdata.io: {e}")
-            break
-        except ValueError as e:
-            logger.error(f"Error: {e}")
-            break
-    return all_articles
\ No newline at end of file
+            except ValueError as e:
+                logger.error(f"Error: {e}")
+                break
+        if watermarks:
+            watermarks.record(SOURCE, query_topics, all_articles)
+        planner.record(SOURCE, query_topics, all_articles, requests_made)
+        return all_articles
+
+    try:
+        queries = planner.plan(SOURCE, NEWSDATA_DAILY_REQUESTS, max_pages)
+        results = await asyncio.gather(*(fetch_query(query_index, query_topics) for query_index, query_topics in enumerate(queries)))
+    finally:
+        session.close()
+    return [article for articles in results for article in articles]
+
+def fetch_news(
+    topics: List[str],
+    api_key: str,
+    country: str = "in",
+    language: str = "en",
+    max_pages: int = 5,
+    watermarks: FetchWatermarks = None,
+    planner: QueryPlanner = None,
+    on_page: Callable = None
+) -> List[Dict]:
+    return asyncio.run(fetch_news_async(topics, api_key, country, language, max_pages, watermarks, planner, on_page))
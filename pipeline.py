@@ -0,0 +1,330 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from logger import logger
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from article_dedup import StoryGrouper
+from duplicate_checker import load_history_index, flag_history_duplicates, flag_candidate_duplicates
+from story_clustering import StoryClusters, trending_bonus
+from metrics import metrics
+from config import PIPELINE_QUEUE_SIZE, PIPELINE_BATCH_SIZE, DEDUP_TITLE_SIMILARITY
+
+# The run is a chain of stages connected by bounded queues:
+#
+#   fetch -> normalize -> history -> cluster -> score -> rank
+#
+# fetch emits articles page by page, normalize collapses the same story across
+# sources, history drops stories already posted, cluster groups articles about
+# the same event so only one of them is scored, score asks the LLM, and rank
+# orders what passed. Every article carries a sortable key giving its position
+# in batch (fetch) order, so the final ranking is identical to scoring the
+# fetched articles in one batch, whatever order they flow through the stages in.
+# A full queue blocks the stage feeding it, which bounds memory when a later
+# stage (usually scoring) is the bottleneck.
+#
+# Which articles a stage takes at once depends on thread timing, so the OpenAI
+# request bodies of a run do too. A run recorded or replayed through the HTTP
+# cassette, which keys requests by body, is therefore run deterministically:
+# fetched articles enter the stages in key order once fetching is done, and
+# scoring batches are filled to batch_size.
+
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    """
+    Throughput and queue-depth counters of a pipeline stage.
+    """
+
+    name: str
+    items_in: int = 0
+    items_out: int = 0
+    busy_seconds: float = 0.0
+    max_queue_depth: int = 0  # Deepest the stage's input queue was seen
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    def observe_queue(self, depth: int) -> None:
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def as_dict(self) -> Dict:
+        elapsed = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+        return {
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_per_second": round(self.items_out / elapsed, 2) if elapsed > 0 else 0.0,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+@dataclass
+class PipelineResult:
+    """
+    Outcome of a pipeline run.
+
+    Attributes:
+        ranked: Positive articles that are neither posted before nor a repeat
+            of a higher-ranked one, as (ranking score, article), best first.
+            The ranking score is the combined score plus the trending bonus.
+        selected: Every article that passed the sentiment and relevance
+            thresholds (directly or through its story cluster) and was not
+            posted before, in rank order.
+        fetched: The number of articles fetched.
+        stats: Counters of each stage, by stage name.
+    """
+
+    ranked: List[Tuple[float, Dict]] = field(default_factory=list)
+    selected: List[Dict] = field(default_factory=list)
+    fetched: int = 0
+    stats: Dict[str, Dict] = field(default_factory=dict)
+
+
+def _take(inbox: queue.Queue, stats: StageStats, max_items: int, fill: bool = False) -> Tuple[List, bool]:
+    """
+    Blocks for one item, then takes whatever else is already queued, up to max_items.
+
+    With fill, blocks until max_items are taken or the stream ends instead.
+
+    Returns:
+        The items and whether the end of the stream was reached.
+    """
+    stats.observe_queue(inbox.qsize())
+    items = []
+    item = inbox.get()
+    while item is not _DONE:
+        items.append(item)
+        if len(items) >= max_items:
+            return items, False
+        try:
+            item = inbox.get() if fill else inbox.get_nowait()
+        except queue.Empty:
+            return items, False
+    return items, True
+
+
+def _put(outbox: queue.Queue, item, stats: StageStats) -> None:
+    outbox.put(item)
+    stats.items_out += 1
+
+
+def _run_stage(
+    stats: StageStats, process: Callable, inbox: queue.Queue, outbox: queue.Queue, max_items: int, errors: List, fill: bool = False
+) -> None:
+    """
+    Runs a stage until the end of its input, then signals the end downstream.
+
+    After an error, the stage keeps draining its input so upstream stages never
+    block on a full queue; the error is re-raised by run_pipeline.
+    """
+    stats.started = time.perf_counter()
+    failed = False
+    done = False
+    while not done:
+        items, done = _take(inbox, stats, max_items, fill)
+        stats.items_in += len(items)
+        if not items or failed:
+            continue
+        start = time.perf_counter()
+        try:
+            outputs = process(items)
+        except Exception as e:
+            logger.error(f"Pipeline stage '{stats.name}' failed: {e}", exc_info=True)
+            errors.append(e)
+            failed = True
+            outputs = []
+        stats.busy_seconds += time.perf_counter() - start
+        for output in outputs:
+            _put(outbox, output, stats)
+    outbox.put(_DONE)
+    stats.finished = time.perf_counter()
+
+
+def run_pipeline(
+    fetch: Callable,
+    score: Callable,
+    sentiment_threshold: float,
+    relevance_threshold: float,
+    title_similarity: float = DEDUP_TITLE_SIMILARITY,
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+    batch_size: int = PIPELINE_BATCH_SIZE,
+    cluster_similarity: Optional[float] = None,
+    load_history: Optional[Callable] = None,
+    deterministic: bool = False
+) -> PipelineResult:
+    """
+    Runs fetch, normalize, dedup-vs-history, score and rank as concurrent streaming stages.
+
+    Args:
+        fetch: Called with an emit(position, articles) callback, which it calls for
+            every page as it arrives. Positions are tuples that sort in batch order.
+        score: Scores a list of articles, returning (sentiment, relevance, latency)
+            tuples in the same order (e.g. workflow.score_articles).
+        sentiment_threshold: Articles must score above this sentiment.
+        relevance_threshold: Articles must score above this relevance.
+        title_similarity: Jaccard similarity above which titles are the same story.
+        queue_size: Capacity of each queue between stages.
+        batch_size: The most articles a stage takes from its queue at once.
+        cluster_similarity: Title embedding similarity above which articles
+            report the same event. Only the first article of each event is
+            scored and only one per event is ranked, with a trending bonus for
+            events reported by many articles. None disables clustering.
+        load_history: Returns the posted history index. Defaults to
+            duplicate_checker.load_history_index.
+        deterministic: Whether the stages must see the same articles in the
+            same batches on every run of the same input, e.g. when recording
+            or replaying an HTTP cassette. Scoring then only starts once
+            fetching is done.
+
+    Returns:
+        The ranking. Without clustering, it is identical to scoring all fetched
+        articles in one batch and checking the positives against the history
+        and each other. With clustering, which article of an event is scored
+        depends on arrival order.
+
+    Raises:
+        Exception: The first error raised by the fetch, normalize or score stage.
+    """
+    names = ["fetch", "normalize", "history", "cluster", "score", "rank"]
+    stats = {name: StageStats(name) for name in names}
+    fetched, normalized, checked, clustered, scored = (queue.Queue(maxsize=queue_size) for _ in range(5))
+    errors: List[Exception] = []
+    grouper = StoryGrouper(title_similarity)
+    clusters = StoryClusters(cluster_similarity if cluster_similarity is not None else 2.0)  # Above 1: one article per cluster
+    articles, embeddings = {}, {}
+    history = {}
+
+    def run_fetch():
+        stats["fetch"].started = time.perf_counter()
+
+        buffered = []
+
+        def emit(position, articles):
+            items = [(tuple(position) + (index,), article) for index, article in enumerate(articles)]
+            if deterministic:
+                buffered.extend(items)
+                return
+            for item in items:
+                _put(fetched, item, stats["fetch"])
+
+        try:
+            fetch(emit)
+        except Exception as e:
+            logger.error(f"Pipeline stage 'fetch' failed: {e}", exc_info=True)
+            errors.append(e)
+        for item in sorted(buffered, key=lambda item: item[0]):
+            _put(fetched, item, stats["fetch"])
+        fetched.put(_DONE)
+        stats["fetch"].finished = time.perf_counter()
+
+    def normalize(items):
+        # Only a new story, or a richer record of one, needs to be checked and scored
+        return [(key, article) for key, article in items if grouper.add(key, article)]
+
+    def check_history(items):
+        titles = [article.get("title") or "No Title Available" for _, article in items]
+        if "index" not in history:
+            try:
+                history["index"] = (load_history or load_history_index)()
+            except Exception as e:
+                # Never post an article that could not be checked
+                logger.error(f"Error during duplicate check: {e}", exc_info=True)
+                history["index"] = None
+        if history["index"] is None:
+            return []
+        flags, embeddings = flag_history_duplicates(titles, history["index"])
+        for title, flag in zip(titles, flags):
+            if flag:
+                logger.info(f"Tweet is a duplicate: {title}")
+        return [(key, article, embedding) for (key, article), embedding, flag in zip(items, embeddings, flags) if not flag]
+
+    def cluster(items):
+        # Later articles about an event take the score of the one scored first
+        representatives = []
+        for key, article, embedding in items:
+            articles[key], embeddings[key] = article, embedding
+            if clusters.add(key, embedding)[1]:
+                representatives.append((key, article))
+        return representatives
+
+    def score_items(items):
+        scores = score([article for _, article in items])
+        return [(key, sentiment, relevance) for (key, _), (sentiment, relevance, _) in zip(items, scores)]
+
+    threads = [
+        threading.Thread(target=run_fetch, name="pipeline-fetch"),
+        threading.Thread(target=_run_stage, args=(stats["normalize"], normalize, fetched, normalized, batch_size, errors), name="pipeline-normalize"),
+        threading.Thread(target=_run_stage, args=(stats["history"], check_history, normalized, checked, batch_size, errors), name="pipeline-history"),
+        threading.Thread(target=_run_stage, args=(stats["cluster"], cluster, checked, clustered, batch_size, errors), name="pipeline-cluster"),
+        threading.Thread(target=_run_stage, args=(stats["score"], score_items, clustered, scored, batch_size, errors, deterministic), name="pipeline-score"),
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Rank: collect scores as they arrive, then order once the stream ends
+    rank = stats["rank"]
+    rank.started = time.perf_counter()
+    cluster_scores = {}
+    done = False
+    while not done:
+        items, done = _take(scored, rank, batch_size)
+        rank.items_in += len(items)
+        for key, sentiment, relevance in items:
+            cluster_scores[clusters.cluster_of[key]] = (sentiment, relevance)
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+    start = time.perf_counter()
+    members = {}
+    for key in grouper.kept():
+        if key in clusters.cluster_of:  # Otherwise posted before
+            members.setdefault(clusters.cluster_of[key], []).append(key)
+    positives, selected = [], []
+    for cluster_id, keys in members.items():
+        sentiment, relevance = cluster_scores[cluster_id]
+        # Rank the scored article if it is still the kept record of its story, else the first kept one
+        representative = clusters.representatives[cluster_id]
+        key = representative if representative in keys else keys[0]
+        article = articles[key]
+        title = article.get("title", "")
+        if sentiment > sentiment_threshold and relevance > relevance_threshold:
+            combined_score = (sentiment + relevance) / 2  # Equal weights
+            ranking_score = combined_score + trending_bonus(len(keys))
+            positives.append((ranking_score, key, article, embeddings[key]))
+            selected.extend((ranking_score, member) for member in keys)
+            logger.info(f"Article selected: {title} (Score: {combined_score}, articles about the story: {len(keys)})")
+        else:
+            logger.info(f"Article rejected: {title} (Sentiment: {sentiment}, Relevance: {relevance})")
+    # Sort by ranking score, ties in batch order
+    positives.sort(key=lambda positive: (-positive[0], positive[1]))
+    selected.sort(key=lambda member: (-member[0], member[1]))
+
+    result = PipelineResult(fetched=stats["fetch"].items_out, selected=[articles[key] for _, key in selected])
+    if positives:
+        flags = flag_candidate_duplicates(np.vstack([embedding for _, _, _, embedding in positives]), np.zeros(len(positives), dtype=bool))
+        for (ranking_score, _, article, _), flag in zip(positives, flags):
+            if flag:
+                logger.info(f"Tweet is a duplicate: {article.get('title')}")
+            else:
+                result.ranked.append((ranking_score, article))
+    rank.busy_seconds += time.perf_counter() - start
+    rank.items_out = len(result.ranked)
+    rank.finished = time.perf_counter()
+
+    result.stats = {name: stats[name].as_dict() for name in names}
+    for name, counters in result.stats.items():
+        metrics.increment("pipeline_items", counters["items_out"], stage=name)
+        metrics.increment("pipeline_busy_seconds", counters["busy_seconds"], stage=name)
+        metrics.increment("pipeline_max_queue_depth", counters["max_queue_depth"], stage=name)
+        logger.info(
+            f"Stage {name}: {counters['items_in']} in, {counters['items_out']} out, "
+            f"{counters['throughput_per_second']} items/s, busy {counters['busy_seconds']}s, "
+            f"max queue depth {counters['max_queue_depth']}"
+        )
+    return result
@@ -0,0 +1,251 @@
+"""
+Runs several bot profiles in one process over a shared article pool.
+
+A profile is a bot account with its own topics, domains, thresholds, hashtags,
+Twitter credentials and posted history. Profiles are read from the JSON file
+named by PROFILES_FILE:
+
+    {"profiles": [
+        {"name": "tech", "topics": ["Indian startups", "ISRO"], "hashtags": " #Tech #India",
+         "credentials_prefix": "TECH_", "relevance_threshold": 0.6},
+        ...
+    ]}
+
+Only name and topics are required; other fields default to the single-bot
+settings. Twitter secrets are never read from the file: a profile with
+credentials_prefix "TECH_" uses TECH_TWITTER_CONSUMER_KEY etc. from the
+environment, and loading fails if any of them is missing. Each profile's
+history is stored under "<HISTORY_PREFIX>-<name>" unless it sets history_prefix.
+
+One run fetches the union of all profiles' topics and domains once, encodes
+the pool once, and scores the sentiment of each article at most once through
+the shared score cache. Relevance is scored locally against each profile's
+topics, then every profile ranks, deduplicates against its own history and
+posts on its own account.
+
+Usage:
+    python profiles.py [profiles.json]
+"""
+import json
+import os
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import numpy as np
+from config import (
+    NEWS_API_KEY, NEWSDATA_API_KEY, DOMAINS, SENTIMENT_THRESHOLD, RELEVANCE_THRESHOLD, AZURE_DEPLOYMENT_NAME,
+    SCORING_CONCURRENCY, SCORING_BATCH_SIZE, WATERMARKS_FILE, WATERMARKS_BLOB_NAME, FETCH_OVERLAP_HOURS, PLANNER_FILE,
+    PLANNER_BLOB_NAME, SCORE_CACHE_FILE, SCORE_CACHE_BLOB_NAME, SCORE_CACHE_TTL_DAYS, SCORE_CACHE_SYNC,
+    DEDUP_TITLE_SIMILARITY, PREFILTER_ENABLED, HISTORY_PREFIX, PROFILES_FILE, METRICS_JSON_FILE, METRICS_PROMETHEUS_FILE,
+    THREAD_PROGRESS_FILE, THREAD_PROGRESS_BLOB_NAME
+)
+from logger import logger
+from metrics import metrics
+from twitter_poster import HASHTAGS, ThreadProgress
+
+# The settings every account needs to post (the bearer token is optional for posting)
+TWITTER_CREDENTIALS = ("TWITTER_CONSUMER_KEY", "TWITTER_CONSUMER_SECRET", "TWITTER_ACCESS_TOKEN", "TWITTER_ACCESS_SECRET")
+
+
+@dataclass
+class Profile:
+    """
+    One bot account and what it posts about.
+    """
+
+    name: str
+    topics: List[str]
+    domains: str = DOMAINS
+    sentiment_threshold: float = SENTIMENT_THRESHOLD
+    relevance_threshold: float = RELEVANCE_THRESHOLD
+    hashtags: str = HASHTAGS
+    credentials_prefix: str = ""  # Prefix of the profile's TWITTER_* environment variables
+    history_prefix: str = ""
+
+    def __post_init__(self):
+        if not self.name or not self.topics:
+            raise ValueError("A profile needs a name and at least one topic.")
+        if not self.history_prefix:
+            self.history_prefix = f"{HISTORY_PREFIX}-{self.name}"
+
+    def thread_progress(self) -> ThreadProgress:
+        """
+        Where the profile's account keeps the progress of the thread it is posting.
+        """
+        root, extension = os.path.splitext(THREAD_PROGRESS_FILE)
+        blob_root, blob_extension = os.path.splitext(THREAD_PROGRESS_BLOB_NAME)
+        return ThreadProgress(f"{root}-{self.name}{extension}", f"{blob_root}-{self.name}{blob_extension}")
+
+
+def load_profiles(path: str, check_credentials: bool = True) -> List[Profile]:
+    """
+    Loads the profiles of a PROFILES_FILE.
+
+    Args:
+        path: The profiles file.
+        check_credentials: Whether every profile's Twitter settings must be set
+            in the environment. Jobs that do not post (e.g. history compaction)
+            skip the check.
+
+    Raises:
+        ValueError: If a profile is invalid, two profiles share a name, a history
+            or an account, or a profile's Twitter settings are missing.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        entries = json.load(file)["profiles"]
+    profiles = [Profile(**entry) for entry in entries]
+    for attribute in ("name", "history_prefix", "credentials_prefix"):
+        values = [getattr(profile, attribute) for profile in profiles]
+        if len(set(values)) != len(values):
+            raise ValueError(f"Profiles must not share a {attribute}: {values}")
+    if check_credentials:
+        for profile in profiles:
+            missing = [f"{profile.credentials_prefix}{name}" for name in TWITTER_CREDENTIALS if not os.getenv(f"{profile.credentials_prefix}{name}")]
+            if missing:
+                raise ValueError(f"Profile '{profile.name}' is missing the environment variables {', '.join(missing)}.")
+    return profiles
+
+
+def history_prefixes(path: Optional[str] = PROFILES_FILE) -> List[str]:
+    """
+    Returns the prefixes of all posted histories: the single bot's, then each profile's.
+    """
+    prefixes = [HISTORY_PREFIX]
+    if path:
+        prefixes += [profile.history_prefix for profile in load_profiles(path, check_credentials=False)]
+    return list(dict.fromkeys(prefixes))
+
+
+def _union(values: List[List[str]]) -> List[str]:
+    # Keeps first-seen order, so the query plan is stable between runs
+    return list(dict.fromkeys(value for group in values for value in group))
+
+
+def run_profiles(profiles: List[Profile]) -> Dict[str, Optional[str]]:
+    """
+    Runs one fetch, score and post cycle for all profiles.
+
+    Returns:
+        The title each profile posted, by profile name (None if it posted nothing).
+    """
+    from clients import get_openai_client, get_tweepy_client
+    from news_fetcher import fetch_all_news
+    from watermarks import FetchWatermarks
+    from query_planner import QueryPlanner
+    from article_dedup import deduplicate_articles
+    from relevance_scorer import TopicRelevance
+    from duplicate_checker import encode_texts, load_history_index, flag_history_duplicates, flag_candidate_duplicates, save_posted_tweet
+    from history_store import migrate_legacy_history
+    from score_cache import ScoreCache
+    from workflow import article_text, score_articles, process_top_article
+    from twitter_poster import MAX_TWEET_LENGTH, LINK_LENGTH, EXTRA, resume_thread
+
+    metrics.reset()
+    posted: Dict[str, Optional[str]] = {profile.name: None for profile in profiles}
+    try:
+        with metrics.stage("history migration"):
+            migrate_legacy_history()
+
+        topics = _union([profile.topics for profile in profiles])
+        domains = ",".join(_union([profile.domains.split(",") for profile in profiles]))
+        watermarks = FetchWatermarks(WATERMARKS_FILE, FETCH_OVERLAP_HOURS, WATERMARKS_BLOB_NAME)
+        planner = QueryPlanner(topics, PLANNER_FILE, PLANNER_BLOB_NAME)
+        with metrics.stage("fetch"):
+            articles = deduplicate_articles(
+                fetch_all_news(topics, domains, NEWS_API_KEY, NEWSDATA_API_KEY, watermarks, planner), DEDUP_TITLE_SIMILARITY
+            )
+        if not articles:
+            planner.save()  # Keep the quota usage of this run
+            logger.warning("No articles fetched from any source.")
+            return posted
+        logger.info(f"Fetched {len(articles)} articles for {len(profiles)} profiles.")
+
+        # Each embedding is computed once and shared by all profiles
+        titles = [article.get("title") or "No Title Available" for article in articles]
+        with metrics.stage("embedding"):
+            title_embeddings = encode_texts(titles)
+            text_embeddings = encode_texts([article_text(article) for article in articles])
+
+        relevances, eligible = {}, {}
+        for profile in profiles:
+            relevances[profile.name] = TopicRelevance(profile.topics).score_embeddings(text_embeddings)
+            try:
+                flags, _ = flag_history_duplicates(titles, load_history_index(profile.history_prefix), title_embeddings)
+            except Exception as e:
+                # Never post an article that could not be checked
+                logger.error(f"Error during duplicate check of profile '{profile.name}': {e}", exc_info=True)
+                flags = np.ones(len(articles), dtype=bool)
+            eligible[profile.name] = ~flags & (relevances[profile.name] > profile.relevance_threshold)
+            metrics.increment("profile_candidates", int(eligible[profile.name].sum()), profile=profile.name)
+
+        # Sentiment does not depend on the profile, so each candidate is scored once for all of them
+        candidates = np.flatnonzero(np.any([eligible[profile.name] for profile in profiles], axis=0))
+        openai_client = get_openai_client()
+        score_cache = ScoreCache(SCORE_CACHE_FILE, SCORE_CACHE_TTL_DAYS, SCORE_CACHE_BLOB_NAME if SCORE_CACHE_SYNC else None)
+        try:
+            best_relevance = np.max([relevances[profile.name] for profile in profiles], axis=0)
+            scores = score_articles(
+                [articles[i] for i in candidates], openai_client, AZURE_DEPLOYMENT_NAME, SCORING_CONCURRENCY,
+                SCORING_BATCH_SIZE, score_cache, PREFILTER_ENABLED, local_relevance=True,
+                relevances=best_relevance[candidates], relevance_threshold=min(profile.relevance_threshold for profile in profiles)
+            )
+        finally:
+            score_cache.close()
+        sentiments = np.zeros(len(articles), dtype=np.float32)
+        sentiments[candidates] = [sentiment for sentiment, _, _ in scores]
+
+        selected = []
+        for profile in profiles:
+            try:
+                thread_pending = resume_thread(get_tweepy_client(profile.credentials_prefix), profile.thread_progress())
+            except Exception as e:
+                logger.error(f"Error resuming a thread of profile '{profile.name}': {e}", exc_info=True)
+                thread_pending = True
+            if thread_pending:
+                # A new thread would replace the progress of the pending one
+                logger.warning(f"Profile '{profile.name}': an earlier thread is still being posted. Not posting a new one in this run.")
+                continue
+            relevance = relevances[profile.name]
+            passed = eligible[profile.name] & (sentiments > profile.sentiment_threshold)
+            ranked = sorted(np.flatnonzero(passed), key=lambda i: -(sentiments[i] + relevance[i]) / 2)
+            selected += [articles[i] for i in ranked]
+            flags = flag_candidate_duplicates(title_embeddings[ranked], np.zeros(len(ranked), dtype=bool)) if ranked else []
+            allowed_summary_length = MAX_TWEET_LENGTH - LINK_LENGTH - len(profile.hashtags) - EXTRA
+            for i in (i for i, flag in zip(ranked, flags) if not flag):
+                logger.info(f"Profile '{profile.name}': processing article: {titles[i]}")
+                try:
+                    with metrics.stage("summarize and post"):
+                        process_top_article(
+                            articles[i], openai_client, get_tweepy_client(profile.credentials_prefix),
+                            AZURE_DEPLOYMENT_NAME, allowed_summary_length, profile.hashtags, profile.thread_progress()
+                        )
+                except Exception as e:
+                    logger.error(f"Error during article processing: {e}", exc_info=True)
+                    continue
+                try:
+                    with metrics.stage("history save"):
+                        save_posted_tweet(titles[i], profile.history_prefix)
+                except Exception as e:
+                    logger.error(f"Error saving posted tweet: {e}", exc_info=True)
+                posted[profile.name] = titles[i]
+                metrics.increment("profile_posts", profile=profile.name)
+                break
+            if posted[profile.name] is None:
+                logger.warning(f"Profile '{profile.name}': no positive, relevant and new article found.")
+
+        watermarks.save()
+        planner.record_selected(selected)
+        planner.save()
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+        metrics.increment("run_errors")
+    finally:
+        metrics.write(METRICS_JSON_FILE, METRICS_PROMETHEUS_FILE)
+    return posted
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else PROFILES_FILE
+    if not path:
+        sys.exit("Usage: python profiles.py <profiles.json> (or set PROFILES_FILE)")
+    run_profiles(load_profiles(path))
@@ -0,0 +1,169 @@
+import json
+import math
+import re
+from datetime import datetime, timezone
+from logger import logger
+from typing import Dict, List, Optional
+from blob_storage import download_blob, upload_blob, BlobConflictError
+from config import (
+    FETCH_RUNS_PER_DAY, QUERIES_PER_RUN, TOPICS_PER_QUERY, MIN_UNSEEN_FRACTION, PLANNER_YIELD_DECAY,
+    PLANNER_EXPLORATION_PER_DAY
+)
+
+
+def _topic_words(topic: str) -> set:
+    # Every topic mentions India, so only the other words tell topics apart
+    return {word for word in re.findall(r"[a-z]+", topic.lower()) if word != "india"}
+
+
+class QueryPlanner:
+    """
+    Chooses the topics each news source queries and how many requests it may spend.
+
+    Every topic has an estimated yield per source: an exponentially weighted
+    average of the selected articles (those passing the sentiment and relevance
+    filter) credited to it per request. Topics are ranked by yield plus a bonus
+    that grows with the time since they were last queried, so topics are
+    rotated deterministically: never-queried topics come first, in TOPICS order,
+    and no topic goes unqueried for long. The best-ranked topics are grouped
+    into QUERIES_PER_RUN queries of TOPICS_PER_QUERY topics.
+
+    Each source's daily request quota is spread over the remaining runs of the
+    day. When blob_name is set, the state is downloaded from Azure Blob Storage
+    on open and uploaded on save; with no path it is kept in memory only.
+    """
+
+    def __init__(self, topics: List[str], path: Optional[str] = None, blob_name: Optional[str] = None, now: Optional[datetime] = None):
+        self.topics = list(topics)
+        self.path = path
+        self.blob_name = blob_name
+        self.now = now or datetime.now(timezone.utc)
+        self.state = self._load()
+        self._budget: Dict[str, int] = {}
+        self._queries: List[Dict] = []  # The queries run in this run, with the articles they fetched
+
+    def _load(self) -> Dict:
+        if self.blob_name:
+            download_blob(self.blob_name, self.path)
+        state = {}
+        if self.path:
+            try:
+                with open(self.path, "r", encoding="utf-8") as file:
+                    state = json.load(file)
+            except (OSError, ValueError):
+                state = {}
+        state.setdefault("topics", {})
+        state.setdefault("usage", {})
+        return state
+
+    def _topic_state(self, source: str, topic: str) -> Dict:
+        return self.state["topics"].setdefault(source, {}).setdefault(topic, {"yield": 0.0, "last_queried": None})
+
+    def _usage(self, source: str) -> Dict:
+        today = self.now.date().isoformat()
+        usage = self.state["usage"].get(source)
+        if not usage or usage.get("date") != today:
+            usage = self.state["usage"][source] = {"date": today, "requests": 0, "runs": 0}
+        return usage
+
+    def priority(self, source: str, topic: str) -> float:
+        """
+        Returns the expected value of querying topic next: its yield per request
+        plus PLANNER_EXPLORATION_PER_DAY for every day since it was last queried.
+        """
+        state = self._topic_state(source, topic)
+        if not state["last_queried"]:
+            return math.inf
+        days = (self.now - datetime.fromisoformat(state["last_queried"])).total_seconds() / 86400
+        return state["yield"] + PLANNER_EXPLORATION_PER_DAY * max(days, 0.0)
+
+    def plan(self, source: str, daily_quota: int, max_pages: int) -> List[List[str]]:
+        """
+        Plans this run's queries for a source and sets its request budget.
+
+        Args:
+            source: The news source.
+            daily_quota: The source's daily request quota.
+            max_pages: The most pages to request per query.
+
+        Returns:
+            The topic groups to query, highest priority first. Empty if the daily
+            quota is spent.
+        """
+        usage = self._usage(source)
+        remaining = max(daily_quota - usage["requests"], 0)
+        runs_left = max(FETCH_RUNS_PER_DAY - usage["runs"], 1)
+        usage["runs"] += 1
+        budget = min(math.ceil(remaining / runs_left), QUERIES_PER_RUN * max_pages)
+        self._budget[source] = budget
+        if budget == 0:
+            logger.warning(f"The daily request quota of {source} is spent. Skipping it this run.")
+            return []
+
+        # sorted() is stable, so ties keep TOPICS order
+        ranked = sorted(self.topics, key=lambda topic: -self.priority(source, topic))
+        query_count = min(QUERIES_PER_RUN, budget, math.ceil(len(ranked) / TOPICS_PER_QUERY))
+        queries = [ranked[i * TOPICS_PER_QUERY:(i + 1) * TOPICS_PER_QUERY] for i in range(query_count)]
+        logger.info(f"Planned {len(queries)} {source} queries with a budget of {budget} requests: {queries}")
+        return queries
+
+    def take_request(self, source: str) -> bool:
+        """
+        Takes one request from the source's budget for this run. Returns False if it is spent.
+        """
+        if self._budget.get(source, 0) <= 0:
+            return False
+        self._budget[source] -= 1
+        self._usage(source)["requests"] += 1
+        return True
+
+    def should_stop_paging(self, unseen_fraction: float) -> bool:
+        """
+        Returns True if a page had too few unseen articles for the next page to be worth a request.
+        """
+        return unseen_fraction < MIN_UNSEEN_FRACTION
+
+    def record(self, source: str, topics: List[str], articles: List[Dict], requests: int) -> None:
+        """
+        Records a query that was run, the articles it fetched and the requests it took.
+        """
+        for topic in topics:
+            self._topic_state(source, topic)["last_queried"] = self.now.isoformat()
+        self._queries.append({"source": source, "topics": topics, "urls": {article.get("url") for article in articles}, "requests": requests})
+
+    def record_selected(self, articles: List[Dict]) -> None:
+        """
+        Credits the articles that passed the filters to the topics that fetched
+        them and updates every queried topic's yield. Call once per run.
+
+        An article is credited to the topics of its query whose words appear in
+        its title or description, or shared across all of them if none do.
+        """
+        for query in self._queries:
+            credit = dict.fromkeys(query["topics"], 0.0)
+            for article in articles:
+                if article.get("url") not in query["urls"]:
+                    continue
+                text = f"{article.get('title') or ''} {article.get('description') or ''}".lower()
+                matched = [topic for topic in query["topics"] if _topic_words(topic) & set(re.findall(r"[a-z]+", text))]
+                for topic in matched or query["topics"]:
+                    credit[topic] += 1 / len(matched or query["topics"])
+            for topic, selected in credit.items():
+                state = self._topic_state(query["source"], topic)
+                observed = selected / max(query["requests"], 1)
+                state["yield"] = PLANNER_YIELD_DECAY * observed + (1 - PLANNER_YIELD_DECAY) * state["yield"]
+
+    def save(self) -> None:
+        """
+        Persists the topic yields and quota usage.
+        """
+        if not self.path:
+            return
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump(self.state, file, indent=2, sort_keys=True)
+        if self.blob_name:
+            try:
+                upload_blob(self.path, self.blob_name)
+            except BlobConflictError:
+                # The state only guides planning; the next run plans from the other run's state
+                logger.warning("Query planner state was updated by another run. Skipping this update.")
@@ -0,0 +1,62 @@
+import threading
+import numpy as np
+from logger import logger
+from typing import List, Optional
+from embedding_backends import get_embedding_backend
+from config import TOPICS, LOCAL_RELEVANCE_FLOOR, LOCAL_RELEVANCE_CEILING
+
+
+class TopicRelevance:
+    """
+    Scores relevance to the configured topics locally, with the embedding model used for dedup.
+
+    The topics are embedded once. An article's relevance is its highest cosine
+    similarity to any topic, mapped linearly from [floor, ceiling] to [0, 1], so
+    a whole run is scored with one encode and one matrix product.
+    """
+
+    def __init__(self, topics: List[str] = TOPICS, floor: float = LOCAL_RELEVANCE_FLOOR, ceiling: float = LOCAL_RELEVANCE_CEILING, backend=None):
+        self.backend = backend or get_embedding_backend()
+        self.topics = list(topics)
+        self.floor = floor
+        self.ceiling = ceiling
+        self.centroids = self.backend.encode(self.topics)
+
+    def similarities(self, texts: List[str]) -> np.ndarray:
+        """
+        Returns the (len(texts), len(topics)) cosine similarities of the texts to the topics.
+        """
+        return self.backend.encode(texts) @ self.centroids.T
+
+    def score(self, texts: List[str]) -> np.ndarray:
+        """
+        Returns the normalized relevance (0 to 1) of each text.
+        """
+        if not texts:
+            return np.empty(0, dtype=np.float32)
+        return self.score_embeddings(self.backend.encode(texts))
+
+    def score_embeddings(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Returns the normalized relevance of texts that are already encoded, e.g. one pool scored for several topic sets.
+        """
+        if not len(embeddings):
+            return np.empty(0, dtype=np.float32)
+        best = (embeddings @ self.centroids.T).max(axis=1)
+        return np.clip((best - self.floor) / (self.ceiling - self.floor), 0.0, 1.0)
+
+
+_scorer: Optional[TopicRelevance] = None
+_scorer_lock = threading.Lock()
+
+
+def get_topic_relevance() -> TopicRelevance:
+    """
+    Returns the process-wide TopicRelevance, embedding the topics on first use.
+    """
+    global _scorer
+    with _scorer_lock:
+        if _scorer is None:
+            logger.info(f"Embedding {len(TOPICS)} topics for local relevance scoring...")
+            _scorer = TopicRelevance()
+        return _scorer
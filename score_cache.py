@@ -0,0 +1,135 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from logger import logger
+from typing import Optional, Tuple
+from blob_storage import download_blob, upload_blob, BlobConflictError
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """
+    Normalizes text for hashing: lowercases it and collapses whitespace.
+    """
+    return re.sub(r"\s+", " ", (text or "").strip().lower())
+
+
+def article_cache_key(title: Optional[str], description: Optional[str], model: str, version: str) -> str:
+    """
+    Builds the cache key for an article from its normalized title and description,
+    the scoring model and the scoring prompt version.
+    """
+    content = "\x1f".join([version, model, normalize_text(title), normalize_text(description)])
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ScoreCache:
+    """
+    Persistent SQLite cache of (sentiment, relevance) scores keyed by article content hash.
+
+    When blob_name is set, the database is downloaded from Azure Blob Storage on
+    open and uploaded again on close, so scores survive across scheduled runs.
+    """
+
+    def __init__(self, path: str, ttl_days: float, blob_name: Optional[str] = None):
+        self.path = path
+        self.ttl_seconds = ttl_days * 24 * 60 * 60
+        self.blob_name = blob_name
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if blob_name:
+            download_blob(blob_name, path)
+        try:
+            self._conn = self._connect()
+        except sqlite3.DatabaseError as e:
+            logger.warning(f"Score cache '{path}' is unreadable ({e}). Starting with an empty cache.")
+            os.remove(path)
+            self._conn = self._connect()
+        self.evict_expired()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            "key TEXT PRIMARY KEY, sentiment REAL NOT NULL, relevance REAL NOT NULL, scored_at REAL NOT NULL)"
+        )
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[float, float]]:
+        """
+        Returns the cached (sentiment, relevance) for key, or None if it is missing or expired.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sentiment, relevance FROM scores WHERE key = ? AND scored_at >= ?",
+                (key, time.time() - self.ttl_seconds)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0], row[1]
+
+    def put(self, key: str, sentiment: float, relevance: float) -> None:
+        """
+        Stores the scores for key, replacing any previous entry.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO scores (key, sentiment, relevance, scored_at) VALUES (?, ?, ?, ?)",
+                (key, sentiment, relevance, time.time())
+            )
+            self._conn.commit()
+
+    def evict_expired(self) -> int:
+        """
+        Deletes entries older than the TTL and returns how many were removed.
+        """
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM scores WHERE scored_at < ?", (time.time() - self.ttl_seconds,))
+            self._conn.commit()
+        if cursor.rowcount:
+            logger.info(f"Evicted {cursor.rowcount} expired entries from the score cache.")
+        return cursor.rowcount
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def sync(self) -> None:
+        """
+        Evicts expired entries and uploads the database without closing it, for
+        processes that keep the cache open across runs.
+
+        If another run changed the blob since it was read, the cache is reloaded
+        from the blob, discarding the scores added since.
+        """
+        self.evict_expired()
+        if not self.blob_name:
+            return
+        with self._lock:
+            try:
+                upload_blob(self.path, self.blob_name)
+            except BlobConflictError:
+                logger.warning("Score cache was updated by another run. Reloading it and discarding this run's new scores.")
+                self._conn.close()
+                download_blob(self.blob_name, self.path)
+                self._conn = self._connect()
+
+    def close(self) -> None:
+        """
+        Closes the database and uploads it to Azure Blob Storage when syncing is enabled.
+        """
+        logger.info(f"Score cache hits: {self.hits}, misses: {self.misses}, hit rate: {self.hit_rate:.0%}")
+        with self._lock:
+            self._conn.close()
+        if self.blob_name:
+            try:
+                upload_blob(self.path, self.blob_name)
+            except BlobConflictError:
+                logger.warning("Score cache was updated by another run. Discarding this run's new scores.")
@@ -0,0 +1,380 @@
+"""
+Offline evaluation of local scoring shortcuts against the LLM scorer.
+
+A dataset is a JSON Lines file of articles ({"title", "description", "url"})
+labelled with the LLM's normalized "sentiment" and "relevance" scores. The
+`collect` command fetches current news and labels it; the prefilter and
+relevance commands never call OpenAI, so thresholds can be tuned as often as
+needed. The logprobs command scores the dataset's articles once more in the
+"logprobs" SCORING_MODE (only those not scored that way yet) and reports its
+calibration against the labels.
+
+Usage:
+    python scoring_eval.py collect dataset.jsonl
+    python scoring_eval.py prefilter dataset.jsonl [--min-polarity -0.4 -0.2 0] [--output report.json]
+    python scoring_eval.py relevance dataset.jsonl [--output report.json]
+    python scoring_eval.py logprobs dataset.jsonl [--output report.json]
+"""
+import argparse
+import json
+import math
+import os
+from typing import Dict, List, Optional
+import numpy as np
+from logger import logger
+from config import SENTIMENT_THRESHOLD, RELEVANCE_THRESHOLD, SCORING_BATCH_SIZE
+
+DEFAULT_MIN_POLARITIES = [-0.5, -0.4, -0.3, -0.2, -0.1, 0.0]
+
+
+def load_dataset(path: str) -> List[Dict]:
+    """
+    Loads a labelled dataset, or an empty one if the file does not exist.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def save_dataset(path: str, records: List[Dict]) -> None:
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        for record in records:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(f"{path}.tmp", path)
+
+
+def is_llm_positive(record: Dict, sentiment_threshold: float = SENTIMENT_THRESHOLD, relevance_threshold: float = RELEVANCE_THRESHOLD) -> bool:
+    """
+    Whether the LLM labels select the article, as filter_positive_articles would.
+    """
+    return record["sentiment"] > sentiment_threshold and record["relevance"] > relevance_threshold
+
+
+def requests_needed(articles: int, batch_size: int) -> int:
+    return math.ceil(articles / max(1, batch_size))
+
+
+def evaluate_prefilter(
+    records: List[Dict],
+    min_polarities: List[float] = DEFAULT_MIN_POLARITIES,
+    sentiment_threshold: float = SENTIMENT_THRESHOLD,
+    relevance_threshold: float = RELEVANCE_THRESHOLD,
+    batch_size: int = SCORING_BATCH_SIZE
+) -> List[Dict]:
+    """
+    Reports, for each prefilter threshold, how many LLM calls it saves and how many LLM-selected articles it loses.
+
+    Args:
+        records: Labelled articles.
+        min_polarities: The PREFILTER_MIN_POLARITY values to evaluate.
+        sentiment_threshold: The selection threshold applied to the LLM labels.
+        relevance_threshold: The selection threshold applied to the LLM labels.
+        batch_size: Articles per OpenAI request, to estimate the requests saved.
+
+    Returns:
+        One report per threshold with the recall of LLM positives, the articles
+        and requests saved, and the titles of the positives that were lost.
+    """
+    from sentiment_analysis import prefilter_signals, is_clear_reject
+    from workflow import article_text
+
+    texts = [article_text(record) for record in records]
+    signals = [prefilter_signals(text) for text in texts]
+    positives = [is_llm_positive(record, sentiment_threshold, relevance_threshold) for record in records]
+    reports = []
+    for min_polarity in min_polarities:
+        rejected = [is_clear_reject(text, min_polarity, signal) for text, signal in zip(texts, signals)]
+        missed = [record.get("title") for record, positive, reject in zip(records, positives, rejected) if positive and reject]
+        sent = len(records) - sum(rejected)
+        reports.append({
+            "min_polarity": min_polarity,
+            "articles": len(records),
+            "llm_positives": sum(positives),
+            "recall": (sum(positives) - len(missed)) / sum(positives) if any(positives) else 1.0,
+            "articles_not_scored": sum(rejected),
+            "requests_saved": requests_needed(len(records), batch_size) - requests_needed(sent, batch_size),
+            "missed_positives": missed,
+        })
+    return reports
+
+
+def _ranks(values: np.ndarray) -> np.ndarray:
+    """
+    Ranks of the values, with ties sharing their average rank.
+    """
+    order = np.argsort(values, kind="stable")
+    ranks = np.empty(len(values))
+    ranks[order] = np.arange(len(values))
+    for value in np.unique(values):
+        tied = values == value
+        ranks[tied] = ranks[tied].mean()
+    return ranks
+
+
+def _correlation(a: np.ndarray, b: np.ndarray) -> float:
+    if len(a) < 2 or a.std() == 0 or b.std() == 0:
+        return 0.0
+    return float(np.corrcoef(a, b)[0, 1])
+
+
+def evaluate_relevance(
+    records: List[Dict],
+    scorer=None,
+    sentiment_threshold: float = SENTIMENT_THRESHOLD,
+    relevance_threshold: float = RELEVANCE_THRESHOLD
+) -> Dict:
+    """
+    Reports how well local topic-centroid relevance agrees with the LLM's relevance labels.
+
+    Args:
+        records: Labelled articles.
+        scorer: A relevance_scorer.TopicRelevance (defaults to the configured one).
+        sentiment_threshold: The selection threshold applied to the LLM sentiment.
+        relevance_threshold: The selection threshold applied to both relevances.
+
+    Returns:
+        Correlations and mean absolute error between the two relevances, agreement
+        on passing relevance_threshold, and agreement on the selected articles
+        when the LLM's sentiment is combined with local relevance.
+    """
+    from workflow import article_text
+    if scorer is None:
+        from relevance_scorer import get_topic_relevance
+        scorer = get_topic_relevance()
+
+    local = scorer.score([article_text(record) for record in records]).astype(float)
+    llm = np.array([record["relevance"] for record in records], dtype=float)
+    local_pass, llm_pass = local > relevance_threshold, llm > relevance_threshold
+    llm_selected = np.array([is_llm_positive(record, sentiment_threshold, relevance_threshold) for record in records], dtype=bool)
+    local_selected = np.array([record["sentiment"] > sentiment_threshold for record in records], dtype=bool) & local_pass
+    return {
+        "articles": len(records),
+        "pearson": _correlation(local, llm),
+        "spearman": _correlation(_ranks(local), _ranks(llm)),
+        "mean_absolute_error": float(np.abs(local - llm).mean()) if len(records) else 0.0,
+        "threshold_agreement": float((local_pass == llm_pass).mean()) if len(records) else 1.0,
+        "threshold_recall": float((local_pass & llm_pass).sum() / llm_pass.sum()) if llm_pass.any() else 1.0,
+        "llm_selected": int(llm_selected.sum()),
+        "local_selected": int(local_selected.sum()),
+        "selection_recall": float((local_selected & llm_selected).sum() / llm_selected.sum()) if llm_selected.any() else 1.0,
+        "selection_precision": float((local_selected & llm_selected).sum() / local_selected.sum()) if local_selected.any() else 1.0,
+        "missed_selections": [record.get("title") for record, lost in zip(records, llm_selected & ~local_selected) if lost],
+    }
+
+
+def _calibration(candidate: np.ndarray, reference: np.ndarray, bins: int) -> List[Dict]:
+    """
+    Mean reference score of the articles in each equal-width bin of the candidate score.
+    """
+    indices = np.minimum((candidate * bins).astype(int), bins - 1)
+    return [
+        {
+            "low": index / bins,
+            "high": (index + 1) / bins,
+            "articles": int((indices == index).sum()),
+            "mean_score": float(candidate[indices == index].mean()),
+            "mean_reference": float(reference[indices == index].mean()),
+        }
+        for index in range(bins) if (indices == index).any()
+    ]
+
+
+def _compare_scores(candidate: np.ndarray, reference: np.ndarray, threshold: float, bins: int) -> Dict:
+    candidate_pass, reference_pass = candidate > threshold, reference > threshold
+    calibration = _calibration(candidate, reference, bins)
+    return {
+        "pearson": _correlation(candidate, reference),
+        "spearman": _correlation(_ranks(candidate), _ranks(reference)),
+        "mean_absolute_error": float(np.abs(candidate - reference).mean()) if len(candidate) else 0.0,
+        "mean_shift": float((candidate - reference).mean()) if len(candidate) else 0.0,
+        "threshold_agreement": float((candidate_pass == reference_pass).mean()) if len(candidate) else 1.0,
+        "threshold_recall": float((candidate_pass & reference_pass).sum() / reference_pass.sum()) if reference_pass.any() else 1.0,
+        # Mean gap between the bins' mean scores and mean reference scores, weighted by articles
+        "calibration_error": sum(abs(b["mean_score"] - b["mean_reference"]) * b["articles"] for b in calibration) / len(candidate) if len(candidate) else 0.0,
+        "calibration": calibration,
+    }
+
+
+def evaluate_logprobs(
+    records: List[Dict],
+    sentiment_threshold: float = SENTIMENT_THRESHOLD,
+    relevance_threshold: float = RELEVANCE_THRESHOLD,
+    bins: int = 10
+) -> Dict:
+    """
+    Reports how well the logprob scorer agrees with, and is calibrated against, the current scorer's labels.
+
+    Args:
+        records: Labelled articles; only those with logprob scores are compared.
+        sentiment_threshold: The selection threshold applied to both sentiments.
+        relevance_threshold: The selection threshold applied to both relevances.
+        bins: Equal-width bins of the logprob score in the calibration tables.
+
+    Returns:
+        For sentiment and relevance: correlations, mean absolute error and shift,
+        threshold agreement and a calibration table (mean label per bin of the
+        logprob score). Also the agreement on selected articles and the mean
+        scoring latency per article.
+    """
+    records = [record for record in records if "logprob_sentiment" in record]
+    report = {"articles": len(records)}
+    for name, threshold in (("sentiment", sentiment_threshold), ("relevance", relevance_threshold)):
+        candidate = np.array([record[f"logprob_{name}"] for record in records], dtype=float)
+        reference = np.array([record[name] for record in records], dtype=float)
+        report[name] = _compare_scores(candidate, reference, threshold, bins)
+    llm_selected = np.array([is_llm_positive(record, sentiment_threshold, relevance_threshold) for record in records], dtype=bool)
+    logprob_selected = np.array([
+        record["logprob_sentiment"] > sentiment_threshold and record["logprob_relevance"] > relevance_threshold for record in records
+    ], dtype=bool)
+    report.update({
+        "llm_selected": int(llm_selected.sum()),
+        "logprob_selected": int(logprob_selected.sum()),
+        "selection_recall": float((logprob_selected & llm_selected).sum() / llm_selected.sum()) if llm_selected.any() else 1.0,
+        "selection_precision": float((logprob_selected & llm_selected).sum() / logprob_selected.sum()) if logprob_selected.any() else 1.0,
+        "missed_selections": [record.get("title") for record, lost in zip(records, llm_selected & ~logprob_selected) if lost],
+        "added_selections": [record.get("title") for record, added in zip(records, logprob_selected & ~llm_selected) if added],
+        "mean_latency_seconds": float(np.mean([record.get("logprob_latency", 0.0) for record in records])) if records else 0.0,
+    })
+    return report
+
+
+def score_logprobs(path: str) -> List[Dict]:
+    """
+    Scores the dataset's articles that have no logprob scores yet in the "logprobs" scoring mode, and saves them.
+
+    Returns:
+        The dataset's records.
+    """
+    from config import AZURE_DEPLOYMENT_NAME, SCORING_CONCURRENCY
+    from clients import get_openai_client
+    from workflow import score_articles
+    from metrics import metrics
+
+    records = load_dataset(path)
+    pending = [record for record in records if "logprob_sentiment" not in record]
+    metrics.reset()
+    scores = score_articles(pending, get_openai_client(), AZURE_DEPLOYMENT_NAME, SCORING_CONCURRENCY, 1, scoring_mode="logprobs")
+    for record, (sentiment, relevance, latency) in zip(pending, scores):
+        if (sentiment, relevance) == (0.0, 0.0):
+            continue  # The fallback for failed requests is not a score
+        record.update(logprob_sentiment=sentiment, logprob_relevance=relevance, logprob_latency=latency)
+    save_dataset(path, records)
+    if pending:
+        logger.info(
+            f"Scored {len(pending)} articles with {metrics.value('openai_requests'):g} requests, "
+            f"{metrics.value('openai_prompt_tokens') / len(pending):.0f} prompt and "
+            f"{metrics.value('openai_completion_tokens') / len(pending):.1f} completion tokens per article."
+        )
+    return records
+
+
+def collect(path: str) -> None:
+    """
+    Fetches current news, labels new articles with the LLM scorer and appends them to the dataset.
+    """
+    from config import TOPICS, DOMAINS, NEWS_API_KEY, NEWSDATA_API_KEY, AZURE_DEPLOYMENT_NAME, SCORING_CONCURRENCY
+    from clients import get_openai_client
+    from news_fetcher import fetch_all_news
+    from article_dedup import deduplicate_articles
+    from workflow import score_articles
+
+    records = load_dataset(path)
+    known = {(record.get("title"), record.get("url")) for record in records}
+    articles = [
+        {"title": article.get("title"), "description": article.get("description"), "url": article.get("url")}
+        for article in deduplicate_articles(fetch_all_news(TOPICS, DOMAINS, NEWS_API_KEY, NEWSDATA_API_KEY))
+        if (article.get("title"), article.get("url")) not in known
+    ]
+    scores = score_articles(articles, get_openai_client(), AZURE_DEPLOYMENT_NAME, SCORING_CONCURRENCY, SCORING_BATCH_SIZE, scoring_mode="json")
+    for article, (sentiment, relevance, _) in zip(articles, scores):
+        if (sentiment, relevance) == (0.0, 0.0):
+            continue  # The fallback for failed requests is not a label
+        records.append(dict(article, sentiment=sentiment, relevance=relevance))
+    save_dataset(path, records)
+    logger.info(f"Dataset '{path}' has {len(records)} labelled articles.")
+
+
+def print_prefilter_report(reports: List[Dict]) -> None:
+    print(f"{'min polarity':>12} {'recall':>7} {'not scored':>11} {'requests saved':>15}")
+    for report in reports:
+        print(
+            f"{report['min_polarity']:>12g} {report['recall']:>7.1%} "
+            f"{report['articles_not_scored']:>5}/{report['articles']:<5} {report['requests_saved']:>15}"
+        )
+    for report in reports:
+        for title in report["missed_positives"]:
+            print(f"  min polarity {report['min_polarity']:g} loses: {title}")
+
+
+def print_relevance_report(report: Dict) -> None:
+    print(f"Local vs LLM relevance over {report['articles']} articles:")
+    print(f"  Pearson {report['pearson']:.3f}, Spearman {report['spearman']:.3f}, MAE {report['mean_absolute_error']:.3f}")
+    print(f"  Relevance threshold: {report['threshold_agreement']:.1%} agreement, {report['threshold_recall']:.1%} recall")
+    print(
+        f"  Selected: {report['local_selected']} locally vs {report['llm_selected']} by the LLM "
+        f"(recall {report['selection_recall']:.1%}, precision {report['selection_precision']:.1%})"
+    )
+    for title in report["missed_selections"]:
+        print(f"  Lost: {title}")
+
+
+def print_logprob_report(report: Dict) -> None:
+    print(f"Logprob vs current scorer over {report['articles']} articles:")
+    for name in ("sentiment", "relevance"):
+        scores = report[name]
+        print(
+            f"  {name.capitalize()}: Pearson {scores['pearson']:.3f}, Spearman {scores['spearman']:.3f}, "
+            f"MAE {scores['mean_absolute_error']:.3f}, shift {scores['mean_shift']:+.3f}, "
+            f"calibration error {scores['calibration_error']:.3f}, threshold agreement {scores['threshold_agreement']:.1%}"
+        )
+        for b in scores["calibration"]:
+            print(f"    {b['low']:.1f}-{b['high']:.1f}: {b['articles']:>5} articles, mean {b['mean_score']:.3f} vs {b['mean_reference']:.3f}")
+    print(
+        f"  Selected: {report['logprob_selected']} with logprobs vs {report['llm_selected']} currently "
+        f"(recall {report['selection_recall']:.1%}, precision {report['selection_precision']:.1%}), "
+        f"{report['mean_latency_seconds']:.2f}s per article"
+    )
+    for title in report["missed_selections"]:
+        print(f"  Lost: {title}")
+    for title in report["added_selections"]:
+        print(f"  Added: {title}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    collect_parser = commands.add_parser("collect", help="Fetch and label current news with the LLM scorer")
+    collect_parser.add_argument("dataset")
+    prefilter_parser = commands.add_parser("prefilter", help="Evaluate the local prefilter against the LLM labels")
+    prefilter_parser.add_argument("dataset")
+    prefilter_parser.add_argument("--min-polarity", type=float, nargs="+", default=DEFAULT_MIN_POLARITIES)
+    prefilter_parser.add_argument("--output", help="Write the report as JSON")
+    relevance_parser = commands.add_parser("relevance", help="Compare local topic-centroid relevance with the LLM labels")
+    relevance_parser.add_argument("dataset")
+    relevance_parser.add_argument("--output", help="Write the report as JSON")
+    logprobs_parser = commands.add_parser("logprobs", help="Score with the logprobs scoring mode and report its calibration against the labels")
+    logprobs_parser.add_argument("dataset")
+    logprobs_parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == "collect":
+        collect(args.dataset)
+        return
+
+    if args.command == "prefilter":
+        reports = evaluate_prefilter(load_dataset(args.dataset), args.min_polarity)
+        print_prefilter_report(reports)
+    elif args.command == "logprobs":
+        reports = evaluate_logprobs(score_logprobs(args.dataset))
+        print_logprob_report(reports)
+    else:
+        reports = evaluate_relevance(load_dataset(args.dataset))
+        print_relevance_report(reports)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(reports, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import math
+import urllib.parse
+from datetime import datetime, timezone
+from logger import logger
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from article_dedup import deduplicate_articles
+from duplicate_checker import load_history_index, flag_history_duplicates
+from story_clustering import StoryClusters, trending_bonus
+from watermarks import parse_published_at
+from config import DOMAINS, DEDUP_TITLE_SIMILARITY
+
+# Weights of the cheap prior that decides the order in which articles are scored
+RECENCY_WEIGHT = 0.4
+RECENCY_HALF_LIFE_HOURS = 24
+SOURCE_WEIGHT = 0.2  # Articles from the configured DOMAINS
+LOCAL_SCORE_WEIGHT = 0.4  # TextBlob polarity and growth keywords
+
+
+def _host(url: Optional[str]) -> str:
+    host = urllib.parse.urlsplit(url or "").netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def article_prior(article: Dict, now: datetime, domains: set) -> float:
+    """
+    Estimates, without an LLM call, how likely an article is to be selected.
+
+    Recent articles from the configured domains with a positive local score come
+    first. Clear rejects of the local prefilter come last.
+
+    Returns:
+        A score where higher is more promising.
+    """
+    from sentiment_analysis import prefilter_signals, is_clear_reject
+    from workflow import article_text
+
+    text = article_text(article)
+    signals = prefilter_signals(text)
+    if is_clear_reject(text, signals=signals):
+        return -1.0
+    polarity, growth_keywords, _ = signals
+    published = parse_published_at(article.get("publishedAt"))
+    age_hours = max((now - published).total_seconds() / 3600, 0.0) if published else 2 * RECENCY_HALF_LIFE_HOURS
+    return (
+        RECENCY_WEIGHT * 0.5 ** (age_hours / RECENCY_HALF_LIFE_HOURS)
+        + SOURCE_WEIGHT * (_host(article.get("url")) in domains)
+        + LOCAL_SCORE_WEIGHT * ((polarity + 1) / 2 + min(growth_keywords, 3) / 3) / 2
+    )
+
+
+class LazySelection:
+    """
+    Scores articles in order of a cheap prior and yields candidates as soon as they are good enough.
+
+    Only one article is posted per run, so there is no need to score every
+    article before trying the best one. `ranked` is a generator: articles are
+    scored in chunks of chunk_size, and a positive article whose ranking score
+    reaches good_enough is yielded right away. Once every article is scored, the
+    remaining positives are yielded best first, as with exhaustive ranking.
+    The caller stops scoring by no longer iterating.
+
+    With cluster_similarity, only the most promising article about each event
+    is scored, and events reported by many articles get a trending bonus (see
+    story_clustering).
+
+    Attributes:
+        fetched: The number of articles fetched.
+        selected: The positive articles found so far, in the order they were scored.
+        ranked: Iterator of (ranking score, article) candidates.
+        complete: Whether every candidate has been scored, i.e. all fetched
+            articles have been considered.
+    """
+
+    def __init__(
+        self,
+        articles: List[Dict],
+        score: Callable,
+        sentiment_threshold: float,
+        relevance_threshold: float,
+        good_enough: float,
+        chunk_size: int,
+        title_similarity: float = DEDUP_TITLE_SIMILARITY,
+        cluster_similarity: Optional[float] = None,
+        now: Optional[datetime] = None,
+        load_history: Optional[Callable] = None
+    ):
+        self.articles = articles
+        self.score = score
+        self.sentiment_threshold = sentiment_threshold
+        self.relevance_threshold = relevance_threshold
+        self.good_enough = good_enough
+        self.chunk_size = max(1, chunk_size)
+        self.title_similarity = title_similarity
+        self.cluster_similarity = cluster_similarity
+        self.now = now or datetime.now(timezone.utc)
+        self.load_history = load_history or load_history_index
+        self.fetched = len(articles)
+        self.candidates = 0
+        self.scored = 0
+        self.selected: List[Dict] = []
+        self.complete = False
+        self.ranked: Iterator[Tuple[float, Dict]] = self._rank()
+
+    def _unposted(self) -> Tuple[List[Dict], List]:
+        """
+        Collapses syndicated stories and drops those already posted.
+
+        Returns:
+            The remaining articles and their title embeddings.
+        """
+        articles = deduplicate_articles(self.articles, self.title_similarity)
+        titles = [article.get("title") or "No Title Available" for article in articles]
+        try:
+            flags, embeddings = flag_history_duplicates(titles, self.load_history())
+        except Exception as e:
+            logger.error(f"Error during duplicate check: {e}", exc_info=True)
+            return [], []  # Never post an article that could not be checked
+        for title, flag in zip(titles, flags):
+            if flag:
+                logger.info(f"Tweet is a duplicate: {title}")
+        kept = [i for i, flag in enumerate(flags) if not flag]
+        return [articles[i] for i in kept], [embeddings[i] for i in kept]
+
+    def _rank(self) -> Iterator[Tuple[float, Dict]]:
+        domains = set(DOMAINS.split(","))
+        articles, embeddings = self._unposted()
+        self.candidates = len(articles)
+        priors = [article_prior(article, self.now, domains) for article in articles]
+        order = sorted(range(len(articles)), key=lambda i: -priors[i])
+
+        # Cluster in prior order, so the most promising article about an event is the one scored
+        clusters = StoryClusters(self.cluster_similarity if self.cluster_similarity is not None else 2.0)
+        members = {}
+        for i in order:
+            members.setdefault(clusters.add(i, embeddings[i])[0], []).append(i)
+        representatives = [clusters.representatives[cluster] for cluster in range(len(clusters))]
+        if len(representatives) < len(order):
+            logger.info(f"{len(order)} candidate articles report {len(representatives)} stories.")
+
+        positives = []  # (ranking score, scoring order, article) not yet yielded
+        for start in range(0, len(representatives), self.chunk_size):
+            chunk = [articles[i] for i in representatives[start:start + self.chunk_size]]
+            scores = self.score(chunk)
+            for offset, (article, (sentiment, relevance, _)) in enumerate(zip(chunk, scores)):
+                title = article.get("title", "")
+                if sentiment > self.sentiment_threshold and relevance > self.relevance_threshold:
+                    cluster = members[start + offset]  # Clusters are numbered in the order of their representatives
+                    combined_score = (sentiment + relevance) / 2  # Equal weights
+                    positives.append((combined_score + trending_bonus(len(cluster)), start + offset, article))
+                    self.selected.extend(articles[i] for i in cluster)
+                    logger.info(f"Article selected: {title} (Score: {combined_score}, articles about the story: {len(cluster)})")
+                else:
+                    logger.info(f"Article rejected: {title} (Sentiment: {sentiment}, Relevance: {relevance})")
+            self.scored += len(chunk)
+            positives.sort(key=lambda positive: (-positive[0], positive[1]))
+            while positives and positives[0][0] >= self.good_enough:
+                ranking_score, _, article = positives.pop(0)
+                logger.info(f"Good enough after scoring {self.scored} of {self.candidates} articles: {article.get('title', '')}")
+                yield ranking_score, article
+        self.complete = True
+        for ranking_score, _, article in positives:
+            yield ranking_score, article
+
+    def report(self) -> Dict:
+        """
+        Logs and returns how much scoring the early exit avoided compared with exhaustive scoring.
+        """
+        avoided = self.candidates - self.scored
+        report = {
+            "candidates": self.candidates,
+            "scored": self.scored,
+            "scorings_avoided": avoided,
+            "scoring_rounds_avoided": math.ceil(self.candidates / self.chunk_size) - math.ceil(self.scored / self.chunk_size),
+        }
+        logger.info(
+            f"Lazy selection scored {self.scored} of {self.candidates} candidate articles "
+            f"({avoided} scorings and {report['scoring_rounds_avoided']} scoring rounds avoided)."
+        )
+        return report
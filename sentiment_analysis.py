@@ -1,6 +1,41 @@
 from logger import logger  # Import the centralized logger
-from textblob import TextBlob
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
+import json
+import math
+import re
+from metrics import metrics
+from config import PREFILTER_MIN_POLARITY, SCORING_TOP_LOGPROBS
+
+# Bump whenever the scoring prompts change, so cached scores from older prompts are not reused
+SCORING_PROMPT_VERSION = "1"
+SENTIMENT_ONLY_PROMPT_VERSION = "sentiment-1"
+LOGPROB_PROMPT_VERSION = "logprob-1"
+SENTIMENT_ONLY_LOGPROB_PROMPT_VERSION = "logprob-sentiment-1"
+
+LOGPROB_SENTIMENT_PROMPT = (
+    "Rate the sentiment of the following text from 0 (very negative) to 9 (very positive), with 4 or 5 for neutral.\n\n"
+    "Text: {text}\n\n"
+    "Answer with a single digit."
+)
+LOGPROB_RELEVANCE_PROMPT = (
+    "Rate how closely the following text aligns with the 'India growth story', from 0 (not at all) to 9 (entirely).\n\n"
+    "Text: {text}\n\n"
+    "Answer with a single digit."
+)
+
+GROWTH_KEYWORDS = [
+    "growth", "development", "success", "boom", "investment", "expansion",
+    "milestone", "achievement", "launched", "innovation", "breakthrough"
+]
+
+# Crime and disaster headlines read as neutral to TextBlob ("5 killed in bus accident" has polarity 0)
+# Keywords match at the start of a word; "die" must not start a compound such as "Die-casting"
+NEGATIVE_KEYWORDS = re.compile(
+    r"\b(kill|dead\b|death|die[sd]?\b(?!-)|murder|rape|assault|arrest|accident|crash|collapse|fire\b|blast|"
+    r"explosion|flood|drown|earthquake|cyclone|landslide|riot|clash|attack|terror|scam|fraud|suicide|stampede)",
+    re.IGNORECASE
+)
+
 
 def analyze_sentiment_with_textblob_and_filter(text):
     """
@@ -12,22 +47,75 @@ def analyze_sentiment_with_textblob_and_filter(text):
     Returns:
         A tuple containing the sentiment score and relevance score.
     """
-    growth_keywords = [
-        "growth", "development", "success", "boom", "investment", "expansion",
-        "milestone", "achievement", "launched", "innovation", "breakthrough"
-    ]
+    from textblob import TextBlob  # Imported on first use: textblob loads nltk, which is slow to import
 
     sentiment = TextBlob(text).sentiment.polarity
 
     # Relevance scoring
-    relevance_score = sum(1 for keyword in growth_keywords if keyword.lower() in text.lower())
+    relevance_score = sum(1 for keyword in GROWTH_KEYWORDS if keyword.lower() in text.lower())
 
-    logger.info(f"Text: {text}")
-    logger.info(f"Sentiment: {sentiment}, Relevance: {relevance_score}")
+    logger.debug(f"Text: {text}")
+    logger.debug(f"Sentiment: {sentiment}, Relevance: {relevance_score}")
 
     return sentiment, relevance_score
 
 
+def prefilter_signals(text: str) -> Tuple[float, int, bool]:
+    """
+    Computes the local signals the prefilter decides on.
+
+    Returns:
+        A tuple of TextBlob polarity, the number of growth keywords, and whether
+        the text reads like a crime or disaster report.
+    """
+    sentiment, relevance = analyze_sentiment_with_textblob_and_filter(text)
+    return sentiment, relevance, NEGATIVE_KEYWORDS.search(text) is not None
+
+
+def is_clear_reject(text: str, min_polarity: float = PREFILTER_MIN_POLARITY, signals: Optional[Tuple[float, int, bool]] = None) -> bool:
+    """
+    Decides locally whether an article is an obvious reject that need not be sent to OpenAI.
+
+    An article without any growth keyword is a clear reject when its TextBlob
+    polarity is below min_polarity or it reads like a crime or disaster report.
+    Articles mentioning growth are always left to the LLM.
+
+    Args:
+        text: The text to analyze.
+        min_polarity: TextBlob polarity (-1 to 1) below which articles are rejected.
+        signals: Precomputed prefilter_signals(text), e.g. to try several thresholds.
+
+    Returns:
+        True if the article can be rejected without an LLM call.
+    """
+    sentiment, relevance, negative = signals or prefilter_signals(text)
+    if relevance > 0:
+        return False
+    return sentiment < min_polarity or negative
+
+
+def normalize_scores(sentiment: float, relevance: float) -> Tuple[float, float]:
+    """
+    Normalizes raw model scores to the 0 to 1 range.
+
+    Args:
+        sentiment: Sentiment score between -1 and 1.
+        relevance: Relevance score between 0 and 10.
+
+    Returns:
+        A tuple containing the normalized sentiment and relevance scores.
+    """
+    # Normalize sentiment (-1 to 1 -> 0 to 1)
+    normalized_sentiment = (sentiment + 1) / 2
+    # Normalize relevance (0 to 10 -> 0 to 1)
+    normalized_relevance = relevance / 10
+
+    # Log normalized scores
+    logger.info(f"Normalized Sentiment: {normalized_sentiment}, Normalized Relevance: {normalized_relevance}")
+
+    return normalized_sentiment, normalized_relevance
+
+
 def analyze_sentiment_with_openai(client, text: str, model: str) -> Tuple[float, float]:
     """
     Analyzes sentiment and relevance using OpenAI.
@@ -57,6 +145,7 @@ def analyze_sentiment_with_openai(client, text: str, model: str) -> Tuple[float,
             ],
             max_tokens=50
         )
+        metrics.record_openai_usage("scoring", response)
         result = response.choices[0].message.content.strip()
         logger.info(f"OpenAI Analysis Result: {result}")
 
@@ -65,15 +154,249 @@ def analyze_sentiment_with_openai(client, text: str, model: str) -> Tuple[float,
         sentiment = float(sentiment_str.strip())
         relevance = int(relevance_str.strip())
 
-        # Normalize sentiment (-1 to 1 -> 0 to 1)
-        normalized_sentiment = (sentiment + 1) / 2
-        # Normalize relevance (0 to 10 -> 0 to 1)
-        normalized_relevance = relevance / 10
+        return normalize_scores(sentiment, relevance)
+    except Exception as e:
+        logger.error(f"Error analyzing sentiment with OpenAI: {e}")
+        metrics.increment("scoring_failures")
+        return 0.0, 0.0  # Default to neutral sentiment and no relevance
+
+
+def _validate_batch_item(item, batch_size: int, with_relevance: bool = True) -> Optional[Tuple[int, float, int]]:
+    """
+    Validates one element of a batch scoring response against the expected schema:
+    {"id": int in [0, batch_size), "sentiment": number in [-1, 1], "relevance": integer in [0, 10]}.
+    Without with_relevance, the relevance field is not expected and reported as 0.
+
+    Returns:
+        A tuple of (id, sentiment, relevance), or None if the item is malformed.
+    """
+    if not isinstance(item, dict):
+        return None
+    item_id, sentiment, relevance = item.get("id"), item.get("sentiment"), item.get("relevance")
+    if isinstance(item_id, bool) or not isinstance(item_id, int) or not 0 <= item_id < batch_size:
+        return None
+    if isinstance(sentiment, bool) or not isinstance(sentiment, (int, float)) or not -1 <= sentiment <= 1:
+        return None
+    if not with_relevance:
+        return item_id, float(sentiment), 0
+    if isinstance(relevance, float) and relevance.is_integer():
+        relevance = int(relevance)
+    if isinstance(relevance, bool) or not isinstance(relevance, int) or not 0 <= relevance <= 10:
+        return None
+    return item_id, float(sentiment), relevance
+
+
+def parse_batch_scores(content: str, batch_size: int, with_relevance: bool = True) -> Dict[int, Tuple[float, float]]:
+    """
+    Parses a JSON array of {id, sentiment, relevance} objects returned by the model.
+
+    Without with_relevance, the objects are {id, sentiment} and relevance is reported as 0.
+
+    Malformed, out-of-range and repeated items are dropped, so the caller can
+    re-score only the ids that are missing from the result.
+
+    Returns:
+        A mapping of article id to normalized (sentiment, relevance) scores.
+    """
+    start, end = content.find("["), content.rfind("]")
+    if start == -1 or end < start:
+        logger.warning("Batch scoring response does not contain a JSON array.")
+        return {}
+    try:
+        items = json.loads(content[start:end + 1])
+    except json.JSONDecodeError as e:
+        logger.warning(f"Batch scoring response is not valid JSON: {e}")
+        return {}
+
+    scores = {}
+    for item in items:
+        validated = _validate_batch_item(item, batch_size, with_relevance)
+        if validated is None:
+            logger.warning(f"Ignoring malformed batch scoring item: {item}")
+            continue
+        item_id, sentiment, relevance = validated
+        if item_id not in scores:
+            scores[item_id] = normalize_scores(sentiment, relevance)
+    return scores
+
+
+def analyze_sentiment_batch_with_openai(client, texts: List[str], model: str) -> List[Tuple[float, float]]:
+    """
+    Analyzes sentiment and relevance for several texts in a single OpenAI request.
+
+    Items that are missing from the response or fail schema validation are
+    re-scored individually with analyze_sentiment_with_openai.
+
+    Args:
+        client: OpenAI client instance.
+        texts: The texts to analyze.
+        model: The OpenAI model to use (e.g., "gpt-35-turbo").
+
+    Returns:
+        A list of normalized (sentiment, relevance) tuples, in the same order as texts.
+    """
+    if not texts:
+        return []
+    articles = [{"id": i, "text": text} for i, text in enumerate(texts)]
+    prompt = (
+        f"Analyze each of the following articles and provide a sentiment score (between -1 and 1) "
+        f"and a relevance score (integer between 0 and 10) indicating how closely the article aligns with the 'India growth story'.\n\n"
+        f"Articles (JSON): {json.dumps(articles, ensure_ascii=False)}\n\n"
+        f"Respond with only a JSON array containing one object per article, in the format: "
+        f'[{{"id": <id>, "sentiment": <score>, "relevance": <score>}}]'
+    )
+    scores = {}
+    try:
+        logger.info(f"Sending batch of {len(texts)} texts to OpenAI for sentiment and relevance analysis...")
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant that analyzes sentiment and relevance. You respond only with JSON."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=30 * len(texts) + 20
+        )
+        metrics.record_openai_usage("scoring", response)
+        result = response.choices[0].message.content.strip()
+        logger.debug(f"OpenAI Batch Analysis Result: {result}")
+        scores = parse_batch_scores(result, len(texts))
+    except Exception as e:
+        logger.error(f"Error analyzing batch sentiment with OpenAI: {e}")
+
+    missing = [i for i in range(len(texts)) if i not in scores]
+    if missing:
+        metrics.increment("scoring_rescored", len(missing))
+        logger.warning(f"Re-scoring {len(missing)} of {len(texts)} articles missing from the batch response.")
+        for i in missing:
+            scores[i] = analyze_sentiment_with_openai(client, texts[i], model)
+
+    return [scores[i] for i in range(len(texts))]
 
-        # Log normalized scores
-        logger.info(f"Normalized Sentiment: {normalized_sentiment}, Normalized Relevance: {normalized_relevance}")
 
-        return normalized_sentiment, normalized_relevance
+def analyze_sentiment_only_batch_with_openai(client, texts: List[str], model: str) -> List[float]:
+    """
+    Analyzes only the sentiment of several texts in a single OpenAI request.
+
+    Used when relevance is scored locally, which shortens both the prompt and the
+    response. Items missing from the response are re-requested once, each on its
+    own; those that still fail score 0.
+
+    Args:
+        client: OpenAI client instance.
+        texts: The texts to analyze.
+        model: The OpenAI model to use (e.g., "gpt-35-turbo").
+
+    Returns:
+        A list of normalized sentiment scores (0 to 1), in the same order as texts.
+    """
+    if not texts:
+        return []
+    articles = [{"id": i, "text": text} for i, text in enumerate(texts)]
+    prompt = (
+        f"Provide a sentiment score (between -1 and 1) for each of the following articles.\n\n"
+        f"Articles (JSON): {json.dumps(articles, ensure_ascii=False)}\n\n"
+        f"Respond with only a JSON array containing one object per article, in the format: "
+        f'[{{"id": <id>, "sentiment": <score>}}]'
+    )
+    scores = {}
+    try:
+        logger.info(f"Sending batch of {len(texts)} texts to OpenAI for sentiment analysis...")
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant that analyzes sentiment. You respond only with JSON."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=15 * len(texts) + 10
+        )
+        metrics.record_openai_usage("scoring", response)
+        result = response.choices[0].message.content.strip()
+        logger.debug(f"OpenAI Sentiment Result: {result}")
+        scores = parse_batch_scores(result, len(texts), with_relevance=False)
     except Exception as e:
-        logger.error(f"Error analyzing sentiment with OpenAI: {e}")
-        return 0.0, 0.0  # Default to neutral sentiment and no relevance
\ No newline at end of file
+        logger.error(f"Error analyzing batch sentiment with OpenAI: {e}")
+
+    missing = [i for i in range(len(texts)) if i not in scores]
+    if missing and len(texts) > 1:
+        metrics.increment("scoring_rescored", len(missing))
+        logger.warning(f"Re-scoring {len(missing)} of {len(texts)} articles missing from the sentiment response.")
+        for i in missing:
+            scores[i] = (analyze_sentiment_only_batch_with_openai(client, [texts[i]], model)[0], 0.0)
+    return [scores[i][0] if i in scores else 0.0 for i in range(len(texts))]
+
+
+def expected_rating(top_logprobs) -> Optional[float]:
+    """
+    Returns the expected value of a 0-9 rating, normalized to 0 to 1, from the top logprobs of its token.
+
+    Tokens other than a single digit are ignored and the digits' probabilities
+    are renormalized, so a model that puts most of its mass on the digits is
+    read the same whatever else it considered.
+
+    Args:
+        top_logprobs: The candidates of the first completion token, each with a token and a logprob.
+
+    Returns:
+        The normalized rating, or None if no candidate is a digit.
+    """
+    weights = {}
+    for candidate in top_logprobs or []:
+        token = candidate.token.strip()
+        if len(token) == 1 and token.isdigit():
+            weights[int(token)] = weights.get(int(token), 0.0) + math.exp(candidate.logprob)
+    total = sum(weights.values())
+    if not total:
+        return None
+    return sum(digit * weight for digit, weight in weights.items()) / total / 9
+
+
+def _logprob_rating(client, prompt: str, model: str) -> Optional[float]:
+    """
+    Asks for a one-token 0-9 rating and reads it from the token's logprobs.
+    """
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant that rates news. You answer with a single digit."},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=1,
+        temperature=0,
+        logprobs=True,
+        top_logprobs=SCORING_TOP_LOGPROBS
+    )
+    metrics.record_openai_usage("scoring", response)
+    content = response.choices[0].logprobs.content if response.choices[0].logprobs else None
+    return expected_rating(content[0].top_logprobs) if content else None
+
+
+def analyze_sentiment_with_logprobs(client, text: str, model: str, with_relevance: bool = True) -> Tuple[float, float]:
+    """
+    Analyzes sentiment and relevance as the expected values of one-token ratings.
+
+    Each score is one request for a single digit (0-9), read from the token's
+    logprobs rather than parsed from free text, so the score is continuous and
+    a formatting deviation cannot occur. Without with_relevance, only sentiment
+    is requested and relevance is reported as 0.
+
+    Args:
+        client: OpenAI client instance.
+        text: The text to analyze.
+        model: The OpenAI model to use (e.g., "gpt-35-turbo").
+        with_relevance: Whether to also rate relevance.
+
+    Returns:
+        A tuple containing the normalized sentiment and relevance scores (0 to 1),
+        or (0.0, 0.0) if a request fails or answers without a digit.
+    """
+    try:
+        sentiment = _logprob_rating(client, LOGPROB_SENTIMENT_PROMPT.format(text=text), model)
+        relevance = _logprob_rating(client, LOGPROB_RELEVANCE_PROMPT.format(text=text), model) if with_relevance and sentiment is not None else 0.0
+        if sentiment is None or relevance is None:
+            raise ValueError("No digit among the top logprobs.")
+        logger.info(f"Logprob scores: sentiment {sentiment:.3f}, relevance {relevance:.3f}")
+        return sentiment, relevance
+    except Exception as e:
+        logger.error(f"Error analyzing sentiment with OpenAI logprobs: {e}")
+        metrics.increment("scoring_failures")
+        return 0.0, 0.0
@@ -0,0 +1,77 @@
+import math
+import numpy as np
+from typing import Dict, Hashable, List, Tuple
+from config import STORY_CLUSTER_SIMILARITY, TRENDING_WEIGHT, TRENDING_SATURATION
+
+# One event (an ISRO launch, a GDP print) is reported by many outlets in
+# different words, so title shingles (article_dedup) do not collapse it. Story
+# clusters group articles by the cosine similarity of their title embeddings:
+# an article joins the cluster whose representative is most similar to it, if
+# that similarity is above the threshold, or becomes the representative of a
+# new cluster. Only representatives are
+# scored, and the score applies to the whole cluster.
+
+
+class StoryClusters:
+    """
+    Incremental threshold clustering of articles by event.
+
+    The first article of a cluster is its representative. Later articles join
+    the cluster whose representative is most similar, if that similarity is above
+    the threshold. With a threshold above 1, every article is its own cluster.
+    """
+
+    def __init__(self, similarity: float = STORY_CLUSTER_SIMILARITY):
+        self.similarity = similarity
+        self.representatives: List[Hashable] = []
+        self._embeddings: List[np.ndarray] = []
+        self._matrix = None  # Stacked representative embeddings, rebuilt lazily
+        self.cluster_of: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.representatives)
+
+    def add(self, key: Hashable, embedding: np.ndarray) -> Tuple[int, bool]:
+        """
+        Assigns an article to a cluster.
+
+        Args:
+            key: The article's key.
+            embedding: Its L2-normalized title embedding.
+
+        Returns:
+            The cluster id and whether the article is the cluster's representative.
+        """
+        if self._embeddings and self.similarity <= 1:
+            if self._matrix is None or len(self._matrix) != len(self._embeddings):
+                self._matrix = np.vstack(self._embeddings)
+            similarities = self._matrix @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] > self.similarity:
+                self.cluster_of[key] = best
+                return best, False
+        cluster = len(self.representatives)
+        self.representatives.append(key)
+        self._embeddings.append(np.asarray(embedding, dtype=np.float32))
+        self.cluster_of[key] = cluster
+        return cluster, True
+
+
+def cluster_embeddings(embeddings: np.ndarray, similarity: float = STORY_CLUSTER_SIMILARITY) -> List[int]:
+    """
+    Clusters a batch of embeddings, in order, returning each row's cluster id.
+    """
+    clusters = StoryClusters(similarity)
+    return [clusters.add(i, embedding)[0] for i, embedding in enumerate(embeddings)]
+
+
+def trending_bonus(size: int) -> float:
+    """
+    The ranking bonus of a story reported by `size` articles.
+
+    Grows with the logarithm of the cluster size and reaches TRENDING_WEIGHT at
+    TRENDING_SATURATION articles; a story reported once gets no bonus.
+    """
+    if size <= 1:
+        return 0.0
+    return TRENDING_WEIGHT * min(math.log(size) / math.log(TRENDING_SATURATION), 1.0)
@@ -1,5 +1,5 @@
 from logger import logger  # Import the centralized logger
-import openai
+from metrics import metrics
 import time
 from typing import Optional, Tuple
 
@@ -29,6 +29,8 @@ def summarize_news(
     Returns:
         A tuple containing the summary (or None if failed) and the URL.
     """
+    import openai  # Imported on first use: the openai package is slow to import
+
     if not prompt_template:
         prompt_template = (
             "Summarize the following positive news headline and description into a single tweet-friendly summary "
@@ -58,18 +60,21 @@ def summarize_news(
                 ],
                 max_tokens=100
             )
+            metrics.record_openai_usage("summarization", response)
             summary = response.choices[0].message.content.strip()
             logger.info(f"Generated summary: {summary}")
             return summary, url
-        except openai.error.OpenAIError as e:
+        except openai.OpenAIError as e:
             logger.error(f"OpenAI API error on attempt {attempt + 1}: {e}")
             if attempt < retries - 1:
+                metrics.increment("openai_retries", purpose="summarization")
                 time.sleep(2 ** attempt)  # Exponential backoff
             else:
                 return None, url
         except Exception as e:
             logger.error(f"Unexpected error on attempt {attempt + 1}: {e}")
             if attempt < retries - 1:
+                metrics.increment("openai_retries", purpose="summarization")
                 time.sleep(2 ** attempt)
             else:
                 return None, url
\ No newline at end of file
@@ -0,0 +1,84 @@
+from azure.core import MatchConditions
+from azure.core.exceptions import HttpResponseError
+
+
+def http_error(status_code):
+    error = HttpResponseError(message=f"HTTP {status_code}")
+    error.status_code = status_code
+    return error
+
+
+class FakeDownloader:
+    def __init__(self, data, etag):
+        self._data = data
+        self.properties = type("Properties", (), {"etag": etag})()
+
+    def readall(self):
+        return self._data
+
+
+class FakeBlobClient:
+    """
+    In-process stand-in for azure.storage.blob.BlobClient honoring ETag conditions.
+    """
+
+    def __init__(self, container, name):
+        self.container = container
+        self.name = name
+
+    def exists(self):
+        return self.name in self.container.blobs
+
+    def download_blob(self, etag=None, match_condition=None):
+        self.container.requests.append(("GET", self.name))
+        if self.name not in self.container.blobs:
+            raise http_error(404)
+        data, current_etag = self.container.blobs[self.name]
+        if match_condition == MatchConditions.IfModified and etag == current_etag:
+            raise http_error(304)
+        return FakeDownloader(data, current_etag)
+
+    def upload_blob(self, data, blob_type="BlockBlob", overwrite=False, etag=None, match_condition=None):
+        self.container.requests.append(("PUT", self.name))
+        exists = self.name in self.container.blobs
+        if exists and not overwrite:
+            raise http_error(409)
+        if match_condition == MatchConditions.IfNotModified and (not exists or self.container.blobs[self.name][1] != etag):
+            raise http_error(412)
+        self.container.version += 1
+        new_etag = f'"etag-{self.container.version}"'
+        self.container.blobs[self.name] = (data.read(), new_etag)
+        return {"etag": new_etag}
+
+    def create_append_blob(self, match_condition=None):
+        if match_condition == MatchConditions.IfMissing and self.name in self.container.blobs:
+            raise http_error(409)
+        self.container.put(self.name, b"")
+
+    def append_block(self, data):
+        self.container.requests.append(("APPEND", self.name))
+        if self.name not in self.container.blobs:
+            raise http_error(404)
+        self.container.put(self.name, self.container.blobs[self.name][0] + data)
+
+
+class FakeContainerClient:
+    def __init__(self):
+        self.blobs = {}
+        self.version = 0
+        self.requests = []
+
+    def get_blob_client(self, name):
+        return FakeBlobClient(self, name)
+
+    def list_blob_names(self, name_starts_with=""):
+        return [name for name in self.blobs if name.startswith(name_starts_with)]
+
+    def delete_blob(self, name):
+        if name not in self.blobs:
+            raise http_error(404)
+        del self.blobs[name]
+
+    def put(self, name, data):
+        self.version += 1
+        self.blobs[name] = (data, f'"etag-{self.version}"')
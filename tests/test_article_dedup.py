@@ -0,0 +1,35 @@
+import unittest
+from article_dedup import canonicalize_url, deduplicate_articles
+
+
+class TestArticleDedup(unittest.TestCase):
+
+    def test_canonicalize_url(self):
+        self.assertEqual(
+            canonicalize_url("https://www.ndtv.com/india-news/isro-launch-123/amp/?utm_source=twitter&id=5#top"),
+            "https://ndtv.com/india-news/isro-launch-123?id=5"
+        )
+        self.assertEqual(
+            canonicalize_url("https://timesofindia.indiatimes.com/india/story/amp_articleshow/123.cms"),
+            canonicalize_url("https://timesofindia.indiatimes.com/india/story/articleshow/123.cms?fbclid=abc")
+        )
+        self.assertEqual(canonicalize_url(None), "")
+
+    def test_collapses_near_duplicate_titles_keeping_richest(self):
+        articles = [
+            {"title": "ISRO successfully launches GSAT-20 satellite", "url": "https://ndtv.com/a", "description": ""},
+            {"title": "Sensex closes at record high", "url": "https://thehindu.com/b", "description": "Markets"},
+            {"title": "ISRO launches GSAT-20 satellite successfully", "url": "https://thehindu.com/c",
+             "description": "The launch from Sriharikota was a success."},
+            {"title": None, "url": "https://www.ndtv.com/a/amp?utm_medium=social", "description": None},
+        ]
+        deduplicated = deduplicate_articles(articles)
+        self.assertEqual(deduplicated, [articles[1], articles[2]])
+
+    def test_keeps_distinct_titles(self):
+        articles = [{"title": "India GDP grows 8.2% in Q2"}, {"title": "India exports grow 8.2% in Q2"}]
+        self.assertEqual(deduplicate_articles(articles), articles)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from unittest.mock import patch
+from benchmarks.end_to_end import compare
+from benchmarks.fake_services import FakeAzureOpenAI, FakeNewsAPI, FakeNewsdata, fake_scores, synthetic_corpus
+from query_planner import QueryPlanner
+
+
+class TestBenchmarkServices(unittest.TestCase):
+    """
+    Keeps the benchmark's stand-ins in step with the clients they stand in for.
+    """
+
+    def test_fetchers_page_through_fake_news_servers(self):
+        import newsapi_fetcher
+        import newsdata_fetcher
+
+        articles = synthetic_corpus(300)
+        self.assertEqual(len({article["url"] for article in articles}), 300)
+        with FakeNewsAPI(articles[0::2], 2) as newsapi, FakeNewsdata(articles[1::2], 2) as newsdata, \
+                patch("newsapi_fetcher.NEWSAPI_ENDPOINT", f"{newsapi.url}/v2/everything"), \
+                patch("newsdata_fetcher.NEWSDATA_ENDPOINT", f"{newsdata.url}/api/1/latest"), \
+                patch("query_planner.QUERIES_PER_RUN", 2):
+            topics = ["India growth story", "India startup", "India economy", "India healthcare"]
+            fetched_newsapi = newsapi_fetcher.fetch_news(topics, "", "key", planner=QueryPlanner(topics))
+            fetched_newsdata = newsdata_fetcher.fetch_news(topics, "key", planner=QueryPlanner(topics))
+
+        self.assertEqual(sorted(article["url"] for article in fetched_newsapi), sorted(article["url"] for article in articles[0::2]))
+        self.assertEqual(sorted(article["url"] for article in fetched_newsdata), sorted(article["url"] for article in articles[1::2]))
+        self.assertEqual(newsapi.calls[200], 8)  # Two queries of 75 articles, in pages of 20
+
+    def test_real_page_sizes(self):
+        articles = synthetic_corpus(600)
+        query = {"q": "India", "pageSize": "500"}
+        # The stretched page holds the requested 500 articles, i.e. the query's whole shard of 300; a real one holds 100
+        self.assertEqual(len(FakeNewsAPI(articles, 2).respond("GET", "/v2/everything", query, None)[2]["articles"]), 300)
+        self.assertEqual(len(FakeNewsAPI(articles, 2, real_page_sizes=True).respond("GET", "/v2/everything", query, None)[2]["articles"]), 100)
+        self.assertEqual(len(FakeNewsdata(articles, 2, real_page_sizes=True).respond("GET", "/api/1/latest", {"q": "India"}, None)[2]["results"]), 10)
+
+    def test_fake_azure_openai_scores_batches_and_retries_rate_limits(self):
+        from openai import AzureOpenAI
+        from sentiment_analysis import analyze_sentiment_batch_with_openai, normalize_scores
+
+        texts = ["Record solar power investment in Gujarat", "12 killed as bridge collapses in Assam"]
+        with FakeAzureOpenAI(rate_limit_rate=0.5, retry_after_ms=1, seed=3) as server:
+            client = AzureOpenAI(api_key="key", api_version="2023-12-01-preview", azure_endpoint=f"{server.url}/", max_retries=5)
+            scores = analyze_sentiment_batch_with_openai(client, texts, "gpt-35-turbo")
+
+        self.assertEqual(scores, [normalize_scores(*fake_scores(text)) for text in texts])
+        self.assertGreater(scores[0][0], 0.5)
+        self.assertLess(scores[1][0], 0.5)
+        self.assertGreater(server.calls[429], 0)
+
+    def test_fake_azure_openai_answers_logprob_ratings(self):
+        from openai import AzureOpenAI
+        from sentiment_analysis import analyze_sentiment_with_logprobs, normalize_scores
+
+        text = "Record solar power investment in Gujarat"
+        with FakeAzureOpenAI() as server:
+            client = AzureOpenAI(api_key="key", api_version="2023-12-01-preview", azure_endpoint=f"{server.url}/", max_retries=0)
+            scores = analyze_sentiment_with_logprobs(client, text, "gpt-35-turbo")
+
+        for score, expected in zip(scores, normalize_scores(*fake_scores(text))):
+            self.assertAlmostEqual(score, expected)
+        self.assertEqual(server.calls[200], 2)
+
+    def test_compare_flags_growth_beyond_tolerance(self):
+        def report(seconds, openai_calls):
+            return {"runs": [{"articles": 100, "seconds": seconds, "peak_rss_mb": 90, "calls": {"newsapi": 4, "newsdata": 10, "openai": openai_calls}}]}
+
+        self.assertEqual(compare(report(1.2, 10), report(1.0, 10), 0.25), [])
+        self.assertEqual(compare(report(1.5, 13), report(1.0, 10), 0.25), ["100 articles: seconds 1 -> 1.5", "100 articles: openai calls 10 -> 13"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from blob_storage import download_blob, upload_blob, append_to_blob, delete_blob, list_blob_names, BlobConflictError
+from fake_blob_storage import FakeContainerClient, FakeDownloader
+
+
+class TestBlobStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.container = FakeContainerClient()
+        self.patches = [
+            patch("blob_storage.get_container_client", return_value=self.container),
+            patch("blob_storage.BLOB_CACHE_DIR", os.path.join(self.tmpdir.name, "cache")),
+            patch.dict("blob_storage._etags", clear=True),
+        ]
+        for p in self.patches:
+            p.start()
+        self.local = os.path.join(self.tmpdir.name, "local.json")
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        self.tmpdir.cleanup()
+
+    def read_local(self):
+        with open(self.local, "rb") as file:
+            return file.read()
+
+    def test_unchanged_blob_is_served_from_cache(self):
+        self.container.put("history.json", b"[1]")
+        download_blob("history.json", self.local)
+        os.remove(self.local)
+        with patch.object(FakeDownloader, "readall", side_effect=AssertionError("content re-downloaded")):
+            download_blob("history.json", self.local)
+        self.assertEqual(self.read_local(), b"[1]")
+
+        self.container.put("history.json", b"[1, 2]")
+        download_blob("history.json", self.local)
+        self.assertEqual(self.read_local(), b"[1, 2]")
+
+    def test_missing_blob_leaves_empty_file(self):
+        with open(self.local, "w") as file:
+            file.write("stale")
+        download_blob("missing.json", self.local)
+        self.assertEqual(self.read_local(), b"")
+
+    def test_upload_rejects_concurrent_modification(self):
+        self.container.put("history.json", b"[1]")
+        download_blob("history.json", self.local)
+        self.container.put("history.json", b"[1, 3]")  # Another run writes in between
+
+        with open(self.local, "wb") as file:
+            file.write(b"[1, 2]")
+        with self.assertRaises(BlobConflictError):
+            upload_blob(self.local, "history.json")
+        self.assertEqual(self.container.blobs["history.json"][0], b"[1, 3]")
+
+        # After re-reading, the upload succeeds and refreshes the local cache
+        download_blob("history.json", self.local)
+        with open(self.local, "wb") as file:
+            file.write(b"[1, 3, 2]")
+        upload_blob(self.local, "history.json")
+        self.assertEqual(self.container.blobs["history.json"][0], b"[1, 3, 2]")
+        download_blob("history.json", self.local)
+        self.assertEqual(self.container.requests[-1], ("GET", "history.json"))
+        self.assertEqual(self.read_local(), b"[1, 3, 2]")
+
+    def test_failed_download_blocks_upload(self):
+        from azure.core.exceptions import ServiceResponseError
+        self.container.put("score_cache.db", b"50 entries")
+        with patch.object(self.container, "get_blob_client", side_effect=ServiceResponseError("Connection reset")):
+            self.assertFalse(download_blob("score_cache.db", self.local))
+
+        # A run that could not read the blob must not replace it with its own, nearly empty, copy
+        with open(self.local, "wb") as file:
+            file.write(b"1 entry")
+        with self.assertRaises(BlobConflictError):
+            upload_blob(self.local, "score_cache.db")
+        self.assertEqual(self.container.blobs["score_cache.db"][0], b"50 entries")
+
+        # Once read, the blob is written again, conditionally
+        self.assertTrue(download_blob("score_cache.db", self.local))
+        with open(self.local, "wb") as file:
+            file.write(b"51 entries")
+        upload_blob(self.local, "score_cache.db")
+        self.assertEqual(self.container.blobs["score_cache.db"][0], b"51 entries")
+
+    def test_append_creates_blob_and_appends(self):
+        append_to_blob("history/2024-06.jsonl", b"a\n")
+        append_to_blob("history/2024-06.jsonl", b"b\n")
+        self.assertEqual(self.container.blobs["history/2024-06.jsonl"][0], b"a\nb\n")
+        self.assertEqual(list_blob_names("history/"), ["history/2024-06.jsonl"])
+
+        download_blob("history/2024-06.jsonl", self.local)
+        delete_blob("history/2024-06.jsonl")
+        self.assertEqual(list_blob_names("history/"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
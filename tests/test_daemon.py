@@ -0,0 +1,125 @@
+import json
+import unittest
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from unittest.mock import patch, MagicMock
+import numpy as np
+from daemon import CronSchedule, Daemon
+from duplicate_checker import HistoryIndexCache
+from metrics import metrics
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class TestCronSchedule(unittest.TestCase):
+
+    def test_workflow_schedule(self):
+        schedule = CronSchedule("0 4,16 * * *")
+        self.assertEqual(schedule.next_after(utc(2024, 6, 15, 3, 59, 30)), utc(2024, 6, 15, 4, 0))
+        self.assertEqual(schedule.next_after(utc(2024, 6, 15, 4, 0)), utc(2024, 6, 15, 16, 0))
+        self.assertEqual(schedule.next_after(utc(2024, 12, 31, 16, 30)), utc(2025, 1, 1, 4, 0))
+
+    def test_ranges_steps_and_weekdays(self):
+        schedule = CronSchedule("*/15 9-17 * * 1-5")
+        self.assertEqual(schedule.next_after(utc(2024, 6, 14, 17, 45)), utc(2024, 6, 17, 9, 0))  # Friday evening -> Monday
+        self.assertEqual(schedule.next_after(utc(2024, 6, 17, 9, 1)), utc(2024, 6, 17, 9, 15))
+        # Both day fields restricted: the 1st of the month or any Sunday
+        self.assertEqual(CronSchedule("0 0 1 * 7").next_after(utc(2024, 6, 10)), utc(2024, 6, 16))
+        self.assertEqual(CronSchedule("0 0 29 2 *").next_after(utc(2024, 3, 1)), utc(2028, 2, 29))
+
+    def test_invalid_expressions(self):
+        for expression in ("0 4 * *", "60 * * * *", "0 0 30 2 *", "*/0 * * * *"):
+            with self.assertRaises(ValueError, msg=expression):
+                CronSchedule(expression).next_after(utc(2024, 1, 1))
+
+
+class TestDaemon(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        self.daemon = Daemon(CronSchedule("0 4,16 * * *"), jitter_minutes=0)
+        self.daemon.score_cache = MagicMock()
+        self.daemon.history = MagicMock()
+
+    @patch("profiles.history_prefixes", new=MagicMock(return_value=["posted_history", "posted_history-space"]))
+    @patch("history_store.compact_history")
+    @patch("main.main")
+    def test_cycles_update_health(self, mock_main, mock_compact_history):
+        self.assertTrue(self.daemon.health()[0])
+
+        self.assertTrue(self.daemon.run_cycle())
+        mock_main.assert_called_once_with(self.daemon.score_cache, self.daemon.history)
+        self.daemon.score_cache.sync.assert_called_once()
+        self.assertEqual([c.kwargs["prefix"] for c in mock_compact_history.call_args_list], ["posted_history", "posted_history-space"])
+
+        mock_main.side_effect = lambda *_: metrics.increment("run_errors")
+        self.assertFalse(self.daemon.run_cycle())
+        healthy, status = self.daemon.health()
+        self.assertFalse(healthy)
+        self.assertEqual((status["cycles"], status["failures"], status["last_cycle"]["ok"]), (2, 1, False))
+
+        mock_main.side_effect = lambda *_: metrics.reset()  # As main.main does at the start of a run
+        mock_compact_history.side_effect = RuntimeError("Blob storage down")
+        self.assertFalse(self.daemon.run_cycle())
+        mock_compact_history.side_effect = None
+        self.assertTrue(self.daemon.run_cycle())
+        self.assertTrue(self.daemon.health()[0])
+
+    def test_long_running_cycle_is_unhealthy(self):
+        self.daemon.cycle_started_at = 0.0
+        self.assertFalse(self.daemon.health()[0])
+
+    @patch("history_store.compact_history")
+    @patch("main.main", side_effect=lambda *_: metrics.increment("tweets_posted"))
+    def test_serves_health_and_metrics(self, mock_main, mock_compact_history):
+        self.daemon.run_cycle()
+        server = self.daemon.serve("127.0.0.1", 0)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}"
+            with urllib.request.urlopen(f"{url}/health") as response:
+                self.assertEqual(json.load(response)["status"], "ok")
+            with urllib.request.urlopen(f"{url}/metrics") as response:
+                lines = response.read().decode("utf-8").splitlines()
+            self.assertIn("positive_india_bot_tweets_posted 1", lines)
+            self.assertIn("positive_india_bot_daemon_cycles 1", lines)
+
+            self.daemon.cycle_started_at = 0.0
+            with self.assertRaises(urllib.error.HTTPError) as context:
+                urllib.request.urlopen(f"{url}/health")
+            self.assertEqual(context.exception.code, 503)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    @patch.object(Daemon, "warm_up")
+    @patch.object(Daemon, "run_cycle")
+    def test_run_stops_between_cycles(self, mock_run_cycle, mock_warm_up):
+        mock_run_cycle.side_effect = lambda: self.daemon.stop()
+        self.daemon.run(run_now=True)
+        mock_run_cycle.assert_called_once()
+        self.daemon.score_cache.close.assert_called_once()
+
+
+class TestHistoryIndexCache(unittest.TestCase):
+
+    @patch("duplicate_checker.encode_texts", return_value=np.array([[0.0, 1.0]], dtype=np.float32))
+    @patch("duplicate_checker.load_history_index", return_value=({"Old"}, np.array([[1.0, 0.0]], dtype=np.float32)))
+    def test_loads_once_extends_and_refreshes(self, mock_load, mock_encode):
+        history = HistoryIndexCache(max_age_hours=24)
+        history.get()
+        history.add("New")
+        titles, embeddings = history.get()
+        self.assertEqual(titles, {"Old", "New"})
+        np.testing.assert_array_equal(embeddings, [[1.0, 0.0], [0.0, 1.0]])
+        mock_load.assert_called_once()
+
+        history.max_age_seconds = -1
+        self.assertEqual(history.get()[0], {"Old"})
+        self.assertEqual(mock_load.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import io
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+import numpy as np
+from duplicate_checker import load_segment_embeddings, save_posted_tweet, is_duplicate_batch
+from history_store import append_posted_title, compact_segment, segment_embeddings_name
+from fake_blob_storage import FakeContainerClient
+
+DIM = 8
+
+
+def fake_embedding(title):
+    # A fixed unit vector per title, so rows can be matched to titles after a round trip
+    vector = np.random.default_rng(sum(ord(char) for char in title)).normal(size=DIM)
+    return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+class TestSegmentEmbeddings(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.container = FakeContainerClient()
+        self.encoded = []
+        self.patches = [
+            patch("blob_storage.get_container_client", return_value=self.container),
+            patch("blob_storage.BLOB_CACHE_DIR", os.path.join(self.tmpdir.name, "cache")),
+            patch.dict("blob_storage._etags", clear=True),
+            patch("history_store.HISTORY_DIR", os.path.join(self.tmpdir.name, "history")),
+            patch("duplicate_checker.encode_texts", side_effect=self.encode),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        self.tmpdir.cleanup()
+
+    def encode(self, texts):
+        self.encoded.append(list(texts))
+        return np.array([fake_embedding(text) for text in texts], dtype=np.float32).reshape(len(texts), DIM)
+
+    def stored(self, segment):
+        return np.load(io.BytesIO(self.container.blobs[segment_embeddings_name(segment)][0]))["embedding"]
+
+    def test_float16_round_trip(self):
+        titles = ["ISRO launches satellite", "GDP growth beats estimates"]
+        segment = append_posted_title(titles[0])
+        append_posted_title(titles[1])
+
+        embeddings = load_segment_embeddings(segment, titles)
+        self.assertEqual(self.stored(segment).dtype, np.float16)
+        np.testing.assert_allclose(self.stored(segment), [fake_embedding(title) for title in titles], atol=1e-3)
+
+        # A complete stored matrix is loaded as is, without encoding again
+        self.assertEqual(self.encoded, [titles])
+        np.testing.assert_array_equal(load_segment_embeddings(segment, titles), embeddings)
+        self.assertEqual(self.encoded, [titles])
+
+    def test_rows_stay_aligned_after_an_append(self):
+        titles = ["ISRO launches satellite", "GDP growth beats estimates", "Metro line opens"]
+        for title in titles:
+            save_posted_tweet(title)
+
+        # Each post encodes only its own title and appends it as the next row
+        self.assertEqual(self.encoded, [[title] for title in titles])
+        (blob_name,) = [name for name in self.container.blobs if name.endswith(".npy")]
+        stored = np.load(io.BytesIO(self.container.blobs[blob_name][0]))["embedding"]
+        np.testing.assert_allclose(stored, [fake_embedding(title) for title in titles], atol=1e-3)
+
+    def test_stale_rows_after_a_compaction_are_encoded_again(self):
+        for title in ("ISRO launches satellite", "GDP growth beats estimates", "ISRO launches satellite"):
+            save_posted_tweet(title)
+        (segment,) = [name for name in self.container.blobs if name.endswith(".jsonl")]
+
+        # Compaction drops the repeated title, but deleting the segment's embeddings fails
+        with patch("history_store.delete_blob"):
+            self.assertTrue(compact_segment(segment, datetime(2000, 1, 1, tzinfo=timezone.utc)))
+        save_posted_tweet("Metro line opens")
+
+        # The stale matrix has a row per entry, but its last row is the repeated title's
+        titles = ["ISRO launches satellite", "GDP growth beats estimates", "Metro line opens"]
+        self.assertEqual(self.encoded[-1], ["Metro line opens"])
+        np.testing.assert_allclose(self.stored(segment), [fake_embedding(title) for title in titles], atol=1e-3)
+
+    def test_recovers_from_missing_or_corrupt_embeddings(self):
+        titles = ["ISRO launches satellite", "GDP growth beats estimates"]
+        segment = append_posted_title(titles[0])
+        append_posted_title(titles[1])
+        blob_name = segment_embeddings_name(segment)
+        too_long = np.zeros((3, DIM), dtype=np.float16)
+        buffer = io.BytesIO()
+        np.save(buffer, too_long)
+
+        for break_store in (
+            lambda: self.container.blobs.pop(blob_name, None),  # Missing
+            lambda: self.container.put(blob_name, b"not an npy file"),  # Corrupt
+            lambda: self.container.put(blob_name, buffer.getvalue()),  # More rows than entries
+        ):
+            break_store()
+            self.encoded.clear()
+            embeddings = load_segment_embeddings(segment, titles)
+            self.assertEqual(self.encoded, [titles])
+            np.testing.assert_allclose(embeddings, [fake_embedding(title) for title in titles], atol=1e-3)
+            np.testing.assert_allclose(self.stored(segment), embeddings)
+
+
+# Unit vectors: "GDP" paraphrases are near each other, the other stories are orthogonal
+EMBEDDINGS = {
+    "India GDP grows 8%": [1.0, 0.0, 0.0],
+    "India's GDP grew 8 percent": [0.99, 0.141, 0.0],
+    "Indian economy expands 8%": [0.98, 0.0, 0.199],
+    "ISRO launches satellite": [0.0, 1.0, 0.0],
+    "Metro line opens": [0.0, 0.0, 1.0],
+}
+
+
+def history(*titles):
+    return set(titles), np.array([EMBEDDINGS[title] for title in titles], dtype=np.float32)
+
+
+@patch("duplicate_checker.encode_texts", new=lambda texts: np.array([EMBEDDINGS[text] for text in texts], dtype=np.float32))
+class TestIsDuplicateBatch(unittest.TestCase):
+
+    @patch("duplicate_checker.load_history_index", return_value=history("ISRO launches satellite"))
+    def test_exact_title_match(self, _):
+        self.assertEqual(is_duplicate_batch(["ISRO launches satellite", "Metro line opens"]), [True, False])
+
+    @patch("duplicate_checker.load_history_index", return_value=history("India GDP grows 8%"))
+    def test_semantic_match_against_history(self, _):
+        self.assertEqual(is_duplicate_batch(["India's GDP grew 8 percent", "Metro line opens"]), [True, False])
+
+    @patch("duplicate_checker.load_history_index", return_value=history("ISRO launches satellite"))
+    def test_repeat_of_a_higher_ranked_eligible_candidate(self, _):
+        # The paraphrase repeats the first candidate, which is still eligible, so only the first is kept
+        self.assertEqual(is_duplicate_batch(["India GDP grows 8%", "Metro line opens", "India's GDP grew 8 percent"]), [False, False, True])
+
+    @patch("duplicate_checker.load_history_index", return_value=(set(), None))
+    def test_empty_history(self, mock_load_history_index):
+        self.assertEqual(is_duplicate_batch(["India GDP grows 8%", "Metro line opens", "Indian economy expands 8%"]), [False, False, True])
+        self.assertEqual(is_duplicate_batch([]), [])
+        mock_load_history_index.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import numpy as np
+import embedding_backends
+from embedding_backends import OnnxInt8Backend, get_embedding_backend
+
+
+class TestEmbeddingBackends(unittest.TestCase):
+
+    @patch.dict("embedding_backends._backends", clear=True)
+    def test_backend_is_loaded_once(self):
+        factory = MagicMock()
+        with patch.dict("embedding_backends.BACKENDS", {"fake": factory}):
+            self.assertIs(get_embedding_backend("fake"), get_embedding_backend("fake"))
+        factory.assert_called_once_with()
+
+    @patch.dict("embedding_backends._backends", clear=True)
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_embedding_backend("missing")
+
+    def test_onnx_mean_pooling_ignores_padding(self):
+        backend = OnnxInt8Backend.__new__(OnnxInt8Backend)
+        backend.dimension = 2
+        backend.input_names = {"input_ids", "attention_mask"}
+        backend.tokenizer = MagicMock()
+        backend.tokenizer.encode_batch.return_value = [
+            MagicMock(ids=[1, 2], attention_mask=[1, 1]),
+            MagicMock(ids=[3, 0], attention_mask=[1, 0]),
+        ]
+        backend.session = MagicMock()
+        backend.session.run.return_value = [np.array([
+            [[3.0, 0.0], [1.0, 0.0]],
+            [[0.0, 2.0], [9.0, 9.0]],  # Padding token, must not affect the embedding
+        ])]
+
+        embeddings = backend.encode(["a b", "c"])
+
+        np.testing.assert_allclose(embeddings, [[1.0, 0.0], [0.0, 1.0]])
+        self.assertEqual(embeddings.dtype, np.float32)
+        self.assertEqual(backend.encode([]).shape, (0, 2))
+
+    def test_torch_is_the_default_backend(self):
+        self.assertEqual(embedding_backends.EMBEDDING_BACKEND, "torch")
+
+
+if __name__ == "__main__":
+    unittest.main()
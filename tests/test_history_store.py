@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+import history_store
+from history_store import (
+    append_posted_title, load_posted_entries, compact_history, migrate_legacy_history, segments_in_window
+)
+from fake_blob_storage import FakeContainerClient
+
+NOW = datetime(2024, 6, 15, tzinfo=timezone.utc)
+
+
+class TestHistoryStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.container = FakeContainerClient()
+        self.patches = [
+            patch("blob_storage.get_container_client", return_value=self.container),
+            patch("blob_storage.BLOB_CACHE_DIR", os.path.join(self.tmpdir.name, "cache")),
+            patch.dict("blob_storage._etags", clear=True),
+            patch("history_store.HISTORY_DIR", os.path.join(self.tmpdir.name, "history")),
+            patch("history_store.POSTED_TWEETS_FILE", os.path.join(self.tmpdir.name, "posted_tweets.json")),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        self.tmpdir.cleanup()
+
+    def test_segments_in_window(self):
+        self.assertEqual(
+            segments_in_window(60, NOW),
+            ["posted_history/2024-04.jsonl", "posted_history/2024-05.jsonl", "posted_history/2024-06.jsonl"]
+        )
+
+    def test_readers_only_load_segments_in_window(self):
+        append_posted_title("Old story", datetime(2023, 1, 10, tzinfo=timezone.utc))
+        append_posted_title("Last month", datetime(2024, 5, 20, tzinfo=timezone.utc))
+        append_posted_title("This month", datetime(2024, 6, 14, tzinfo=timezone.utc))
+        self.container.requests.clear()
+
+        entries = load_posted_entries(window_days=30, now=NOW)
+        self.assertEqual([entry["title"] for entry in entries], ["Last month", "This month"])
+        self.assertNotIn(("GET", "posted_history/2023-01.jsonl"), self.container.requests)
+
+    def test_append_is_a_single_block(self):
+        append_posted_title("First", NOW)
+        append_posted_title("Second", NOW)
+        self.assertEqual(
+            [request for request in self.container.requests if request[0] != "GET"],
+            [("APPEND", "posted_history/2024-06.jsonl")] * 3  # The first append creates the blob and retries
+        )
+
+    def test_compaction_applies_retention_and_drops_repeats(self):
+        append_posted_title("Expired", datetime(2023, 1, 10, tzinfo=timezone.utc))
+        self.container.put("posted_history/2023-01.npy", b"")
+        append_posted_title("Story", datetime(2023, 6, 10, tzinfo=timezone.utc))
+        append_posted_title("Fresh", datetime(2023, 6, 20, tzinfo=timezone.utc))
+        append_posted_title("Fresh", datetime(2023, 6, 21, tzinfo=timezone.utc))
+        self.container.put("posted_history/2023-06.npy", b"")
+
+        compact_history(retention_days=365, now=NOW)
+
+        self.assertEqual(sorted(self.container.blobs), ["posted_history/2023-06.jsonl"])
+        entries = [json.loads(line) for line in self.container.blobs["posted_history/2023-06.jsonl"][0].splitlines()]
+        self.assertEqual([entry["title"] for entry in entries], ["Fresh"])
+
+    def test_migrate_legacy_history(self):
+        self.container.put(history_store.BLOB_NAME, b'["One", "Two"]')
+        self.container.put(history_store.EMBEDDINGS_BLOB_NAME, b"")
+        migrate_legacy_history()
+        migrate_legacy_history()
+
+        self.assertNotIn(history_store.BLOB_NAME, self.container.blobs)
+        self.assertNotIn(history_store.EMBEDDINGS_BLOB_NAME, self.container.blobs)
+        self.assertEqual([entry["title"] for entry in load_posted_entries(window_days=1)], ["One", "Two"])
+
+
+if __name__ == "__main__":
+    unittest.main()
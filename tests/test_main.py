@@ -13,6 +13,7 @@ os.environ["AZURE_OPENAI_ENDPOINT"] = "https://azureopenaipoistiveindiabotinstan
 import unittest
 from unittest.mock import patch, MagicMock
 from main import main
+from pipeline import PipelineResult
 
 @patch.dict("os.environ", {
     "NEWS_API_KEY": "mock-news-api-key",
@@ -25,100 +26,104 @@ from main import main
     "TWITTER_BEARER_TOKEN": "mock-twitter-bearer-token",
     "AZURE_STORAGE_CONNECTION_STRING": "mock-azure-storage-connection-string"
 })
+@patch("main.get_openai_client", new=MagicMock())
+@patch("main.get_tweepy_client", new=MagicMock())
+@patch("main.FetchWatermarks", new=MagicMock())
+@patch("main.QueryPlanner", new=MagicMock())
+@patch("main.ScoreCache", new=MagicMock())
+@patch("main.resume_thread", new=MagicMock(return_value=False))
+@patch("main.METRICS_JSON_FILE", new=None)
+@patch("main.METRICS_PROMETHEUS_FILE", new=None)
 class TestMain(unittest.TestCase):
 
     @patch("main.logger")
-    @patch("main.initialize_posted_tweets")
-    @patch("main.fetch_newsapi")
-    @patch("main.fetch_newsdata")
-    @patch("main.filter_positive_articles")
-    @patch("main.is_duplicate")
+    @patch("main.migrate_legacy_history")
+    @patch("main.run_pipeline")
     @patch("main.process_top_article")
     @patch("main.save_posted_tweet")
-    def test_duplicate_article(self, mock_save_posted_tweet, mock_process_top_article, mock_is_duplicate, mock_filter_positive_articles, mock_fetch_newsdata, mock_fetch_newsapi, mock_initialize_posted_tweets, mock_logger):
-        mock_fetch_newsapi.return_value = [{"title": "Sample Article"}]
-        mock_fetch_newsdata.return_value = []
-        mock_filter_positive_articles.return_value = [(0.9, {"title": "Sample Article"})]
-        mock_is_duplicate.return_value = True
+    def test_duplicate_article(self, mock_save_posted_tweet, mock_process_top_article, mock_run_pipeline, mock_migrate_legacy_history, mock_logger):
+        # The only positive article was dropped as a repeat of a posted tweet
+        mock_run_pipeline.return_value = PipelineResult(ranked=[], selected=[{"title": "Sample Article"}], fetched=1)
         main()
-        mock_logger.warning.assert_any_call("Duplicate article detected: Sample Article. Trying next article.")
+        mock_logger.warning.assert_any_call("No non-duplicate positive articles found.")
         mock_process_top_article.assert_not_called()
         mock_save_posted_tweet.assert_not_called()
 
     @patch("main.logger")
-    @patch("main.initialize_posted_tweets")
-    @patch("main.fetch_newsapi")
-    @patch("main.fetch_newsdata")
-    @patch("main.filter_positive_articles")
-    @patch("main.is_duplicate")
+    @patch("main.migrate_legacy_history")
+    @patch("main.run_pipeline")
     @patch("main.process_top_article")
     @patch("main.save_posted_tweet")
-    def test_successful_processing(self, mock_save_posted_tweet, mock_process_top_article, mock_is_duplicate, mock_filter_positive_articles, mock_fetch_newsdata, mock_fetch_newsapi, mock_initialize_posted_tweets, mock_logger):
-        mock_fetch_newsapi.return_value = [{"title": "Positive Article"}]
-        mock_fetch_newsdata.return_value = []
-        mock_filter_positive_articles.return_value = [(0.95, {"title": "Positive Article"})]
-        mock_is_duplicate.return_value = False
+    def test_successful_processing(self, mock_save_posted_tweet, mock_process_top_article, mock_run_pipeline, mock_migrate_legacy_history, mock_logger):
+        mock_run_pipeline.return_value = PipelineResult(ranked=[(0.95, {"title": "Positive Article"})], selected=[{"title": "Positive Article"}], fetched=1)
         main()
         mock_process_top_article.assert_called_once()
         mock_save_posted_tweet.assert_called_once_with("Positive Article")
         mock_logger.debug.assert_any_call("Top article title: Positive Article")
 
     @patch("main.logger")
-    @patch("main.initialize_posted_tweets")
-    @patch("main.fetch_newsapi")
-    @patch("main.fetch_newsdata")
-    @patch("main.filter_positive_articles")
-    def test_no_positive_articles(self, mock_filter_positive_articles, mock_fetch_newsdata, mock_fetch_newsapi, mock_initialize_posted_tweets, mock_logger):
-        mock_fetch_newsapi.return_value = [{"title": "Neutral Article"}]
-        mock_fetch_newsdata.return_value = []
-        mock_filter_positive_articles.return_value = []
+    @patch("main.migrate_legacy_history")
+    @patch("main.run_pipeline")
+    def test_no_positive_articles(self, mock_run_pipeline, mock_migrate_legacy_history, mock_logger):
+        mock_run_pipeline.return_value = PipelineResult(fetched=1)
         main()
         mock_logger.warning.assert_any_call("No overwhelmingly positive and relevant articles found.")
 
     @patch("main.logger")
-    @patch("main.initialize_posted_tweets")
-    @patch("main.fetch_newsapi")
-    @patch("main.fetch_newsdata")
-    def test_fetch_news_exception(self, mock_fetch_newsdata, mock_fetch_newsapi, mock_initialize_posted_tweets, mock_logger):
-        mock_fetch_newsapi.side_effect = Exception("Error fetching news")
-        mock_fetch_newsdata.return_value = []
+    @patch("main.migrate_legacy_history")
+    @patch("main.run_pipeline")
+    def test_pipeline_exception(self, mock_run_pipeline, mock_migrate_legacy_history, mock_logger):
+        mock_run_pipeline.side_effect = Exception("Error fetching news")
         main()
         mock_logger.error.assert_any_call("An unexpected error occurred: Error fetching news", exc_info=True)
 
     @patch("main.logger")
-    @patch("main.initialize_posted_tweets")
-    @patch("main.fetch_newsapi")
-    @patch("main.fetch_newsdata")
-    @patch("main.filter_positive_articles")
-    @patch("main.is_duplicate")
+    @patch("main.migrate_legacy_history")
+    @patch("main.run_pipeline")
     @patch("main.process_top_article")
     @patch("main.save_posted_tweet")
-    def test_process_top_article_exception(self, mock_save_posted_tweet, mock_process_top_article, mock_is_duplicate, mock_filter_positive_articles, mock_fetch_newsdata, mock_fetch_newsapi, mock_initialize_posted_tweets, mock_logger):
-        mock_fetch_newsapi.return_value = [{"title": "Positive Article"}]
-        mock_fetch_newsdata.return_value = []
-        mock_filter_positive_articles.return_value = [(0.95, {"title": "Positive Article"})]
-        mock_is_duplicate.return_value = False
+    def test_process_top_article_exception(self, mock_save_posted_tweet, mock_process_top_article, mock_run_pipeline, mock_migrate_legacy_history, mock_logger):
+        mock_run_pipeline.return_value = PipelineResult(ranked=[(0.95, {"title": "Positive Article"})], selected=[{"title": "Positive Article"}], fetched=1)
         mock_process_top_article.side_effect = Exception("Processing error")
         main()
         mock_logger.error.assert_any_call("Error during article processing: Processing error", exc_info=True)
         mock_save_posted_tweet.assert_not_called()
 
     @patch("main.logger")
-    @patch("main.initialize_posted_tweets")
-    @patch("main.fetch_newsapi")
-    @patch("main.fetch_newsdata")
-    @patch("main.filter_positive_articles")
-    @patch("main.is_duplicate")
+    @patch("main.migrate_legacy_history")
+    @patch("main.run_pipeline")
     @patch("main.process_top_article")
     @patch("main.save_posted_tweet")
-    def test_save_posted_tweet_exception(self, mock_save_posted_tweet, mock_process_top_article, mock_is_duplicate, mock_filter_positive_articles, mock_fetch_newsdata, mock_fetch_newsapi, mock_initialize_posted_tweets, mock_logger):
-        mock_fetch_newsapi.return_value = [{"title": "Positive Article"}]
-        mock_fetch_newsdata.return_value = []
-        mock_filter_positive_articles.return_value = [(0.95, {"title": "Positive Article"})]
-        mock_is_duplicate.return_value = False
+    def test_save_posted_tweet_exception(self, mock_save_posted_tweet, mock_process_top_article, mock_run_pipeline, mock_migrate_legacy_history, mock_logger):
+        mock_run_pipeline.return_value = PipelineResult(ranked=[(0.95, {"title": "Positive Article"})], selected=[{"title": "Positive Article"}], fetched=1)
         mock_save_posted_tweet.side_effect = Exception("Save error")
         main()
         mock_logger.error.assert_any_call("Error saving posted tweet: Save error", exc_info=True)
 
+    @patch("main.SELECTION_MODE", new="lazy")
+    @patch("main.migrate_legacy_history")
+    @patch("main.fetch_all_news", new=MagicMock(return_value=[]))
+    @patch("main.process_top_article", new=MagicMock())
+    @patch("main.save_posted_tweet", new=MagicMock())
+    @patch("main.LazySelection")
+    def test_lazy_selection_advances_watermarks_only_when_complete(self, mock_selection, mock_migrate_legacy_history):
+        for complete in (False, True):
+            selection = mock_selection.return_value
+            selection.ranked, selection.complete, selection.fetched = iter([(0.95, {"title": "Positive Article"})]), complete, 5
+            selection.report.return_value = {"scorings_avoided": 0 if complete else 3}
+            with patch("main.FetchWatermarks") as mock_watermarks:
+                main()
+            self.assertEqual(mock_watermarks.return_value.save.called, complete)
+
+    @patch("main.logger")
+    @patch("main.migrate_legacy_history")
+    @patch("main.run_pipeline")
+    def test_pending_thread_blocks_new_thread(self, mock_run_pipeline, mock_migrate_legacy_history, mock_logger):
+        # Posting a new thread would replace the progress of the unfinished one
+        for resume in (MagicMock(return_value=True), MagicMock(side_effect=Exception("Blob storage down"))):
+            with patch("main.resume_thread", new=resume):
+                main()
+        mock_run_pipeline.assert_not_called()
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,65 @@
+import json
+import math
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from metrics import RunMetrics, format_value
+
+
+class TestRunMetrics(unittest.TestCase):
+
+    def test_counters_stages_and_usage(self):
+        metrics = RunMetrics()
+        metrics.increment("http_requests", source="NewsAPI", status=200)
+        metrics.increment("http_requests", 2, source="newsdata.io", status=200)
+        metrics.increment("http_requests", source="NewsAPI", status=429)
+        with metrics.stage("fetch"):
+            pass
+        metrics.record_openai_usage("scoring", SimpleNamespace(usage=SimpleNamespace(prompt_tokens=1000, completion_tokens=200)))
+        metrics.record_openai_usage("scoring", SimpleNamespace(usage=None))
+
+        self.assertEqual(metrics.value("http_requests"), 4)
+        self.assertEqual(metrics.value("http_requests", source="NewsAPI"), 2)
+        self.assertEqual(metrics.value("http_requests", status=429), 1)
+        self.assertEqual(metrics.value("openai_requests", purpose="scoring"), 2)
+        self.assertEqual(metrics.value("openai_prompt_tokens"), 1000)
+        self.assertGreaterEqual(metrics.value("stage_seconds", stage="fetch"), 0)
+
+        with patch("metrics.OPENAI_PROMPT_COST_PER_1K", 0.5), patch("metrics.OPENAI_COMPLETION_COST_PER_1K", 1.5):
+            report = metrics.report()
+        self.assertEqual(report["estimated_openai_cost_usd"], 0.8)
+        self.assertEqual(report["counters"]["http_requests"]["source=NewsAPI,status=429"], 1)
+
+        metrics.reset()
+        self.assertEqual(metrics.value("http_requests"), 0)
+
+    def test_writes_json_and_prometheus_textfile(self):
+        metrics = RunMetrics()
+        metrics.increment("blob_bytes_downloaded", 2048)
+        metrics.increment("stage_seconds", 1.5, stage='fetch "NewsAPI"')
+        metrics.started_at = 1718452800.123456
+        with tempfile.TemporaryDirectory() as tmpdir:
+            json_path, prometheus_path = os.path.join(tmpdir, "run.json"), os.path.join(tmpdir, "run.prom")
+            metrics.write(json_path, prometheus_path)
+            with open(json_path) as file:
+                self.assertEqual(json.load(file)["counters"]["blob_bytes_downloaded"], {"": 2048})
+            with open(prometheus_path) as file:
+                lines = file.read().splitlines()
+        self.assertIn("# TYPE positive_india_bot_blob_bytes_downloaded gauge", lines)
+        self.assertIn("positive_india_bot_blob_bytes_downloaded 2048", lines)
+        self.assertIn('positive_india_bot_stage_seconds{stage="fetch \\"NewsAPI\\""} 1.5', lines)
+        self.assertIn("positive_india_bot_last_run_timestamp_seconds 1718452800.123456", lines)
+
+    def test_format_value_keeps_precision(self):
+        self.assertEqual(format_value(1234567), "1234567")  # "{:g}" gives 1.23457e+06
+        self.assertEqual(format_value(1718452800.0), "1718452800")
+        self.assertEqual(format_value(1718452800.123456), "1718452800.123456")
+        self.assertEqual(format_value(0.000123), "0.000123")
+        self.assertEqual(format_value(True), "1")
+        self.assertEqual([format_value(value) for value in (math.nan, math.inf, -math.inf)], ["NaN", "+Inf", "-Inf"])
+
+
+if __name__ == "__main__":
+    unittest.main()
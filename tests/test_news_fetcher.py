@@ -0,0 +1,115 @@
+import time
+import unittest
+from email.utils import formatdate
+from unittest.mock import MagicMock, patch
+import requests
+from async_http import retry_after_seconds
+from news_fetcher import fetch_all_news
+
+LATENCY = 0.1
+
+
+def response(status_code=200, body=None, headers=None):
+    mock_response = MagicMock(status_code=status_code, headers=headers or {})
+    mock_response.json.return_value = body or {}
+    if status_code >= 400:
+        mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(f"{status_code} error")
+    return mock_response
+
+
+class FakeSession:
+    """
+    Answers GET requests from a callable after a fixed latency and records when each one started and finished.
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.started = []
+        self.finished = []
+
+    def get(self, url, timeout=None):
+        self.started.append((url, time.perf_counter()))
+        time.sleep(LATENCY)
+        self.finished.append((url, time.perf_counter()))
+        return self.respond(url)
+
+    def intervals(self):
+        return [(start, end) for (_, start), (_, end) in zip(self.started, self.finished)]
+
+    def close(self):
+        pass
+
+
+def newsapi_page(url):
+    page = int(url.split("page=")[1].split("&")[0])
+    return response(body={"totalResults": 40, "articles": [{"title": f"NewsAPI {page}-{i}"} for i in range(20)]})
+
+
+def newsdata_page(url):
+    if "page=cursor" in url:
+        return response(body={"results": [{"title": "newsdata 2", "link": "https://b", "source_id": "b"}]})
+    return response(body={"results": [{"title": "newsdata 1", "link": "https://a", "source_id": "a"}], "nextPage": "cursor"})
+
+
+class TestFetchAllNews(unittest.TestCase):
+
+    def fetch(self, newsapi_session, newsdata_session):
+        with patch("newsapi_fetcher.create_session", return_value=newsapi_session), \
+                patch("newsdata_fetcher.create_session", return_value=newsdata_session):
+            return fetch_all_news(["a", "b", "c"], "example.com", "key", "key")
+
+    def test_sources_and_pages_are_fetched_concurrently(self):
+        newsapi_session, newsdata_session = FakeSession(newsapi_page), FakeSession(newsdata_page)
+        articles = self.fetch(newsapi_session, newsdata_session)
+
+        titles = [article["title"] for article in articles]
+        self.assertEqual(len(titles), 42)
+        self.assertEqual(titles[:2], ["NewsAPI 1-0", "NewsAPI 1-1"])
+        self.assertEqual(titles[-2:], ["newsdata 1", "newsdata 2"])
+        self.assertEqual(articles[-1]["url"], "https://b")
+        # Each source pages through two pages, and each of its requests overlaps the other source's request
+        self.assertEqual((len(newsapi_session.started), len(newsdata_session.started)), (2, 2))
+        for (newsapi_start, newsapi_end), (newsdata_start, newsdata_end) in zip(newsapi_session.intervals(), newsdata_session.intervals()):
+            self.assertLess(newsdata_start, newsapi_end)
+            self.assertLess(newsapi_start, newsdata_end)
+
+    @patch("async_http.FETCH_MAX_RETRY_AFTER_SECONDS", 10)
+    def test_rate_limit_only_delays_its_own_source(self):
+        calls = []
+
+        def rate_limited_once(url):
+            calls.append(url)
+            if len(calls) == 1:
+                return response(429, headers={"Retry-After": "0.5"})
+            return newsapi_page(url)
+
+        newsapi_session, newsdata_session = FakeSession(rate_limited_once), FakeSession(newsdata_page)
+        start = time.perf_counter()
+        articles = self.fetch(newsapi_session, newsdata_session)
+
+        self.assertEqual(len(articles), 42)
+        self.assertEqual(calls[0], calls[1])  # The rate-limited page is retried
+        self.assertGreaterEqual(newsapi_session.finished[1][1] - start, 0.5)
+        self.assertLess(newsdata_session.finished[-1][1] - start, 0.5)
+
+    @patch("async_http.FETCH_RATE_LIMIT_RETRIES", 1)
+    @patch("async_http.asyncio.sleep")
+    def test_persistent_rate_limit_gives_up_on_that_source(self, mock_sleep):
+        articles = self.fetch(FakeSession(lambda url: response(429, headers={"Retry-After": "0"})), FakeSession(newsdata_page))
+        self.assertEqual([article["title"] for article in articles], ["newsdata 1", "newsdata 2"])
+        mock_sleep.assert_called_once_with(0.0)
+
+
+class TestRetryAfter(unittest.TestCase):
+
+    @patch("async_http.FETCH_MAX_RETRY_AFTER_SECONDS", 120)
+    def test_retry_after_formats(self):
+        self.assertEqual(retry_after_seconds(response(429, headers={"Retry-After": "7"})), 7)
+        self.assertEqual(retry_after_seconds(response(429)), 60)
+        self.assertEqual(retry_after_seconds(response(429, headers={"Retry-After": "3600"})), 120)
+        self.assertEqual(retry_after_seconds(response(429, headers={"Retry-After": formatdate(time.time() - 5, usegmt=True)})), 0)
+        self.assertAlmostEqual(retry_after_seconds(response(429, headers={"Retry-After": formatdate(time.time() + 30, usegmt=True)})), 30, delta=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+import hashlib
+import random
+import time
+import unittest
+from unittest.mock import patch
+import numpy as np
+from article_dedup import deduplicate_articles
+from duplicate_checker import is_duplicate_batch
+from pipeline import run_pipeline
+from story_clustering import trending_bonus
+from workflow import filter_positive_articles
+
+SCORE_LATENCY = 0.05
+FETCH_LATENCY = 0.05
+
+
+def fake_encode(texts):
+    """
+    Bag-of-words embeddings: titles sharing all but a word or two are semantic duplicates.
+    """
+    embeddings = np.zeros((len(texts), 256), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            embeddings[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % 256] += 1.0
+    return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-9)
+
+
+def fake_scores(articles):
+    """
+    Deterministic scores derived from the title, as the LLM with a warm cache would give.
+    """
+    scores = []
+    for article in articles:
+        digest = int(hashlib.md5((article.get("title") or "").encode()).hexdigest(), 16)
+        scores.append(((digest % 100) / 100, ((digest // 100) % 100) / 100, 0.0))
+    return scores
+
+
+def make_pages():
+    """
+    Two sources of three pages each, with stories syndicated across sources and repeated titles.
+    """
+    subjects = ["ISRO satellite", "Sensex record", "solar park", "metro line", "vaccine drive", "chess title",
+                "startup funding", "highway project", "hockey medal", "rail corridor", "wind farm", "bank profit"]
+    pages = {}
+    for source in range(2):
+        for page in range(1, 4):
+            articles = []
+            for i in range(6):
+                subject = subjects[(source * 3 + page * 4 + i) % len(subjects)]
+                articles.append({
+                    "title": f"{subject} news update {i % 3} India",
+                    "description": "x" * (source + page + i),
+                    "url": f"https://example{source}.com/{page}/{i}",
+                })
+            pages[(source, 0, page)] = articles
+    return pages
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.pages = make_pages()
+        self.history = ["Sensex record news update 1 India"]
+        patches = [
+            patch("duplicate_checker.encode_texts", side_effect=fake_encode),
+            patch("duplicate_checker.load_posted_history", side_effect=lambda **kwargs: (self.history, [fake_encode(self.history)] if self.history else [])),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def fetch(self, emit, shuffle=True):
+        # Pages arrive out of order, as concurrent requests complete
+        positions = sorted(self.pages)
+        if shuffle:
+            random.Random(3).shuffle(positions)
+        for position in positions:
+            time.sleep(FETCH_LATENCY)
+            emit(position, self.pages[position])
+
+    def batch_ranking(self):
+        articles = [article for position in sorted(self.pages) for article in self.pages[position]]
+        articles = deduplicate_articles(articles)
+        with patch("workflow.score_articles", side_effect=lambda articles, *args, **kwargs: fake_scores(articles)):
+            positives = filter_positive_articles(articles, None, "model", 0.3, 0.3)
+        flags = is_duplicate_batch([article.get("title") or "No Title Available" for _, article in positives])
+        return [positive for positive, flag in zip(positives, flags) if not flag]
+
+    def test_ranking_matches_batch_path(self):
+        expected = self.batch_ranking()
+        self.assertTrue(expected)
+        for batch_size in (1, 4, 80):
+            result = run_pipeline(self.fetch, fake_scores, 0.3, 0.3, queue_size=5, batch_size=batch_size)
+            self.assertEqual(result.ranked, expected)
+            self.assertEqual(result.fetched, 36)
+
+    def test_history_duplicates_are_not_scored(self):
+        scored = []
+
+        def score(articles):
+            scored.extend(article["title"] for article in articles)
+            return fake_scores(articles)
+
+        result = run_pipeline(self.fetch, score, 0.0, 0.0)
+        self.assertNotIn("Sensex record news update 1 India", scored)
+        self.assertEqual(result.stats["score"]["items_in"], len(scored))
+        self.assertEqual(result.stats["history"]["items_out"], len(scored))
+        # A story is only scored again when a richer record of it arrives
+        self.assertLess(len(scored), result.fetched)
+
+    def test_scoring_overlaps_fetching(self):
+        fetch_interval, score_intervals = [], []
+
+        def fetch(emit):
+            fetch_interval.append(time.perf_counter())
+            self.fetch(emit)
+            fetch_interval.append(time.perf_counter())
+
+        def score(articles):
+            start = time.perf_counter()
+            time.sleep(SCORE_LATENCY)
+            score_intervals.append((start, time.perf_counter()))
+            return fake_scores(articles)
+
+        result = run_pipeline(fetch, score, 0.3, 0.3, batch_size=6)
+        # The first batch is scored while later pages are still being fetched
+        fetch_start, fetch_end = fetch_interval
+        first_score_start = min(start for start, _ in score_intervals)
+        self.assertGreater(first_score_start, fetch_start)
+        self.assertLess(first_score_start, fetch_end)
+        self.assertEqual(result.stats["fetch"]["items_out"], 36)
+        self.assertEqual(result.stats["normalize"]["items_in"], 36)
+        self.assertEqual(result.stats["history"]["items_in"], result.stats["normalize"]["items_out"])
+        self.assertEqual(result.stats["rank"]["items_in"], result.stats["score"]["items_out"])
+
+    def test_story_clusters_are_scored_once_and_ranked_once(self):
+        self.history = []
+        self.pages = {
+            (0, 0, 1): [
+                {"title": "ISRO launches GSAT satellite from Sriharikota", "url": "https://a.com/1"},
+                {"title": "India GDP grows 8 percent", "url": "https://a.com/2"},
+            ],
+            (1, 0, 1): [
+                {"title": "ISRO launches GSAT satellite today", "url": "https://b.com/1"},
+                {"title": "GSAT satellite launched by ISRO from Sriharikota", "url": "https://b.com/2"},
+            ],
+        }
+        scored = []
+
+        def score(articles):
+            scored.extend(article["title"] for article in articles)
+            return [(0.9, 0.8, 0.0) if "ISRO" in article["title"] else (0.8, 0.7, 0.0) for article in articles]
+
+        result = run_pipeline(lambda emit: self.fetch(emit, shuffle=False), score, 0.5, 0.5, cluster_similarity=0.5)
+        self.assertEqual(scored, ["ISRO launches GSAT satellite from Sriharikota", "India GDP grows 8 percent"])
+        self.assertEqual([article["title"] for _, article in result.ranked], [
+            "ISRO launches GSAT satellite from Sriharikota", "India GDP grows 8 percent"
+        ])
+        # The launch, reported three times, gets the trending bonus; every report counts as selected
+        self.assertAlmostEqual(result.ranked[0][0], 0.85 + trending_bonus(3))
+        self.assertAlmostEqual(result.ranked[1][0], 0.75)
+        self.assertEqual(len(result.selected), 4)
+
+    def test_unavailable_history_drops_everything(self):
+        with patch("pipeline.load_history_index", side_effect=RuntimeError("Blob storage down")):
+            result = run_pipeline(self.fetch, fake_scores, 0.0, 0.0)
+        self.assertEqual(result.fetched, 36)
+        self.assertEqual(result.ranked, [])
+        self.assertEqual(result.stats["score"]["items_in"], 0)
+
+    def test_scoring_error_is_raised_without_deadlock(self):
+        def score(articles):
+            raise RuntimeError("Rate limited")
+
+        with self.assertRaises(RuntimeError):
+            run_pipeline(lambda emit: self.fetch(emit, shuffle=False), score, 0.3, 0.3, queue_size=2, batch_size=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+import numpy as np
+from profiles import Profile, load_profiles, history_prefixes, run_profiles
+from clients import get_tweepy_client
+from metrics import metrics
+
+
+CREDENTIALS = {
+    f"{prefix}TWITTER_{name}": "secret" for prefix in ("", "SPACE_") for name in ("CONSUMER_KEY", "CONSUMER_SECRET", "ACCESS_TOKEN", "ACCESS_SECRET")
+}
+
+
+@patch.dict("os.environ", CREDENTIALS, clear=True)
+class TestLoadProfiles(unittest.TestCase):
+
+    def write(self, profiles):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), "profiles.json")
+        with open(path, "w") as file:
+            json.dump({"profiles": profiles}, file)
+        return path
+
+    def test_defaults(self):
+        tech, space = load_profiles(self.write([
+            {"name": "tech", "topics": ["Indian startups"], "hashtags": "#Tech", "relevance_threshold": 0.6},
+            {"name": "space", "topics": ["ISRO"], "credentials_prefix": "SPACE_", "history_prefix": "space_history"},
+        ]))
+        self.assertEqual((tech.hashtags, tech.relevance_threshold, tech.history_prefix), ("#Tech", 0.6, "posted_history-tech"))
+        self.assertEqual((space.credentials_prefix, space.history_prefix, space.sentiment_threshold), ("SPACE_", "space_history", 0.5))
+        self.assertEqual(space.hashtags, "#PositiveIndiaAI")
+
+    def test_invalid_profiles(self):
+        for profiles in (
+            [{"name": "tech", "topics": []}],
+            [{"name": "tech", "topics": ["ISRO"], "api_key": "secret"}],
+            [{"name": "tech", "topics": ["ISRO"]}, {"name": "tech", "topics": ["Startups"]}],
+            [{"name": "a", "topics": ["ISRO"], "history_prefix": "shared"}, {"name": "b", "topics": ["ISRO"], "history_prefix": "shared"}],
+            [{"name": "a", "topics": ["ISRO"], "credentials_prefix": "SPACE_"}, {"name": "b", "topics": ["ISRO"], "credentials_prefix": "SPACE_"}],
+            [{"name": "a", "topics": ["ISRO"]}, {"name": "b", "topics": ["Startups"]}],  # Both on the default account
+        ):
+            with self.assertRaises((ValueError, TypeError), msg=profiles):
+                load_profiles(self.write(profiles))
+
+    def test_missing_credentials(self):
+        path = self.write([{"name": "tech", "topics": ["ISRO"], "credentials_prefix": "TECH_"}])
+        with self.assertRaisesRegex(ValueError, "TECH_TWITTER_CONSUMER_KEY, TECH_TWITTER_CONSUMER_SECRET"):
+            load_profiles(path)
+        # Jobs that do not post still read the profiles, e.g. to compact their histories
+        self.assertEqual(history_prefixes(path), ["posted_history", "posted_history-tech"])
+        self.assertEqual(history_prefixes(""), ["posted_history"])
+
+    @patch.dict("os.environ", {"SPACE_TWITTER_CONSUMER_KEY": "space-key"})
+    @patch("tweepy.Client")
+    def test_prefixed_credentials(self, mock_client):
+        get_tweepy_client.cache_clear()
+        self.addCleanup(get_tweepy_client.cache_clear)
+        get_tweepy_client("SPACE_")
+        self.assertEqual(mock_client.call_args.kwargs["consumer_key"], "space-key")
+
+
+class FakeRelevance:
+    # Relevance of the articles A, B and C to each profile's topics
+    RELEVANCES = {"tech": [0.9, 0.8, 0.1], "space": [0.1, 0.9, 0.9]}
+
+    def __init__(self, topics):
+        self.relevances = np.array(self.RELEVANCES[topics[0]], dtype=np.float32)
+
+    def score_embeddings(self, embeddings):
+        return self.relevances
+
+
+@patch("history_store.migrate_legacy_history", new=MagicMock())
+@patch("watermarks.FetchWatermarks", new=MagicMock())
+@patch("query_planner.QueryPlanner", new=MagicMock())
+@patch("score_cache.ScoreCache", new=MagicMock())
+@patch("clients.get_openai_client", new=MagicMock())
+@patch("twitter_poster.resume_thread", new=MagicMock(return_value=False))
+@patch("relevance_scorer.TopicRelevance", new=FakeRelevance)
+@patch("duplicate_checker.encode_texts", new=lambda texts: np.eye(len(texts), dtype=np.float32))
+@patch("profiles.METRICS_JSON_FILE", new=None)
+@patch("profiles.METRICS_PROMETHEUS_FILE", new=None)
+class TestRunProfiles(unittest.TestCase):
+
+    def setUp(self):
+        self.profiles = [
+            Profile("tech", ["tech"], domains="a.com,b.com", hashtags="#Tech", credentials_prefix="TECH_"),
+            Profile("space", ["space"], domains="b.com,c.com"),
+        ]
+        self.articles = [{"title": title, "description": "", "url": f"https://example.com/{title}"} for title in "ABC"]
+
+    @patch("clients.get_tweepy_client")
+    @patch("duplicate_checker.save_posted_tweet")
+    @patch("workflow.process_top_article")
+    @patch("workflow.score_articles")
+    @patch("duplicate_checker.load_history_index")
+    @patch("news_fetcher.fetch_all_news")
+    def test_shared_fetch_and_scoring(self, mock_fetch, mock_history, mock_score, mock_process, mock_save, mock_tweepy):
+        metrics.reset()
+        mock_fetch.return_value = self.articles
+        mock_history.side_effect = lambda prefix: ({"A"}, None) if prefix == "posted_history-tech" else (set(), None)
+        mock_score.side_effect = lambda articles, *args, **kwargs: [({"A": 0.9, "B": 0.8, "C": 0.2}[a["title"]], 0.0, 0.0) for a in articles]
+
+        posted = run_profiles(self.profiles)
+
+        self.assertEqual(posted, {"tech": "B", "space": "B"})
+        # One fetch over the union of topics and domains, one scoring of the articles any profile could post
+        mock_fetch.assert_called_once()
+        self.assertEqual(mock_fetch.call_args.args[:2], (["tech", "space"], "a.com,b.com,c.com"))
+        mock_score.assert_called_once()
+        self.assertEqual([a["title"] for a in mock_score.call_args.args[0]], ["B", "C"])
+        # Each profile posts on its own account, with its hashtags, and records its own history
+        self.assertEqual([c.args[0] for c in mock_tweepy.call_args_list], ["TECH_", "TECH_", "", ""])
+        self.assertEqual([c.args[5] for c in mock_process.call_args_list], ["#Tech", "#PositiveIndiaAI"])
+        self.assertEqual(mock_process.call_args.args[6].path, "thread_progress-space.json")
+        self.assertEqual([c.args for c in mock_save.call_args_list], [("B", "posted_history-tech"), ("B", "posted_history-space")])
+        self.assertEqual(metrics.value("profile_posts"), 2)
+
+    @patch("duplicate_checker.save_posted_tweet")
+    @patch("workflow.process_top_article")
+    @patch("workflow.score_articles")
+    @patch("duplicate_checker.load_history_index")
+    @patch("news_fetcher.fetch_all_news")
+    def test_unchecked_history_blocks_only_its_profile(self, mock_fetch, mock_history, mock_score, mock_process, mock_save):
+        metrics.reset()
+        mock_fetch.return_value = self.articles
+        mock_history.side_effect = lambda prefix: (_ for _ in ()).throw(RuntimeError("Blob storage down")) if prefix == "posted_history-tech" else (set(), None)
+        mock_score.side_effect = lambda articles, *args, **kwargs: [(0.9, 0.0, 0.0) for _ in articles]
+
+        with patch("clients.get_tweepy_client"):
+            posted = run_profiles(self.profiles)
+
+        self.assertEqual(posted, {"tech": None, "space": "B"})
+        self.assertEqual(metrics.value("run_errors"), 0)
+
+    @patch("duplicate_checker.save_posted_tweet", new=MagicMock())
+    @patch("workflow.process_top_article")
+    @patch("workflow.score_articles")
+    @patch("duplicate_checker.load_history_index", new=MagicMock(return_value=(set(), None)))
+    @patch("news_fetcher.fetch_all_news")
+    def test_pending_thread_blocks_only_its_profile(self, mock_fetch, mock_score, mock_process):
+        mock_fetch.return_value = self.articles
+        mock_score.side_effect = lambda articles, *args, **kwargs: [(0.9, 0.0, 0.0) for _ in articles]
+
+        with patch("clients.get_tweepy_client"), patch("twitter_poster.resume_thread", side_effect=lambda client, progress: progress.path == "thread_progress-tech.json"):
+            posted = run_profiles(self.profiles)
+
+        self.assertEqual(posted, {"tech": None, "space": "B"})
+        mock_process.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
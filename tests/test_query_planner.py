@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from query_planner import QueryPlanner
+
+TOPICS = [f"India {name}" for name in ["solar", "space", "roads", "ports", "chips", "rails", "banks", "farms", "clinics"]]
+NOW = datetime(2024, 6, 15, 6, tzinfo=timezone.utc)
+
+
+@patch("query_planner.QUERIES_PER_RUN", 2)
+@patch("query_planner.TOPICS_PER_QUERY", 3)
+@patch("query_planner.FETCH_RUNS_PER_DAY", 2)
+class TestQueryPlanner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "planner.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def run_planner(self, now, selected_titles=(), quota=100):
+        planner = QueryPlanner(TOPICS, self.path, now=now)
+        queries = planner.plan("newsapi", quota, max_pages=5)
+        selected = []
+        for topics in queries:
+            articles = [{"url": f"{title}-{topics}", "title": title} for title in selected_titles if any(topic.split()[1] in title.lower() for topic in topics)]
+            planner.take_request("newsapi")
+            planner.record("newsapi", topics, articles, requests=1)
+            selected.extend(articles)
+        planner.record_selected(selected)
+        planner.save()
+        return queries
+
+    def test_topics_rotate_deterministically(self):
+        first = self.run_planner(NOW)
+        second = self.run_planner(NOW + timedelta(hours=12))
+        self.assertEqual(first, [TOPICS[0:3], TOPICS[3:6]])
+        self.assertEqual(second[0], TOPICS[6:9])  # Never-queried topics come first
+        third = self.run_planner(NOW + timedelta(hours=24))
+        queried = {topic for queries in (first, second, third) for query in queries for topic in query}
+        self.assertEqual(queried, set(TOPICS))
+
+    def test_high_yield_topics_are_queried_more_often(self):
+        titles = ["New space station", "Space mission launched"]  # Space stories are selected on every run
+        for hours in range(0, 36, 12):
+            self.run_planner(NOW + timedelta(hours=hours), selected_titles=titles)
+        for hours in range(36, 24 * 5, 12):
+            queries = self.run_planner(NOW + timedelta(hours=hours), selected_titles=titles)
+            self.assertIn("India space", queries[0])
+
+    def test_daily_quota_is_spread_over_runs(self):
+        planner = QueryPlanner(TOPICS, self.path, now=NOW)
+        planner.plan("newsdata", daily_quota=7, max_pages=5)
+        self.assertEqual(sum(planner.take_request("newsdata") for _ in range(10)), 4)
+        planner.save()
+
+        planner = QueryPlanner(TOPICS, self.path, now=NOW + timedelta(hours=12))
+        planner.plan("newsdata", daily_quota=7, max_pages=5)
+        self.assertEqual(sum(planner.take_request("newsdata") for _ in range(10)), 3)
+        planner.save()
+
+        planner = QueryPlanner(TOPICS, self.path, now=NOW + timedelta(hours=13))
+        self.assertEqual(planner.plan("newsdata", daily_quota=7, max_pages=5), [])
+        self.assertFalse(planner.take_request("newsdata"))
+
+        planner = QueryPlanner(TOPICS, self.path, now=NOW + timedelta(days=1))
+        self.assertEqual(len(planner.plan("newsdata", daily_quota=7, max_pages=5)), 2)
+
+    @patch("query_planner.MIN_UNSEEN_FRACTION", 0.3)
+    def test_stop_paging_below_unseen_fraction(self):
+        planner = QueryPlanner(TOPICS)
+        self.assertTrue(planner.should_stop_paging(0.2))
+        self.assertFalse(planner.should_stop_paging(0.5))
+
+
+if __name__ == "__main__":
+    unittest.main()
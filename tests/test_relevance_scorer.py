@@ -0,0 +1,37 @@
+import unittest
+import numpy as np
+from relevance_scorer import TopicRelevance
+
+
+class FakeBackend:
+    """
+    Embeds texts as normalized bags of words over a tiny vocabulary.
+    """
+
+    VOCABULARY = ["india", "economy", "growth", "space", "cricket", "weather"]
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts):
+        self.calls += 1
+        embeddings = np.array([[text.lower().split().count(word) for word in self.VOCABULARY] for text in texts], dtype=np.float32)
+        return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-9)
+
+
+class TestTopicRelevance(unittest.TestCase):
+
+    def test_scores_max_topic_similarity_in_one_encode(self):
+        backend = FakeBackend()
+        scorer = TopicRelevance(["india economy growth", "india space"], floor=0.2, ceiling=0.6, backend=backend)
+        self.assertEqual(backend.calls, 1)  # The topics are embedded once
+        relevance = scorer.score(["India growth economy", "India space", "cricket weather", "India cricket"])
+        self.assertEqual(backend.calls, 2)
+        np.testing.assert_allclose(relevance[:3], [1.0, 1.0, 0.0])
+        # cos("india cricket", "india space") = 0.5 maps to (0.5 - 0.2) / 0.4
+        self.assertAlmostEqual(float(relevance[3]), 0.75, places=5)
+        self.assertEqual(len(scorer.score([])), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+from score_cache import ScoreCache, article_cache_key
+from blob_storage import BlobConflictError
+from workflow import filter_positive_articles
+
+
+class TestScoreCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "scores.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_key_normalizes_text_and_includes_version(self):
+        key = article_cache_key("ISRO  launches satellite", "Big day", "gpt", "1")
+        self.assertEqual(key, article_cache_key(" isro launches\nsatellite ", "big day", "gpt", "1"))
+        self.assertNotEqual(key, article_cache_key("ISRO launches satellite", "Big day", "gpt", "2"))
+        self.assertNotEqual(key, article_cache_key("ISRO launches satellite", "Big day", "gpt-4", "1"))
+
+    def test_put_get_and_ttl_eviction(self):
+        cache = ScoreCache(self.path, ttl_days=1)
+        with patch("score_cache.time.time", return_value=1000.0):
+            cache.put("a", 0.8, 0.7)
+        with patch("score_cache.time.time", return_value=1000.0 + 3600):
+            self.assertEqual(cache.get("a"), (0.8, 0.7))
+        with patch("score_cache.time.time", return_value=1000.0 + 2 * 86400):
+            self.assertIsNone(cache.get("a"))
+            self.assertEqual(cache.evict_expired(), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.close()
+
+    def test_sync_evicts_expired_entries(self):
+        # A long-running process never reopens the cache, so expired entries are evicted on sync
+        with patch("score_cache.time.time", return_value=1000.0):
+            cache = ScoreCache(self.path, ttl_days=1)
+            cache.put("a", 0.8, 0.7)
+        with patch("score_cache.time.time", return_value=1000.0 + 2 * 86400):
+            cache.put("b", 0.6, 0.5)
+            cache.sync()
+        self.assertEqual(cache._conn.execute("SELECT key FROM scores").fetchall(), [("b",)])
+        cache.close()
+
+    def test_persists_across_instances(self):
+        cache = ScoreCache(self.path, ttl_days=1)
+        cache.put("a", 0.8, 0.7)
+        cache.close()
+        cache = ScoreCache(self.path, ttl_days=1)
+        self.assertEqual(cache.get("a"), (0.8, 0.7))
+        cache.close()
+
+    @patch("score_cache.download_blob")
+    @patch("score_cache.upload_blob")
+    def test_sync_uploads_and_reloads_after_a_conflict(self, mock_upload_blob, mock_download_blob):
+        cache = ScoreCache(self.path, ttl_days=1, blob_name="scores.db")
+        cache.put("a", 0.8, 0.7)
+        cache.sync()
+        mock_upload_blob.assert_called_once_with(self.path, "scores.db")
+
+        # Another run uploaded its cache: this process continues from that one
+        mock_upload_blob.side_effect = BlobConflictError("scores.db")
+        mock_download_blob.side_effect = lambda blob_name, path: os.remove(path)
+        cache.sync()
+        self.assertIsNone(cache.get("a"))
+        cache.put("b", 0.6, 0.5)
+        self.assertEqual(cache.get("b"), (0.6, 0.5))
+        mock_upload_blob.side_effect = None
+        cache.close()
+
+    @patch("workflow.analyze_sentiment_with_openai")
+    def test_filter_positive_articles_skips_cached_articles(self, mock_analyze):
+        mock_analyze.side_effect = [(0.9, 0.9), (0.0, 0.0), (0.8, 0.8)]
+        articles = [{"title": "Cached", "description": ""}, {"title": "Failed", "description": ""}]
+        cache = ScoreCache(self.path, ttl_days=1)
+        first = filter_positive_articles(articles, MagicMock(), "model", 0.5, 0.5, cache=cache)
+        second = filter_positive_articles(articles, MagicMock(), "model", 0.5, 0.5, cache=cache)
+        cache.close()
+
+        self.assertEqual(first, [(0.9, articles[0])])
+        self.assertEqual(second, [(0.9, articles[0]), (0.8, articles[1])])
+        # The failed (0.0, 0.0) result was not cached, so only that article is re-scored
+        self.assertEqual(mock_analyze.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
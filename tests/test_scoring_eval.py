@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+import numpy as np
+from scoring_eval import evaluate_prefilter, evaluate_relevance, evaluate_logprobs, load_dataset, save_dataset
+
+
+class TestScoringEval(unittest.TestCase):
+
+    def setUp(self):
+        self.records = [
+            {"title": "India GDP growth beats estimates", "description": "", "sentiment": 0.9, "relevance": 0.9},
+            {"title": "Five killed in bus accident in Pune", "description": "", "sentiment": 0.1, "relevance": 0.2},
+            {"title": "Floods devastate villages in Assam", "description": "", "sentiment": 0.1, "relevance": 0.1},
+            {"title": "Terrible quarter ends with a sad outlook", "description": "", "sentiment": 0.2, "relevance": 0.3},
+            {"title": "Not bad: a modest rise in exports", "description": "", "sentiment": 0.8, "relevance": 0.8},
+        ]
+
+    def test_reports_recall_and_savings_per_threshold(self):
+        loose, strict = evaluate_prefilter(self.records, [-0.9, 0.5], batch_size=2)
+        self.assertEqual(loose["llm_positives"], 2)
+        self.assertEqual(loose["recall"], 1.0)
+        self.assertEqual(loose["articles_not_scored"], 2)  # Only the crime and disaster reports
+        self.assertEqual(loose["requests_saved"], 1)
+        # Rejecting everything below positive polarity saves more calls but loses a positive
+        self.assertEqual(strict["articles_not_scored"], 4)
+        self.assertEqual(strict["recall"], 0.5)
+        self.assertEqual(strict["missed_positives"], ["Not bad: a modest rise in exports"])
+
+    def test_reports_local_relevance_agreement(self):
+        scorer = MagicMock()
+        scorer.score.return_value = np.array([0.95, 0.0, 0.1, 0.6, 0.3])
+        report = evaluate_relevance(self.records, scorer)
+        self.assertAlmostEqual(report["spearman"], 0.8, places=5)
+        self.assertEqual(report["threshold_agreement"], 0.6)
+        self.assertEqual(report["threshold_recall"], 0.5)
+        self.assertEqual((report["llm_selected"], report["local_selected"]), (2, 1))
+        self.assertEqual(report["selection_recall"], 0.5)
+        self.assertEqual(report["selection_precision"], 1.0)
+        self.assertEqual(report["missed_selections"], ["Not bad: a modest rise in exports"])
+
+    def test_reports_logprob_calibration(self):
+        logprob_scores = [(0.85, 0.95), (0.3, 0.2), (0.3, 0.1), None, (0.45, 0.75)]
+        records = [
+            dict(record, logprob_sentiment=scores[0], logprob_relevance=scores[1], logprob_latency=0.2) if scores else record
+            for record, scores in zip(self.records, logprob_scores)
+        ]
+        report = evaluate_logprobs(records, bins=2)
+        self.assertEqual(report["articles"], 4)  # The article without logprob scores is skipped
+        self.assertAlmostEqual(report["sentiment"]["mean_shift"], (-0.05 + 0.2 + 0.2 - 0.35) / 4)
+        self.assertEqual(report["sentiment"]["spearman"], 1.0)
+        self.assertEqual([b["articles"] for b in report["sentiment"]["calibration"]], [3, 1])
+        self.assertAlmostEqual(report["sentiment"]["calibration"][0]["mean_reference"], (0.1 + 0.1 + 0.8) / 3)
+        self.assertEqual((report["llm_selected"], report["logprob_selected"]), (2, 1))
+        self.assertEqual(report["missed_selections"], ["Not bad: a modest rise in exports"])
+        self.assertEqual(report["selection_precision"], 1.0)
+        self.assertAlmostEqual(report["mean_latency_seconds"], 0.2)
+
+    def test_dataset_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "dataset.jsonl")
+            self.assertEqual(load_dataset(path), [])
+            save_dataset(path, self.records)
+            self.assertEqual(load_dataset(path), self.records)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+import numpy as np
+from selection import LazySelection, article_prior
+
+NOW = datetime(2024, 6, 15, 12, tzinfo=timezone.utc)
+SCORES = {
+    "Sensex closes flat": (0.5, 0.3),
+    "India GDP growth beats estimates": (0.9, 0.9),
+    "Startup raises funding for expansion": (0.8, 0.7),
+    "Metro line opens to commuters": (0.7, 0.6),
+    "Old milestone for India space programme": (0.95, 0.95),
+}
+
+
+def make_articles():
+    hours = [1, 2, 3, 4, 90]
+    return [
+        {"title": title, "description": "", "url": f"https://ndtv.com/{i}", "publishedAt": f"2024-06-{15 - hour // 24:02d}T{12 - hour % 24:02d}:00:00Z"}
+        for i, (title, hour) in enumerate(zip(SCORES, hours))
+    ]
+
+
+@patch("selection.load_history_index", return_value=(set(), None))
+@patch("selection.flag_history_duplicates", side_effect=lambda titles, history: ([title in history[0] for title in titles], np.eye(len(titles), dtype=np.float32)))
+class TestLazySelection(unittest.TestCase):
+
+    def setUp(self):
+        self.scored = []
+
+    def score(self, articles):
+        self.scored.extend(article["title"] for article in articles)
+        return [SCORES[article["title"]] + (0.0,) for article in articles]
+
+    def test_stops_scoring_at_first_good_enough_candidate(self, *_):
+        selection = LazySelection(make_articles(), self.score, 0.5, 0.5, good_enough=0.85, chunk_size=2, now=NOW)
+        combined_score, article = next(selection.ranked)
+        self.assertEqual(article["title"], "India GDP growth beats estimates")
+        self.assertAlmostEqual(combined_score, 0.9)
+        self.assertEqual(len(self.scored), 2)
+        report = selection.report()
+        self.assertEqual(report["scorings_avoided"], 3)
+        self.assertEqual(report["scoring_rounds_avoided"], 2)
+        self.assertFalse(selection.complete)
+
+    def test_without_good_enough_candidate_ranks_like_exhaustive_scoring(self, *_):
+        selection = LazySelection(make_articles(), self.score, 0.5, 0.5, good_enough=1.1, chunk_size=2, now=NOW)
+        ranked = [article["title"] for _, article in selection.ranked]
+        self.assertEqual(ranked, [
+            "Old milestone for India space programme",
+            "India GDP growth beats estimates",
+            "Startup raises funding for expansion",
+            "Metro line opens to commuters",
+        ])
+        self.assertEqual(len(self.scored), 5)
+        self.assertEqual(selection.report()["scorings_avoided"], 0)
+        self.assertTrue(selection.complete)
+
+    def test_prior_prefers_recent_growth_news_and_demotes_clear_rejects(self, *_):
+        domains = {"ndtv.com"}
+        growth = {"title": "India GDP growth beats estimates", "url": "https://www.ndtv.com/a", "publishedAt": "2024-06-15T11:00:00Z"}
+        older = dict(growth, publishedAt="2024-06-12T11:00:00Z")
+        elsewhere = dict(growth, url="https://example.com/a")
+        crime = {"title": "Five killed in bus accident", "url": "https://ndtv.com/b", "publishedAt": "2024-06-15T11:00:00Z"}
+        self.assertGreater(article_prior(growth, NOW, domains), article_prior(older, NOW, domains))
+        self.assertGreater(article_prior(growth, NOW, domains), article_prior(elsewhere, NOW, domains))
+        self.assertEqual(article_prior(crime, NOW, domains), -1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import math
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from sentiment_analysis import analyze_sentiment_batch_with_openai, analyze_sentiment_only_batch_with_openai, parse_batch_scores
+from sentiment_analysis import analyze_sentiment_with_logprobs, expected_rating, NEGATIVE_KEYWORDS
+
+
+def mock_response(content):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    return response
+
+
+class TestBatchScoring(unittest.TestCase):
+
+    def test_parse_batch_scores_drops_malformed_items(self):
+        content = (
+            'Here you go: [{"id": 0, "sentiment": 0.8, "relevance": 9},'
+            ' {"id": 1, "sentiment": 3, "relevance": 5},'
+            ' {"id": 2, "sentiment": 0.0, "relevance": "7"},'
+            ' {"id": 0, "sentiment": -1, "relevance": 0},'
+            ' {"id": 3, "sentiment": -0.5, "relevance": 2.0}]'
+        )
+        scores = parse_batch_scores(content, 4)
+        self.assertEqual(scores, {0: (0.9, 0.9), 3: (0.25, 0.2)})
+
+    def test_parse_batch_scores_invalid_json(self):
+        self.assertEqual(parse_batch_scores("Sentiment: 0.5, Relevance: 5", 2), {})
+        self.assertEqual(parse_batch_scores("[{\"id\": 0,", 2), {})
+
+    @patch("sentiment_analysis.analyze_sentiment_with_openai", return_value=(0.5, 0.5))
+    def test_rescores_only_missing_items(self, mock_single):
+        client = MagicMock()
+        client.chat.completions.create.return_value = mock_response(
+            '[{"id": 0, "sentiment": 1, "relevance": 10}, {"id": 2, "sentiment": -1, "relevance": 0}]'
+        )
+        scores = analyze_sentiment_batch_with_openai(client, ["a", "b", "c"], "model")
+        self.assertEqual(scores, [(1.0, 1.0), (0.5, 0.5), (0.0, 0.0)])
+        client.chat.completions.create.assert_called_once()
+        mock_single.assert_called_once_with(client, "b", "model")
+
+    def test_sentiment_only_batch_rerequests_missing_items(self):
+        client = MagicMock()
+        client.chat.completions.create.side_effect = [
+            mock_response('[{"id": 0, "sentiment": 0.6}, {"id": 2, "sentiment": 7}]'),
+            mock_response('[{"id": 0, "sentiment": -0.2}]'),
+            mock_response("I cannot score this."),
+        ]
+        scores = analyze_sentiment_only_batch_with_openai(client, ["a", "b", "c"], "model")
+        self.assertEqual(scores, [0.8, 0.4, 0.0])
+        self.assertEqual(client.chat.completions.create.call_count, 3)
+
+
+class TestNegativeKeywords(unittest.TestCase):
+
+    def test_each_keyword_matches(self):
+        for headline in (
+            "Five killed in bus accident", "Two dead after building falls", "Death toll rises", "Elephant dies in Kerala",
+            "Three died in Delhi", "Patients die as oxygen runs out", "Man held for murder", "Rape accused held",
+            "Assault case filed", "Police arrest gang", "Road accident on expressway", "Plane crash in Nepal",
+            "Bridge collapse in Bihar", "Fire at factory", "Blast in quarry", "Explosion at plant", "Floods hit Assam",
+            "Boy drowns in lake", "Earthquake jolts Delhi", "Cyclone nears coast", "Landslide blocks highway",
+            "Riot in town", "Students clash with police", "Attack on convoy", "Terror plot foiled", "Loan scam exposed",
+            "Fraud case registered", "Suicide note found", "Stampede at temple",
+        ):
+            self.assertIsNotNone(NEGATIVE_KEYWORDS.search(headline), headline)
+
+    def test_words_that_only_contain_a_keyword_do_not_match(self):
+        for headline in (
+            "Die-casting plant opens in Pune", "Diesel prices cut", "Deadline for filings extended", "Firefly wins award",
+            "Diet startup raises funds", "Ceasefire holds",
+        ):
+            self.assertIsNone(NEGATIVE_KEYWORDS.search(headline), headline)
+
+
+def logprob_response(probabilities):
+    top_logprobs = [SimpleNamespace(token=token, logprob=math.log(p)) for token, p in probabilities.items()]
+    response = MagicMock()
+    response.choices[0].logprobs.content = [SimpleNamespace(token=top_logprobs[0].token, logprob=top_logprobs[0].logprob, top_logprobs=top_logprobs)]
+    return response
+
+
+class TestLogprobScoring(unittest.TestCase):
+
+    def test_expected_rating(self):
+        tokens = lambda probabilities: [SimpleNamespace(token=token, logprob=math.log(p)) for token, p in probabilities.items()]
+        self.assertAlmostEqual(expected_rating(tokens({"9": 0.5, "6": 0.25, " The": 0.25})), (9 * 2 + 6) / 3 / 9)
+        self.assertAlmostEqual(expected_rating(tokens({"3": 0.4, " 3": 0.4, "12": 0.2})), 3 / 9)  # Spacing variants add up
+        self.assertIsNone(expected_rating(tokens({"Positive": 0.9, "Negative": 0.1})))
+
+    def test_rates_sentiment_and_relevance_with_one_token_each(self):
+        client = MagicMock()
+        client.chat.completions.create.side_effect = [logprob_response({"9": 0.5, "7": 0.5}), logprob_response({"0": 1.0})]
+        self.assertEqual(analyze_sentiment_with_logprobs(client, "ISRO launches", "model"), (8 / 9, 0.0))
+        for call in client.chat.completions.create.call_args_list:
+            self.assertEqual((call.kwargs["max_tokens"], call.kwargs["logprobs"]), (1, True))
+        self.assertIn("sentiment", client.chat.completions.create.call_args_list[0].kwargs["messages"][1]["content"])
+
+    def test_sentiment_only_and_failures(self):
+        client = MagicMock()
+        client.chat.completions.create.return_value = logprob_response({"9": 1.0})
+        self.assertEqual(analyze_sentiment_with_logprobs(client, "ISRO launches", "model", with_relevance=False), (1.0, 0.0))
+        client.chat.completions.create.assert_called_once()
+        client.chat.completions.create.return_value = logprob_response({"Great": 1.0})
+        self.assertEqual(analyze_sentiment_with_logprobs(client, "ISRO launches", "model"), (0.0, 0.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time allowed for `import main`, measured with `python -X importtime`
+IMPORT_TIME_BUDGET_SECONDS = float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", "0.6"))
+
+# Packages that must only be imported on first use
+HEAVY_PACKAGES = {"torch", "sentence_transformers", "transformers", "openai", "tweepy", "textblob", "nltk", "azure"}
+
+
+def import_times(module):
+    """
+    Imports a module in a fresh interpreter and returns the cumulative import
+    time in microseconds of every module it loaded, parsed from -X importtime.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative_us)
+    return times
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_main_import_is_lazy_and_within_budget(self):
+        times = import_times("main")
+
+        heavy = sorted(name for name in times if name.split(".")[0] in HEAVY_PACKAGES)
+        self.assertEqual(heavy, [], "Heavy dependencies imported at startup")
+        self.assertLess(
+            times["main"] / 1e6, IMPORT_TIME_BUDGET_SECONDS,
+            f"Importing main took {times['main'] / 1e6:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+import unittest
+import numpy as np
+from story_clustering import StoryClusters, cluster_embeddings, trending_bonus
+from config import TRENDING_WEIGHT, TRENDING_SATURATION
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class TestStoryClustering(unittest.TestCase):
+
+    def test_articles_join_the_most_similar_representative(self):
+        clusters = StoryClusters(0.8)
+        self.assertEqual(clusters.add("launch", unit(1, 0, 0)), (0, True))
+        self.assertEqual(clusters.add("gdp", unit(0, 1, 0)), (1, True))
+        self.assertEqual(clusters.add("launch again", unit(0.95, 0.1, 0)), (0, False))
+        self.assertEqual(clusters.add("gdp again", unit(0.3, 1, 0)), (1, False))
+        self.assertEqual(clusters.add("budget", unit(0.5, 0.5, 0.7)), (2, True))
+        self.assertEqual(clusters.representatives, ["launch", "gdp", "budget"])
+        self.assertEqual(clusters.cluster_of["gdp again"], 1)
+
+    def test_threshold_above_one_disables_clustering(self):
+        embeddings = np.vstack([unit(1, 0), unit(1, 0), unit(0, 1)])
+        self.assertEqual(cluster_embeddings(embeddings, 0.9), [0, 0, 1])
+        self.assertEqual(cluster_embeddings(embeddings, 2.0), [0, 1, 2])
+
+    def test_trending_bonus_grows_with_cluster_size_and_saturates(self):
+        self.assertEqual(trending_bonus(1), 0.0)
+        self.assertGreater(trending_bonus(3), trending_bonus(2))
+        self.assertAlmostEqual(trending_bonus(TRENDING_SATURATION), TRENDING_WEIGHT)
+        self.assertAlmostEqual(trending_bonus(10 * TRENDING_SATURATION), TRENDING_WEIGHT)
+
+    def test_trending_saturation_below_two_is_rejected(self):
+        repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for saturation in ("0", "1"):
+            result = subprocess.run(
+                [sys.executable, "-c", "import config"], cwd=repo_root, capture_output=True, text=True,
+                env=dict(os.environ, TRENDING_SATURATION=saturation)
+            )
+            self.assertNotEqual(result.returncode, 0)
+            self.assertIn("TRENDING_SATURATION must be at least 2", result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from twitter_poster import weighted_length, plan_thread, validate_thread, post_thread_with_link, resume_thread, ThreadProgress
+from config import THREAD_MAX_ATTEMPTS
+from blob_storage import BlobConflictError
+
+
+class FlakyClient:
+    """
+    Posts tweets with increasing IDs, failing the calls whose numbers are in fail_on.
+    """
+
+    def __init__(self, fail_on=()):
+        self.fail_on = set(fail_on)
+        self.calls = 0
+        self.posted = []
+
+    def create_tweet(self, text, in_reply_to_tweet_id=None):
+        self.calls += 1
+        if self.calls in self.fail_on:
+            raise RuntimeError("503 Service Unavailable")
+        tweet_id = 100 + len(self.posted)
+        self.posted.append((tweet_id, text, in_reply_to_tweet_id))
+        return SimpleNamespace(data={"id": tweet_id})
+
+
+class TestWeightedLength(unittest.TestCase):
+
+    def test_weights(self):
+        self.assertEqual(weighted_length("India"), 5)
+        self.assertEqual(weighted_length("नमस्ते"), 6)  # Devanagari counts 1 per code point
+        self.assertEqual(weighted_length("日本語"), 6)
+        self.assertEqual(weighted_length("🚀"), 2)
+        self.assertEqual(weighted_length("👨‍👩‍👧 🇮🇳 ❤️"), 8)  # Sequences count as one emoji
+        self.assertEqual(weighted_length("Read https://example.com/a/very/long/path?with=query."), 5 + 23 + 1)
+
+
+class TestPlanThread(unittest.TestCase):
+
+    URL = "https://example.com/" + "a" * 100
+
+    def test_short_summary_is_one_tweet(self):
+        self.assertEqual(plan_thread("ISRO launches a satellite 🚀", self.URL, "#Space"), [f"ISRO launches a satellite 🚀\n#Space\n🔗 {self.URL}"])
+
+    def test_long_summary_fills_tweets_by_weight(self):
+        summary = " ".join(["भारत 🚀 #IndiaRising"] * 40 + ["x" * 600])
+        tweets = plan_thread(summary, self.URL, "#Space")
+        validate_thread(tweets)
+        self.assertTrue(tweets[0].endswith(f"\n#Space\n🔗 {self.URL}"))
+        self.assertTrue(all(tweet.endswith("\n#Space") for tweet in tweets[1:]))
+        # Tweets are filled up to the limit; the 600-character word starts its own tweets and is cut only where it must be
+        self.assertEqual([weighted_length(tweet) for tweet in tweets], [272, 279, 279, 61, 280, 280, 61])
+        # Words and hashtags are kept whole, and nothing is lost
+        words = [word for tweet in tweets for word in tweet.rsplit("\n#Space", 1)[0].split()]
+        self.assertEqual("".join(words), summary.replace(" ", ""))
+        self.assertNotIn("#IndiaRisin\n", "\n".join(tweets))
+
+    def test_invalid_threads(self):
+        with self.assertRaises(ValueError):
+            plan_thread("Summary", self.URL, "#" + "a" * 300)
+        with self.assertRaises(ValueError):
+            validate_thread(["ok", "🚀" * 141])
+        with self.assertRaises(ValueError):
+            validate_thread([" \n"])
+
+
+class TestPostThread(unittest.TestCase):
+
+    def setUp(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.progress_path = os.path.join(directory, "thread_progress.json")
+        self.summary = " ".join(["Positive news from India"] * 30)
+
+    def progress(self):
+        return ThreadProgress(self.progress_path, blob_name=None)
+
+    def test_failed_thread_resumes_without_reposting(self):
+        client = FlakyClient(fail_on={2})
+        self.assertIsNone(post_thread_with_link(client, self.summary, "https://example.com", "#Tag", self.progress()))
+        self.assertEqual(len(client.posted), 1)
+        self.assertTrue(os.path.exists(self.progress_path))
+
+        self.assertFalse(resume_thread(client, self.progress()))
+        tweet_id = client.posted[-1][0]
+        tweets = plan_thread(self.summary, "https://example.com", "#Tag")
+        self.assertEqual([text for _, text, _ in client.posted], tweets)
+        # Every tweet replies to the one before it, across the two runs
+        self.assertEqual([reply_to for _, _, reply_to in client.posted], [None] + [tweet_id for tweet_id, _, _ in client.posted[:-1]])
+        self.assertFalse(os.path.exists(self.progress_path))
+        self.assertFalse(resume_thread(client, self.progress()))
+
+    def test_invalid_thread_posts_nothing(self):
+        client = MagicMock()
+        self.assertIsNone(post_thread_with_link(client, self.summary, "https://example.com", "#" + "a" * 300, self.progress()))
+        client.create_tweet.assert_not_called()
+
+    def test_progress_upload_failure_does_not_stop_a_live_thread(self):
+        client = FlakyClient()
+        progress = ThreadProgress(self.progress_path, blob_name="thread_progress.json")
+        uploads = []
+
+        def upload(path, blob_name):
+            uploads.append(blob_name)
+            if len(uploads) > 2:  # Fails once the first tweet is live
+                raise BlobConflictError(blob_name)
+
+        with patch("twitter_poster.upload_blob", side_effect=upload), patch("twitter_poster.delete_blob", side_effect=RuntimeError("Blob storage down")):
+            tweet_id = post_thread_with_link(client, self.summary, "https://example.com", "#Tag", progress)
+        self.assertEqual([text for _, text, _ in client.posted], plan_thread(self.summary, "https://example.com", "#Tag"))
+        self.assertEqual(tweet_id, client.posted[-1][0])
+
+    def test_unreadable_progress_counts_as_pending(self):
+        # On a fresh machine there is no local copy: a failed read must not look like "no thread pending"
+        client = FlakyClient()
+        with patch("twitter_poster.download_blob", return_value=False), self.assertRaises(RuntimeError):
+            resume_thread(client, ThreadProgress(self.progress_path, blob_name="thread_progress.json"))
+        self.assertEqual(client.calls, 0)
+
+    def test_thread_is_given_up_after_max_attempts(self):
+        client = FlakyClient(fail_on=range(1, THREAD_MAX_ATTEMPTS + 1))
+        post_thread_with_link(client, self.summary, "https://example.com", "#Tag", self.progress())
+        for _ in range(2, THREAD_MAX_ATTEMPTS + 1):
+            self.assertTrue(resume_thread(client, self.progress()))  # Still pending: no new thread may be posted
+        self.assertFalse(resume_thread(client, self.progress()))
+        self.assertEqual(client.calls, THREAD_MAX_ATTEMPTS)
+        self.assertFalse(os.path.exists(self.progress_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
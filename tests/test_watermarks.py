@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+from fake_blob_storage import FakeContainerClient
+from newsapi_fetcher import construct_newsapi_url
+from newsdata_fetcher import fetch_news as fetch_newsdata
+from watermarks import FetchWatermarks, parse_published_at
+
+BLOB_NAME = "fetch_watermarks.json"
+
+
+class TestFetchWatermarks(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "watermarks.json")
+        self.container = FakeContainerClient()
+        self.patches = [
+            patch("blob_storage.get_container_client", return_value=self.container),
+            patch("blob_storage.BLOB_CACHE_DIR", os.path.join(self.tmpdir.name, "cache")),
+            patch.dict("blob_storage._etags", clear=True),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        self.tmpdir.cleanup()
+
+    def watermarks(self):
+        return FetchWatermarks(self.path, overlap_hours=1, blob_name=BLOB_NAME)
+
+    def test_parse_published_at(self):
+        expected = datetime(2024, 6, 15, 10, 0, tzinfo=timezone.utc)
+        self.assertEqual(parse_published_at("2024-06-15T10:00:00Z"), expected)
+        self.assertEqual(parse_published_at("2024-06-15 10:00:00"), expected)
+        self.assertEqual(parse_published_at("2024-06-15T15:30:00+05:30"), expected)
+        self.assertIsNone(parse_published_at("yesterday"))
+        self.assertIsNone(parse_published_at(None))
+
+    def test_watermarks_persist_and_count_new_articles(self):
+        first_run = self.watermarks()
+        self.assertIsNone(first_run.since("newsapi", ["a", "b"]))
+        first_run.record("newsapi", ["a", "b"], [{"publishedAt": "2024-06-15T10:00:00Z"}, {"publishedAt": "2024-06-15T08:00:00Z"}])
+        self.assertEqual(first_run.report(), {"newsapi": {"fetched": 2, "new": 2}})
+        self.assertIsNone(self.watermarks().since("newsapi", ["a"]))  # Not saved yet
+        first_run.save()
+
+        second_run = self.watermarks()
+        self.assertEqual(second_run.since("newsapi", ["a", "b"]), datetime(2024, 6, 15, 9, 0, tzinfo=timezone.utc))
+        self.assertIsNone(second_run.since("newsapi", ["a", "c"]))  # "c" was never fetched
+        self.assertIsNone(second_run.since("newsdata", ["a"]))
+        second_run.record("newsapi", ["a", "b"], [{"publishedAt": "2024-06-15T12:00:00Z"}, {"publishedAt": "2024-06-15T09:30:00Z"}])
+        self.assertEqual(second_run.report(), {"newsapi": {"fetched": 2, "new": 1}})
+
+    def test_concurrent_runs_are_merged(self):
+        run = self.watermarks()
+        run.record("newsapi", ["a", "b"], [{"publishedAt": "2024-06-15T10:00:00Z"}])
+        # Another run saves its watermarks in the meantime
+        self.container.put(BLOB_NAME, json.dumps({"newsapi": {"a": "2024-06-15T12:00:00+00:00"}}).encode())
+        run.save()
+
+        stored = json.loads(self.container.blobs[BLOB_NAME][0])
+        self.assertEqual(stored["newsapi"], {"a": "2024-06-15T12:00:00+00:00", "b": "2024-06-15T10:00:00+00:00"})
+
+
+class TestIncrementalFetching(unittest.TestCase):
+
+    def test_newsapi_requests_articles_since_watermark(self):
+        since = datetime.now(timezone.utc) - timedelta(hours=12)
+        url = construct_newsapi_url(["India"], "example.com", "key", since=since)
+        self.assertIn(f"from={since.strftime('%Y-%m-%dT%H:%M:%S')}&", url)
+
+        url = construct_newsapi_url(["India"], "example.com", "key", since=since - timedelta(days=30))
+        self.assertIn(f"from={(datetime.now(timezone.utc) - timedelta(days=10)).strftime('%Y-%m-%d')}&", url)
+
+    def test_newsdata_stops_paging_at_watermark(self):
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        page = MagicMock(status_code=200)
+        page.json.return_value = {"nextPage": "cursor", "results": [
+            {"title": "Fresh", "pubDate": (now - timedelta(minutes=10)).strftime("%Y-%m-%d %H:%M:%S")},
+            {"title": "Seen", "pubDate": (now - timedelta(hours=5)).strftime("%Y-%m-%d %H:%M:%S")},
+        ]}
+        session = MagicMock()
+        session.get.return_value = page
+        watermarks = MagicMock()
+        watermarks.since.return_value = now - timedelta(hours=2)
+
+        with patch("newsdata_fetcher.create_session", return_value=session):
+            articles = fetch_newsdata(["India"], "key", watermarks=watermarks)
+
+        self.assertEqual([article["title"] for article in articles], ["Fresh"])
+        session.get.assert_called_once()
+        watermarks.record.assert_called_once_with("newsdata", ["India"], articles)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import random
+import subprocess
+import sys
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+import numpy as np
+from workflow import filter_positive_articles, score_articles
+
+
+def fake_analyze(client, text, model):
+    # Simulate network jitter so concurrent calls complete out of order
+    time.sleep(random.uniform(0, 0.01))
+    if "Great" in text:
+        return 0.9, 0.9
+    if "Good" in text:
+        return 0.8, 0.8
+    return 0.2, 0.1
+
+
+class TestFilterPositiveArticles(unittest.TestCase):
+
+    def setUp(self):
+        self.articles = [
+            {"title": "Good Article 1", "description": ""},
+            {"title": "Bad Article", "description": ""},
+            {"title": "Great Article", "description": ""},
+            {"title": "Good Article 2", "description": ""},
+            {"title": "Good Article 3", "description": ""},
+        ]
+
+    @patch("workflow.analyze_sentiment_with_openai", side_effect=fake_analyze)
+    def test_concurrent_matches_serial_ordering(self, mock_analyze):
+        serial = filter_positive_articles(self.articles, MagicMock(), "model", 0.5, 0.5)
+        concurrent = filter_positive_articles(self.articles, MagicMock(), "model", 0.5, 0.5, max_workers=4)
+        self.assertEqual(serial, concurrent)
+        self.assertEqual(
+            [article["title"] for _, article in concurrent],
+            ["Great Article", "Good Article 1", "Good Article 2", "Good Article 3"]
+        )
+        self.assertEqual(mock_analyze.call_count, 2 * len(self.articles))
+
+    @patch("workflow.analyze_sentiment_with_openai", side_effect=fake_analyze)
+    def test_prefilter_skips_clear_rejects(self, mock_analyze):
+        articles = self.articles + [{"title": "Five killed in bus accident", "description": ""}]
+        positives = filter_positive_articles(articles, MagicMock(), "model", 0.5, 0.5, prefilter=True)
+        self.assertEqual(positives, filter_positive_articles(self.articles, MagicMock(), "model", 0.5, 0.5))
+        scored = [call.args[1] for call in mock_analyze.call_args_list]
+        self.assertNotIn("Five killed in bus accident ", scored)
+
+    @patch("workflow.analyze_sentiment_with_openai")
+    @patch("workflow.analyze_sentiment_only_batch_with_openai", side_effect=lambda client, texts, model: [0.9] * len(texts))
+    @patch("workflow.get_topic_relevance")
+    def test_local_relevance_asks_only_for_sentiment(self, mock_relevance, mock_sentiment_only, mock_analyze):
+        mock_relevance.return_value.score.return_value = np.array([0.8, 0.1, 0.7, 0.9, 0.6])
+        scores = score_articles(self.articles, MagicMock(), "model", batch_size=2, local_relevance=True)
+        self.assertEqual([(sentiment, relevance) for sentiment, relevance, _ in scores], [
+            (0.9, 0.8), (0.0, 0.1), (0.9, 0.7), (0.9, 0.9), (0.9, 0.6)
+        ])
+        # The irrelevant article is not sent; the other four share two requests
+        self.assertEqual(mock_sentiment_only.call_count, 2)
+        mock_analyze.assert_not_called()
+
+    @patch("workflow.analyze_sentiment_batch_with_openai")
+    @patch("workflow.analyze_sentiment_with_logprobs", side_effect=lambda client, text, model, with_relevance: (0.9, 0.8 if with_relevance else 0.0))
+    def test_logprobs_mode_scores_each_article_and_caches_separately(self, mock_logprobs, mock_batch):
+        cache = MagicMock()
+        cache.get.return_value = None
+        scores = score_articles(self.articles, MagicMock(), "model", batch_size=2, cache=cache, scoring_mode="logprobs")
+        self.assertEqual([(sentiment, relevance) for sentiment, relevance, _ in scores], [(0.9, 0.8)] * 5)
+        self.assertEqual(mock_logprobs.call_count, 5)
+        mock_batch.assert_not_called()
+        json_keys = {call.args[0] for call in cache.get.call_args_list}
+        cache.reset_mock()
+        with patch("workflow.analyze_sentiment_batch_with_openai", return_value=[(0.9, 0.8)] * 2), patch("workflow.analyze_sentiment_with_openai", return_value=(0.9, 0.8)):
+            score_articles(self.articles, MagicMock(), "model", batch_size=2, cache=cache, scoring_mode="json")
+        self.assertFalse(json_keys & {call.args[0] for call in cache.get.call_args_list})
+
+
+class TestModeSettings(unittest.TestCase):
+
+    def test_unknown_modes_are_rejected(self):
+        repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for name in ("RELEVANCE_MODE", "SCORING_MODE", "SELECTION_MODE"):
+            result = subprocess.run(
+                [sys.executable, "-c", "import config"], cwd=repo_root, capture_output=True, text=True,
+                env=dict(os.environ, **{name: "typo"})
+            )
+            self.assertNotEqual(result.returncode, 0)
+            self.assertIn(f"{name} must be", result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
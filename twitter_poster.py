@@ -1,43 +1,237 @@
 from logger import logger  # Import the centralized logger
+from metrics import metrics
+from blob_storage import download_blob, upload_blob, delete_blob
+from config import THREAD_PROGRESS_FILE, THREAD_PROGRESS_BLOB_NAME, THREAD_MAX_ATTEMPTS
 from typing import Optional, List
+import json
+import os
 import re
+import unicodedata
 
 MAX_TWEET_LENGTH = 280
 LINK_LENGTH = 23  # Twitter/X t.co shortener
 HASHTAGS = "#PositiveIndiaAI"
 EXTRA = len("\n🔗 \n")  # newline, emoji, and space
 
-def split_text_without_splitting_words_or_hashtags(text, max_length):
+# X counts tweet length by weight (twitter-text v3): code points in these ranges
+# count 1, all others (CJK, emoji, ...) count 2, and every URL counts LINK_LENGTH.
+_LIGHT_RANGES = ((0x0000, 0x10FF), (0x2000, 0x200D), (0x2010, 0x201F), (0x2032, 0x2037))
+_ZWJ = 0x200D
+# Code points that continue an emoji instead of adding to the length: variation
+# selectors, keycap, skin tones and the tags of subdivision flags
+_EMOJI_CONTINUATIONS = {0xFE0E, 0xFE0F, 0x20E3} | set(range(0x1F3FB, 0x1F400)) | set(range(0xE0020, 0xE0080))
+_REGIONAL_INDICATORS = range(0x1F1E6, 0x1F200)
+_URL = re.compile(r"https?://\S*[^\s.,;:!?'\")\]]", re.IGNORECASE)
+_WORD = re.compile(r"(\s*)(\S+)")
+
+
+def _char_weight(code: int) -> int:
+    return 1 if any(low <= code <= high for low, high in _LIGHT_RANGES) else 2
+
+
+def _text_weight(text: str) -> int:
+    # An emoji sequence (with modifiers, ZWJ-joined or a flag) counts as one emoji
+    weight, in_emoji, joined, half_flag = 0, False, False, False
+    for char in text:
+        code = ord(char)
+        if in_emoji and (joined or code == _ZWJ or code in _EMOJI_CONTINUATIONS or (half_flag and code in _REGIONAL_INDICATORS)):
+            joined, half_flag = code == _ZWJ, False
+            continue
+        char_weight = _char_weight(code)
+        weight += char_weight
+        in_emoji, joined, half_flag = char_weight == 2, False, code in _REGIONAL_INDICATORS
+    return weight
+
+
+def weighted_length(text: str) -> int:
+    """
+    Returns the length X counts for a tweet: emoji and CJK count 2, every URL counts 23.
+    """
+    text = unicodedata.normalize("NFC", text)
+    weight, end = 0, 0
+    for url in _URL.finditer(text):
+        weight += _text_weight(text[end:url.start()]) + LINK_LENGTH
+        end = url.end()
+    return weight + _text_weight(text[end:])
+
+
+def _split_word(word: str, budget: int):
+    # Only for a word longer than a whole tweet: cut it at the last character that fits
+    used = 0
+    for index, char in enumerate(word):
+        used += _char_weight(ord(char))
+        if used > budget:
+            return word[:index], word[index:]
+    return word, ""
+
+
+def plan_thread(summary: str, url: str, hashtags: str = HASHTAGS) -> List[str]:
+    """
+    Splits a summary into the tweets of a thread, in one pass over its words.
+
+    Every tweet ends with the hashtags and the first one also carries the link.
+    Tweets are filled by X's weighted length, and words and hashtags are never
+    split (except a single word longer than a whole tweet).
+
+    Returns:
+        The tweet texts, in posting order.
+
+    Raises:
+        ValueError: If the hashtags and link leave no room for the summary.
+    """
+    first_suffix = f"\n{hashtags}\n🔗 {url}"
+    suffix = f"\n{hashtags}"
+    first_budget = MAX_TWEET_LENGTH - weighted_length(first_suffix)
+    budget = MAX_TWEET_LENGTH - weighted_length(suffix)
+    if min(first_budget, budget) <= 0:
+        raise ValueError(f"The hashtags '{hashtags}' and link leave no room for the summary.")
+
+    chunks: List[str] = []
+    current: List[str] = []
+    used = 0
+    for separator, word in _WORD.findall(summary):
+        limit = budget if chunks else first_budget
+        word_weight = weighted_length(word)
+        if current and used + weighted_length(separator) + word_weight > limit:
+            chunks.append("".join(current))
+            current, used, limit = [], 0, budget
+        if current:
+            current.append(separator)
+            used += weighted_length(separator)
+        while word_weight > limit - used:
+            head, word = _split_word(word, limit - used)
+            chunks.append("".join(current) + head)
+            current, used, limit = [], 0, budget
+            word_weight = weighted_length(word)
+        current.append(word)
+        used += word_weight
+    chunks.append("".join(current))
+    return [chunks[0] + first_suffix] + [chunk + suffix for chunk in chunks[1:]]
+
+
+def validate_thread(tweets: List[str]) -> None:
+    """
+    Checks every tweet of a planned thread before any of it is posted.
+
+    Raises:
+        ValueError: If the thread is empty, or a tweet is blank or over MAX_TWEET_LENGTH.
+    """
+    if not tweets:
+        raise ValueError("The thread has no tweets.")
+    for number, tweet in enumerate(tweets, 1):
+        length = weighted_length(tweet)
+        if not tweet.strip():
+            raise ValueError(f"Tweet {number} of {len(tweets)} is blank.")
+        if length > MAX_TWEET_LENGTH:
+            raise ValueError(f"Tweet {number} of {len(tweets)} is {length} characters long, over the limit of {MAX_TWEET_LENGTH}.")
+
+
+class ThreadProgress:
+    """
+    The planned tweets of the thread being posted, and the IDs of those already posted.
+
+    Progress is saved before the first tweet and after every tweet, so a thread
+    interrupted by a failure is finished by resume_thread in a later run,
+    without summarizing the article again. When blob_name is set, progress is
+    also kept in Azure Blob Storage, for runs that start on a fresh machine.
+    """
+
+    def __init__(self, path: str = THREAD_PROGRESS_FILE, blob_name: Optional[str] = THREAD_PROGRESS_BLOB_NAME):
+        self.path = path
+        self.blob_name = blob_name
+        self.tweets: List[str] = []
+        self.posted_ids: List = []
+        self.attempts = 0
+
+    def load(self) -> bool:
+        """
+        Loads the saved progress. Returns whether a thread is pending.
+
+        Raises:
+            RuntimeError: If the progress blob could not be read. A thread may
+                be pending, so callers must not start a new one.
+        """
+        if self.blob_name and not download_blob(self.blob_name, self.path):
+            raise RuntimeError(f"Could not read the thread progress blob '{self.blob_name}'.")
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return False
+        self.tweets, self.posted_ids, self.attempts = data["tweets"], data["posted_ids"], data.get("attempts", 0)
+        return bool(self.tweets)
+
+    def start(self, tweets: List[str]) -> None:
+        self.tweets, self.posted_ids, self.attempts = list(tweets), [], 0
+        self.save()
+
+    def save(self) -> None:
+        with open(f"{self.path}.tmp", "w", encoding="utf-8") as file:
+            json.dump({"tweets": self.tweets, "posted_ids": self.posted_ids, "attempts": self.attempts}, file)
+        os.replace(f"{self.path}.tmp", self.path)
+        if self.blob_name:
+            upload_blob(self.path, self.blob_name)
+
+    def clear(self) -> None:
+        self.tweets, self.posted_ids, self.attempts = [], [], 0
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        if self.blob_name:
+            delete_blob(self.blob_name)
+
+
+def _post_remaining(client, progress: ThreadProgress) -> Optional[int]:
     """
-    Splits text into a chunk of max_length, ensuring no word or hashtag is split.
-    Returns (chunk, rest).
+    Posts the tweets of the thread that are not posted yet, replying to the last one posted.
     """
-    if len(text) <= max_length:
-        return text, ""
-    # Find the last space before max_length
-    chunk = text[:max_length]
-    last_space = chunk.rfind(' ')
-    if (last_space == -1):
-        # No space found, force split (rare case)
-        return chunk, text[max_length:].lstrip()
-    # Ensure we don't split a hashtag
-    if '#' in chunk[last_space:]:
-        # Find previous space before the hashtag
-        prev_space = chunk[:last_space].rfind(' ')
-        if prev_space != -1:
-            last_space = prev_space
-    chunk = chunk[:last_space]
-    rest = text[last_space:].lstrip()
-    return chunk, rest
-
-def post_thread_with_link(client, summary: str, url: str) -> Optional[int]:
+    progress.attempts += 1
+    progress.save()
+    tweet_id = progress.posted_ids[-1] if progress.posted_ids else None
+    total = len(progress.tweets)
+    for number in range(len(progress.posted_ids) + 1, total + 1):
+        text = progress.tweets[number - 1]
+        logger.info(f"Length of tweet {number} of {total}: {weighted_length(text)}")
+        try:
+            if tweet_id is None:
+                tweet = client.create_tweet(text=text)
+            else:
+                tweet = client.create_tweet(text=text, in_reply_to_tweet_id=tweet_id)
+        except Exception as e:
+            logger.error(f"Error posting tweet {number} of {total} of the thread: {e}")
+            metrics.increment("thread_post_failures")
+            return None
+        metrics.increment("tweets_posted")
+        tweet_id = tweet.data["id"]
+        progress.posted_ids.append(tweet_id)
+        logger.info(f"Tweet {number} of {total} posted successfully. Tweet ID: {tweet_id}")
+        # The tweet is live, so the rest of the thread is posted even if its progress cannot be saved
+        try:
+            progress.save()
+        except Exception as e:
+            logger.error(f"Error saving the progress of the thread after tweet {number} of {total}: {e}")
+    try:
+        progress.clear()
+    except Exception as e:
+        logger.error(f"Error clearing the progress of the finished thread: {e}")
+    return tweet_id
+
+
+def post_thread_with_link(client, summary: str, url: str, hashtags: str = HASHTAGS, progress: Optional[ThreadProgress] = None) -> Optional[int]:
     """
     Posts a summary and URL to Twitter as a thread if necessary.
 
+    The whole thread is planned and validated before the first tweet is posted.
+    If posting fails part way, the rest of the thread is left in progress for
+    resume_thread.
+
     Args:
         client: Tweepy client instance.
         summary: The summary to post.
         url: The URL to include in the first tweet.
+        hashtags: The hashtags appended to every tweet.
+        progress: Where the thread's progress is kept. Defaults to THREAD_PROGRESS_FILE.
 
     Returns:
         The ID of the last tweet in the thread, or None if an error occurs.
@@ -46,36 +240,48 @@ def post_thread_with_link(client, summary: str, url: str) -> Optional[int]:
     logger.info(f"Summary: {summary}")
     logger.info(f"URL: {url}")
 
-    allowed_summary_length = MAX_TWEET_LENGTH - LINK_LENGTH - len(HASHTAGS) - EXTRA
-
-    # Split the summary for the first tweet
-    first_chunk, remaining_summary = split_text_without_splitting_words_or_hashtags(summary, allowed_summary_length)
-    first_tweet_text = f"{first_chunk}\n{HASHTAGS}\n🔗 {url}"
-    logger.info(f"Length of first tweet: {len(first_tweet_text)}")
-
-    # Post the first tweet
     try:
-        tweet = client.create_tweet(text=first_tweet_text)
-        tweet_id = tweet.data["id"]
-        logger.info(f"First tweet posted successfully. Tweet ID: {tweet_id}")
-    except Exception as e:
-        logger.error(f"Error posting the first tweet: {e}")
+        tweets = plan_thread(summary, url, hashtags)
+        validate_thread(tweets)
+    except ValueError as e:
+        logger.error(f"Not posting an invalid thread: {e}")
         return None
 
-    # Post the remaining summary in thread, chunked by MAX_TWEET_LENGTH, no word/hashtag split
-    while remaining_summary:
-        # Reserve space for hashtags in each thread tweet
-        allowed_length = MAX_TWEET_LENGTH - len(HASHTAGS) - 1  # 1 for newline
-        chunk, remaining_summary = split_text_without_splitting_words_or_hashtags(remaining_summary, allowed_length)
-        thread_tweet_text = f"{chunk}\n{HASHTAGS}"
-        try:
-            tweet = client.create_tweet(text=thread_tweet_text, in_reply_to_tweet_id=tweet_id)
-            tweet_id = tweet.data["id"]
-            logger.info(f"Tweet posted successfully in thread. Tweet ID: {tweet_id}")
-        except Exception as e:
-            logger.error(f"Error posting a tweet in the thread: {e}")
-            return None
-
-    logger.info("Successfully posted the thread.")
+    progress = progress or ThreadProgress()
+    progress.start(tweets)
+    tweet_id = _post_remaining(client, progress)
+    if tweet_id:
+        logger.info("Successfully posted the thread.")
     return tweet_id
 
+
+def resume_thread(client, progress: Optional[ThreadProgress] = None) -> bool:
+    """
+    Finishes posting a thread that an earlier run left part way, if any.
+
+    A thread is given up after THREAD_MAX_ATTEMPTS runs tried to post it.
+    Until then, callers must not post a new thread to the same account, as
+    that would replace the pending thread's progress.
+
+    Returns:
+        Whether a thread is still pending, i.e. posting it failed again.
+
+    Raises:
+        RuntimeError: If the saved progress could not be read; callers treat
+            this as a pending thread.
+    """
+    progress = progress or ThreadProgress()
+    if not progress.load():
+        return False
+    if progress.attempts >= THREAD_MAX_ATTEMPTS:
+        logger.error(f"Giving up a thread after {progress.attempts} attempts, with {len(progress.posted_ids)} of {len(progress.tweets)} tweets posted.")
+        metrics.increment("threads_abandoned")
+        progress.clear()
+        return False
+    logger.info(f"Resuming a thread with {len(progress.posted_ids)} of {len(progress.tweets)} tweets posted.")
+    metrics.increment("threads_resumed")
+    tweet_id = _post_remaining(client, progress)
+    if tweet_id is None:
+        return True
+    logger.info(f"Successfully finished the thread. Last tweet ID: {tweet_id}")
+    return False
@@ -0,0 +1,149 @@
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from logger import logger
+from typing import Dict, Iterable, List, Optional
+from blob_storage import download_blob, upload_blob, BlobConflictError
+
+
+def parse_published_at(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parses an article's publishedAt into an aware UTC datetime.
+
+    Accepts NewsAPI's "2024-06-15T10:00:00Z" and newsdata.io's "2024-06-15 10:00:00"
+    (UTC without an offset). Returns None if the value is missing or malformed.
+    """
+    if not value:
+        return None
+    try:
+        published = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if published.tzinfo is None:
+        published = published.replace(tzinfo=timezone.utc)
+    return published.astimezone(timezone.utc)
+
+
+class FetchWatermarks:
+    """
+    The newest publishedAt processed, per source and per query term.
+
+    Queries combine several topics and the combination changes between runs, so
+    watermarks are kept per topic; a query's watermark is the oldest of its topics'. Watermarks advanced
+    during a run are only persisted by save(), once the fetched articles have
+    been processed, so a failed run fetches the same articles again.
+
+    When blob_name is set, the watermarks are downloaded from Azure Blob Storage
+    on open and uploaded on save.
+    """
+
+    def __init__(self, path: str, overlap_hours: float, blob_name: Optional[str] = None):
+        self.path = path
+        self.overlap = timedelta(hours=overlap_hours)
+        self.blob_name = blob_name
+        self.fetched: Dict[str, int] = {}
+        self.new: Dict[str, int] = {}
+        self._pending: Dict[str, Dict[str, datetime]] = {}
+        self._lock = threading.Lock()
+        self.watermarks = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, datetime]]:
+        if self.blob_name:
+            download_blob(self.blob_name, self.path)
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            data = {}
+        watermarks = {}
+        for source, terms in data.items():
+            parsed = {term: parse_published_at(value) for term, value in terms.items()}
+            watermarks[source] = {term: value for term, value in parsed.items() if value}
+        return watermarks
+
+    def _watermark(self, source: str, terms: Iterable[str]) -> Optional[datetime]:
+        known = self.watermarks.get(source, {})
+        values = [known.get(term) for term in terms]
+        if not values or None in values:
+            return None  # A term never fetched before needs a full fetch
+        return min(values)
+
+    def since(self, source: str, terms: Iterable[str]) -> Optional[datetime]:
+        """
+        Returns the publishedAt from which a query should fetch, or None for a full fetch.
+
+        This is the query's watermark minus the overlap window, so articles indexed
+        late by the source are not missed.
+        """
+        watermark = self._watermark(source, terms)
+        return watermark - self.overlap if watermark else None
+
+    def count_new(self, source: str, terms: Iterable[str], articles: List[Dict]) -> int:
+        """
+        Counts the articles published after a query's watermark. Articles without
+        a valid publishedAt count as new.
+        """
+        watermark = self._watermark(source, terms)
+        published = [parse_published_at(article.get("publishedAt")) for article in articles]
+        return sum(1 for value in published if watermark is None or value is None or value > watermark)
+
+    def record(self, source: str, terms: List[str], articles: List[Dict]) -> None:
+        """
+        Records the articles a query fetched: counts those newer than its watermark
+        and advances the pending watermark of each term to the newest publishedAt.
+        """
+        new = self.count_new(source, terms, articles)
+        published = [parse_published_at(article.get("publishedAt")) for article in articles]
+        newest = max((value for value in published if value), default=None)
+        with self._lock:
+            self.fetched[source] = self.fetched.get(source, 0) + len(articles)
+            self.new[source] = self.new.get(source, 0) + new
+            if newest:
+                pending = self._pending.setdefault(source, {})
+                for term in terms:
+                    pending[term] = max(pending.get(term, newest), newest)
+        logger.info(f"{source}: {new} of {len(articles)} fetched articles are new.")
+
+    def report(self) -> Dict[str, Dict[str, int]]:
+        """
+        Returns the number of fetched and new articles per source.
+        """
+        return {source: {"fetched": self.fetched[source], "new": self.new.get(source, 0)} for source in self.fetched}
+
+    def _merge_pending(self) -> None:
+        for source, terms in self._pending.items():
+            known = self.watermarks.setdefault(source, {})
+            for term, value in terms.items():
+                known[term] = max(known.get(term, value), value)
+
+    def _write(self) -> None:
+        data = {
+            source: {term: value.isoformat() for term, value in sorted(terms.items())}
+            for source, terms in sorted(self.watermarks.items())
+        }
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=2)
+
+    def save(self) -> None:
+        """
+        Persists the advanced watermarks.
+
+        If another run updated the blob in the meantime, its watermarks are
+        reloaded and merged (keeping the newest per term) before retrying once.
+        """
+        with self._lock:
+            self._merge_pending()
+            self._write()
+            if not self.blob_name:
+                return
+            try:
+                upload_blob(self.path, self.blob_name)
+            except BlobConflictError:
+                logger.warning("Fetch watermarks were updated by another run. Merging and retrying.")
+                self.watermarks = self._load()
+                self._merge_pending()
+                self._write()
+                try:
+                    upload_blob(self.path, self.blob_name)
+                except BlobConflictError:
+                    logger.warning("Fetch watermarks were updated again by another run. Skipping this update.")
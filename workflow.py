@@ -1,21 +1,194 @@
 from logger import logger  # Import the centralized logger
-from typing import List, Dict, Tuple, Optional
-from sentiment_analysis import analyze_sentiment_with_openai
+from typing import List, Dict, Sequence, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+import time
+from sentiment_analysis import analyze_sentiment_with_openai, analyze_sentiment_batch_with_openai, analyze_sentiment_only_batch_with_openai, is_clear_reject
+from sentiment_analysis import analyze_sentiment_with_logprobs
+from sentiment_analysis import SCORING_PROMPT_VERSION, SENTIMENT_ONLY_PROMPT_VERSION, LOGPROB_PROMPT_VERSION, SENTIMENT_ONLY_LOGPROB_PROMPT_VERSION
+from relevance_scorer import get_topic_relevance
+from config import RELEVANCE_THRESHOLD, SCORING_MODE
+from score_cache import ScoreCache, article_cache_key
+from metrics import metrics
 from summarizer import summarize_news
-from twitter_poster import post_thread_with_link
+from twitter_poster import post_thread_with_link, HASHTAGS, ThreadProgress
 
-def filter_positive_articles(articles: List[Dict], client, model: str, sentiment_threshold: float, relevance_threshold: float) -> List[Tuple[float, Dict]]:
+
+def article_text(article: Dict) -> str:
+    """
+    Returns the text that is sent for scoring: the title followed by the description.
+    """
+    title = article.get("title", "")
+    description = article.get("description", "")
+    return f"{title} {description}"
+
+
+def score_batch(batch: List[Dict], client, model: str, sentiment_only: bool = False, scoring_mode: str = SCORING_MODE) -> List[Tuple[float, float, float]]:
+    """
+    Scores a batch of articles with OpenAI and measures the round-trip latency.
+
+    A single article is scored with its own request; larger batches share one
+    request, so every article in the batch reports the batch latency. With
+    sentiment_only, OpenAI only judges sentiment and relevance is reported as 0.
+    In "logprobs" scoring mode, every article is rated with its own one-token
+    requests, one after the other.
+
+    Returns:
+        A list of (sentiment, relevance, latency_seconds) tuples, in batch order.
+    """
+    start = time.perf_counter()
+    if scoring_mode == "logprobs":
+        scores = [analyze_sentiment_with_logprobs(client, article_text(article), model, not sentiment_only) for article in batch]
+    elif sentiment_only:
+        scores = [(sentiment, 0.0) for sentiment in analyze_sentiment_only_batch_with_openai(client, [article_text(article) for article in batch], model)]
+    elif len(batch) == 1:
+        scores = [analyze_sentiment_with_openai(client, article_text(batch[0]), model)]
+    else:
+        scores = analyze_sentiment_batch_with_openai(client, [article_text(article) for article in batch], model)
+    latency = time.perf_counter() - start
+    logger.info(f"Scored {len(batch)} article(s) in {latency:.2f}s: {[article.get('title', '') for article in batch]}")
+    return [(sentiment, relevance, latency) for sentiment, relevance in scores]
+
+
+def score_articles(
+    articles: List[Dict],
+    client,
+    model: str,
+    max_workers: int = 1,
+    batch_size: int = 1,
+    cache: Optional[ScoreCache] = None,
+    prefilter: bool = False,
+    local_relevance: bool = False,
+    relevances: Optional[Sequence[float]] = None,
+    relevance_threshold: float = RELEVANCE_THRESHOLD,
+    scoring_mode: str = SCORING_MODE
+) -> List[Tuple[float, float, float]]:
+    """
+    Scores articles in batches of batch_size, running up to max_workers batches concurrently.
+
+    When a cache is given, cached scores are reused and only the remaining
+    articles are sent to OpenAI. Cached articles report a latency of 0. With
+    prefilter, uncached articles that is_clear_reject discards locally are
+    scored (0.0, 0.0) without an OpenAI call.
+
+    With local_relevance, relevance comes from the topic centroids of
+    relevance_scorer and OpenAI only judges sentiment. Articles whose local
+    relevance cannot pass relevance_threshold are not sent to OpenAI. Callers
+    that score relevance themselves (e.g. per bot profile) pass the articles'
+    relevances.
+
+    scoring_mode is "json" or "logprobs" (see SCORING_MODE). Scores of the two
+    modes are cached separately.
+
+    Returns:
+        A list of (sentiment, relevance, latency_seconds) tuples, in input order.
+    """
+    scores: List[Optional[Tuple[float, float, float]]] = [None] * len(articles)
+    if local_relevance and relevances is None:
+        relevances = get_topic_relevance().score([article_text(article) for article in articles]) if articles else []
+    keys = []
+    if cache is not None:
+        if scoring_mode == "logprobs":
+            version = SENTIMENT_ONLY_LOGPROB_PROMPT_VERSION if local_relevance else LOGPROB_PROMPT_VERSION
+        else:
+            version = SENTIMENT_ONLY_PROMPT_VERSION if local_relevance else SCORING_PROMPT_VERSION
+        keys = [
+            article_cache_key(article.get("title"), article.get("description"), model, version)
+            for article in articles
+        ]
+        for i, key in enumerate(keys):
+            cached = cache.get(key)
+            if cached is not None:
+                # Local relevance is recomputed, so it follows changes to the topics
+                scores[i] = (cached[0], float(relevances[i]) if local_relevance else cached[1], 0.0)
+        hits = sum(1 for score in scores if score is not None)
+        metrics.increment("score_cache_hits", hits)
+        metrics.increment("score_cache_misses", len(articles) - hits)
+        logger.info(
+            f"Score cache: {hits} of {len(articles)} articles already scored "
+            f"(hit rate: {hits / len(articles) if articles else 0:.0%})."
+        )
+
+    pending = [i for i, score in enumerate(scores) if score is None]
+    if prefilter and pending:
+        rejected = [i for i in pending if is_clear_reject(article_text(articles[i]))]
+        for i in rejected:
+            scores[i] = (0.0, 0.0, 0.0)
+        logger.info(f"Prefilter: {len(rejected)} of {len(pending)} uncached articles rejected locally.")
+        metrics.increment("prefilter_rejects", len(rejected))
+        pending = [i for i in pending if scores[i] is None]
+    if local_relevance and pending:
+        irrelevant = [i for i in pending if relevances[i] <= relevance_threshold]
+        for i in irrelevant:
+            scores[i] = (0.0, float(relevances[i]), 0.0)
+        logger.info(f"Local relevance: {len(irrelevant)} of {len(pending)} uncached articles are below the relevance threshold.")
+        metrics.increment("local_relevance_rejects", len(irrelevant))
+        pending = [i for i in pending if scores[i] is None]
+
+    batch_size = max(1, batch_size)
+    batches = [
+        [articles[i] for i in pending[start:start + batch_size]]
+        for start in range(0, len(pending), batch_size)
+    ]
+
+    start = time.perf_counter()
+    if max_workers > 1 and len(batches) > 1:
+        logger.info(f"Scoring {len(pending)} articles in {len(batches)} batches with {max_workers} concurrent workers...")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            batch_scores = list(executor.map(lambda batch: score_batch(batch, client, model, local_relevance, scoring_mode), batches))
+    else:
+        batch_scores = [score_batch(batch, client, model, local_relevance, scoring_mode) for batch in batches]
+    elapsed = time.perf_counter() - start
+
+    fresh_scores = [score for batch in batch_scores for score in batch]
+    metrics.increment("articles_scored", len(fresh_scores))
+    metrics.increment("stage_seconds", elapsed, stage="scoring")
+    for i, (sentiment, relevance, latency) in zip(pending, fresh_scores):
+        if local_relevance:
+            relevance = float(relevances[i])
+        scores[i] = (sentiment, relevance, latency)
+        # (0.0, 0.0) is also the fallback for failed requests, so it is never cached
+        failed = sentiment == 0.0 if local_relevance else (sentiment, relevance) == (0.0, 0.0)
+        if cache is not None and not failed:
+            cache.put(keys[i], sentiment, relevance)
+
+    latencies = sorted(latency for _, _, latency in fresh_scores)
+    if latencies:
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        logger.info(
+            f"Scored {len(latencies)} articles with {len(batches)} requests in {elapsed:.2f}s "
+            f"(per-article latency avg: {sum(latencies) / len(latencies):.2f}s, "
+            f"p95: {p95:.2f}s, max: {latencies[-1]:.2f}s)"
+        )
+    return scores
+
+
+def filter_positive_articles(
+    articles: List[Dict],
+    client,
+    model: str,
+    sentiment_threshold: float,
+    relevance_threshold: float,
+    max_workers: int = 1,
+    batch_size: int = 1,
+    cache: Optional[ScoreCache] = None,
+    prefilter: bool = False,
+    local_relevance: bool = False
+) -> List[Tuple[float, Dict]]:
     """
     Filters articles based on OpenAI sentiment and relevance analysis.
+
+    Articles are scored concurrently when max_workers > 1 and several per request
+    when batch_size > 1. Articles found in the score cache are not re-scored,
+    and with prefilter, clear rejects are not sent to OpenAI. With
+    local_relevance, OpenAI only judges sentiment.
+    Results are always collected in input order, so the ranking is identical to
+    serial scoring.
     """
+    scores = score_articles(articles, client, model, max_workers=max_workers, batch_size=batch_size, cache=cache, prefilter=prefilter, local_relevance=local_relevance)
+
     positive_articles = []
-    for article in articles:
+    for article, (sentiment, relevance, _) in zip(articles, scores):
         title = article.get("title", "")
-        description = article.get("description", "")
-        text = f"{title} {description}"
-
-        # Use OpenAI to analyze sentiment and relevance
-        sentiment, relevance = analyze_sentiment_with_openai(client, text, model)
 
         # Only include articles that meet the thresholds
         if sentiment > sentiment_threshold and relevance > relevance_threshold:
@@ -25,7 +198,7 @@ def filter_positive_articles(articles: List[Dict], client, model: str, sentiment
         else:
             logger.info(f"Article rejected: {title} (Sentiment: {sentiment}, Relevance: {relevance})")
 
-    # Sort articles by combined score in descending order
+    # Sort articles by combined score in descending order (stable, so ties keep input order)
     positive_articles = sorted(positive_articles, key=lambda x: x[0], reverse=True)  # Sort by combined_score
     logger.debug(f"Positive Articles: {positive_articles}")
     return positive_articles
@@ -36,10 +209,14 @@ def process_top_article(
     openai_client,
     tweepy_client,
     deployment_name,
-    allowed_summary_length  # Add this parameter
+    allowed_summary_length,  # Add this parameter
+    hashtags: str = HASHTAGS,
+    progress: Optional[ThreadProgress] = None
 ):
     """
-    Processes a single article by summarizing and posting it to Twitter.
+    Processes a single article by summarizing and posting it to Twitter, with the given hashtags.
+
+    The thread's progress is kept in progress (see twitter_poster.resume_thread).
     """
     try:
         title = article.get("title", "No Title Available")
@@ -62,7 +239,7 @@ def process_top_article(
             return None
 
         # Post to Twitter
-        tweet_id = post_thread_with_link(tweepy_client, summary, url)
+        tweet_id = post_thread_with_link(tweepy_client, summary, url, hashtags, progress)
         if tweet_id:
             logger.info(f"Successfully posted to Twitter. Tweet ID: {tweet_id}")
         else: